@@ -1,132 +1,257 @@
+import asyncio
 import json
-import os
-from datetime import datetime
-from dotenv import load_dotenv
-from sqlalchemy.orm import Session
-import google.generativeai as genai
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from .config import GEMINI_CONFIG, crear_prompt_analisis
+from .config import GEMINI_CONFIG, PIPELINE_CONFIG, crear_prompt_analisis
+from .analysis_cache import clave_analisis, get_analysis_cache
 from services.risk_calculator import calculate_flood_risk
-from services.wheater_api import GeocodingService, WeatherService, transform_forecast_to_db_records
-from db.operations import get_atlas_by_alcaldia, get_recent_clima_by_alcaldia
+from services.metrics import CLIMA_SOURCE, GEMINI_RESULT, STAGE_SECONDS, UPSTREAM_ERRORS, medir
+from services.wheater_api import GeocodingService, WeatherService
+from services.forecast_series import PASO_HORAS, SLOTS_MAXIMOS, ForecastSeries
+from db.async_operations import get_atlas_summary, get_recent_clima_by_alcaldia, get_upcoming_clima_by_alcaldia
+from db.atlas_summary import contexto_atlas
+from services.alcaldias import nombre_canonico
+from settings import get_settings
 
-load_dotenv()
+# Llamadas a Gemini en curso por llave de caché. Peticiones con el mismo prompt
+# comparten la llamada, y si una agota su tiempo la llamada sigue corriendo
+# hasta llenar el caché para la siguiente petición.
+_analisis_en_vuelo = {}
+
+# Origen del pronóstico (datos_utilizados.fuente_clima)
+FUENTE_CLIMA_API = "API en Tiempo Real"
+FUENTE_CLIMA_RESPALDO = "Base de Datos (Respaldo)"
 
 class FloodPredictionAgent:
     """
     Agente híbrido que predice el riesgo de inundación para periodos de 24 y 48 horas.
+    Se crea una sola vez por proceso (ver get_flood_agent); la sesión de BD se
+    recibe en cada llamada.
     """
-    def __init__(self, db_session: Session):
-        self.db = db_session
-        self.gemini_available = False
-        self.llm = None
-        self._setup_gemini()
+    def __init__(self):
+        self._google_api_key = get_settings().google_api_key
+        self.gemini_available = bool(self._google_api_key)
+        if not self.gemini_available:
+            print("ADVERTENCIA: GOOGLE_API_KEY no encontrada. El análisis de IA se ejecutará en modo SIMULADO.")
+        self._llm = None
+        self._llm_lock = threading.Lock()
+        self.analysis_cache = get_analysis_cache()
         self.geocoder = GeocodingService()
         self.weather_service = WeatherService()
-        
+
+    @property
+    def llm(self):
+        """
+        Modelo de Gemini. El SDK (y su pila de gRPC) tarda casi un segundo en
+        importarse, así que se carga en el primer uso y no al arrancar.
+        """
+        if self._llm is None and self.gemini_available:
+            with self._llm_lock:
+                if self._llm is None:
+                    self._setup_gemini()
+        return self._llm
+
+    @llm.setter
+    def llm(self, modelo):
+        self._llm = modelo
+
     def _setup_gemini(self):
-        """Configura el modelo de Gemini si la API key está disponible."""
+        """Configura el modelo de Gemini con la API key de la configuración."""
         try:
-            google_api_key = os.getenv("GOOGLE_API_KEY")
-            if not google_api_key:
-                print("ADVERTENCIA: GOOGLE_API_KEY no encontrada. El análisis de IA se ejecutará en modo SIMULADO.")
-                return
-            genai.configure(api_key=google_api_key)
-            self.llm = genai.GenerativeModel(GEMINI_CONFIG["model"])
-            self.gemini_available = True
+            import google.generativeai as genai
+
+            genai.configure(api_key=self._google_api_key)
+            self._llm = genai.GenerativeModel(GEMINI_CONFIG["model"])
         except Exception as e:
             print(f"ADVERTENCIA: Error configurando Gemini: {e}")
+            self.gemini_available = False
+
+    def precargar_llm(self) -> bool:
+        """Importa el SDK de Gemini (para llamarse en un hilo al arrancar la app)."""
+        return self.llm is not None
     
     # MODIFICADO: Acepta el parámetro 'periodo'
-    async def predict_for_alcaldia(self, alcaldia: str, periodo: int = 24):
-        """Orquesta el proceso de predicción completo para un periodo específico."""
+    async def predict_for_alcaldia(self, db: AsyncSession, alcaldia: str, periodo: int = 24):
+        """
+        Orquesta el proceso de predicción completo para un periodo específico.
+        Atlas y clima se obtienen en paralelo; el cálculo de riesgo corre mientras
+        Gemini responde, y si Gemini agota su tiempo se entrega el análisis pendiente.
+        """
+        inicio = time.monotonic()
         try:
             print(f"\nAnalizando {alcaldia} (modelo híbrido para {periodo}h)...")
             
             # Pasa el periodo para obtener el contexto correcto
-            contexto = await self._obtener_contexto_hibrido(alcaldia, periodo)
+            contexto = await self._obtener_contexto_hibrido(db, alcaldia, periodo)
 
             if not contexto.get('datos_atlas'):
                 return self._respuesta_error(f"No se encontraron datos en el atlas para: {alcaldia}")
             if not contexto.get('pronostico_completo'):
                  return self._respuesta_error(f"Fallo crítico: No se pudo obtener el clima ni por API ni por BD para: {alcaldia}")
             
-            analisis_gemini = await self._analizar_con_gemini(alcaldia, contexto)
+            tarea_gemini = asyncio.ensure_future(self._analizar_con_gemini(alcaldia, contexto))
+            
+            # El cálculo determinista no depende de Gemini
+            with medir("calculo_riesgo"):
+                predicciones = self._calcular_predicciones(contexto)
             
-            # Pasa el periodo para calcular las probabilidades
-            predicciones = self._calcular_predicciones(contexto)
+            restante = PIPELINE_CONFIG["presupuesto_total"] - (time.monotonic() - inicio)
+            limite_gemini = max(0.0, min(PIPELINE_CONFIG["timeout_gemini"], restante))
+            try:
+                analisis_gemini = await asyncio.wait_for(tarea_gemini, timeout=limite_gemini)
+                # Un error de Gemini no se guarda en su caché: la siguiente llamada lo reintenta
+                estado_analisis = analisis_gemini.get("estado", "completo")
+            except asyncio.TimeoutError:
+                print(f"ADVERTENCIA: Gemini excedió {limite_gemini:.1f}s. Se entrega la predicción sin análisis.")
+                analisis_gemini = self._analisis_pendiente()
+                estado_analisis = "pendiente"
+            GEMINI_RESULT.inc(resultado=estado_analisis if self.gemini_available else "simulado")
             
             respuesta_final = self._estructurar_respuesta(alcaldia, predicciones, analisis_gemini)
             respuesta_final["datos_utilizados"]["fuente_clima"] = contexto["fuente_clima"]
+            respuesta_final["datos_utilizados"]["estado_analisis"] = estado_analisis
             return respuesta_final
             
         except Exception as e:
             import traceback
             traceback.print_exc()
             return self._respuesta_error(f"Error fatal en la predicción: {str(e)}")
+        finally:
+            STAGE_SECONDS.observe(time.monotonic() - inicio, etapa="prediccion")
     
     # MODIFICADO: Acepta y utiliza el parámetro 'periodo'
-    async def _obtener_contexto_hibrido(self, alcaldia: str, periodo: int):
+    async def _obtener_contexto_hibrido(self, db: AsyncSession, alcaldia: str, periodo: int = 48):
         """
-        Obtiene el pronóstico del clima para hasta 48 horas y los datos del atlas.
-        Intenta usar la API como Plan A y la BD como Plan B.
+        Obtiene el pronóstico del clima (5 días, de donde salen todos los horizontes) y los datos del atlas.
+        Ambas etapas son independientes y se ejecutan en paralelo.
         """
-        atlas_data_list = get_atlas_by_alcaldia(self.db, alcaldia, exact=True)
-        atlas_data = atlas_data_list[0].as_dict() if atlas_data_list else {}
+        # AsyncSession no admite consultas concurrentes: las etapas que usan la BD se turnan
+        db_lock = asyncio.Lock()
+        atlas_data, (serie, fuente_clima) = await asyncio.gather(
+            self._obtener_atlas(db, db_lock, alcaldia),
+            self._obtener_clima(db, db_lock, alcaldia),
+        )
         
-        # Necesitamos hasta 16 registros para cubrir 48 horas (16 * 3h = 48h)
-        registros_necesarios = 16 
+        # Todos los horizontes salen de la misma serie de 5 días
+        lluvia_por_horizonte = serie.lluvia_por_horizonte()
+
+        return {
+            "datos_atlas": atlas_data,
+            "pronostico_completo": serie.to_records(), # Todos los registros obtenidos
+            "pronostico_24h": serie.horizonte(24).to_records(),
+            "pronostico_48h": serie.horizonte(48).to_records(),
+            "serie_pronostico": serie,
+            "lluvia_total_24h": lluvia_por_horizonte[24],
+            "lluvia_total_48h": lluvia_por_horizonte[48],
+            "lluvia_por_horizonte": lluvia_por_horizonte,
+            "fuente_clima": fuente_clima
+        }
 
+    async def _obtener_atlas(self, db: AsyncSession, db_lock: asyncio.Lock, alcaldia: str) -> dict:
+        """Etapa de atlas: resumen precalculado de la alcaldía (con tiempo límite)."""
         try:
-            # --- PLAN A: API EN TIEMPO REAL ---
-            print("  -> Intentando obtener clima desde la API en tiempo real...")
-            coords = await self.geocoder.geocode_cdmx_location(alcaldia)
-            if not coords: raise ValueError("Geocodificación fallida")
+            async with db_lock:
+                with medir("atlas_bd"):
+                    resumen = await asyncio.wait_for(
+                        get_atlas_summary(db, alcaldia),
+                        timeout=PIPELINE_CONFIG["timeout_atlas"]
+                    )
+        except asyncio.TimeoutError:
+            print(f"ERROR: La consulta del atlas excedió {PIPELINE_CONFIG['timeout_atlas']}s.")
+            return {}
+        return contexto_atlas(resumen) if resumen else {}
 
-            forecast_api_data = await self.weather_service.get_forecast(coords['lat'], coords['lon'])
-            if not forecast_api_data: raise ValueError("La respuesta de la API de pronóstico está vacía")
-            
-            pronostico_records = transform_forecast_to_db_records(forecast_api_data, alcaldia)
-            fuente_clima = "API en Tiempo Real"
+    async def _obtener_clima(self, db: AsyncSession, db_lock: asyncio.Lock, alcaldia: str):
+        """
+        Etapa de clima: intenta usar la API como Plan A y la BD como Plan B.
+        Regresa (serie de pronóstico, fuente).
+        """
+        try:
+            # --- PLAN A: API EN TIEMPO REAL ---
+            print("  -> Intentando obtener clima desde la API en tiempo real...")
+            serie = await asyncio.wait_for(
+                self._obtener_clima_api(alcaldia),
+                timeout=PIPELINE_CONFIG["timeout_clima_api"]
+            )
             print("Éxito: Clima obtenido de la API.")
+            CLIMA_SOURCE.inc(fuente="api")
+            return serie, FUENTE_CLIMA_API
 
         except Exception as e:
             # --- PLAN B: RESPALDO CON BASE DE DATOS ---
-            print(f"ADVERTENCIA: La llamada a la API falló ({e}). Usando base de datos como respaldo.")
-            pronostico_db_objetos = get_recent_clima_by_alcaldia(self.db, alcaldia, limit=registros_necesarios)
-            pronostico_records = [p.as_dict() for p in pronostico_db_objetos]
-            fuente_clima = "Base de Datos (Respaldo)"
-            if not pronostico_records:
+            motivo = "tiempo agotado" if isinstance(e, asyncio.TimeoutError) else e
+            print(f"ADVERTENCIA: La llamada a la API falló ({motivo}). Usando base de datos como respaldo.")
+            CLIMA_SOURCE.inc(fuente="bd_respaldo")
+            # La ingesta guarda el clima con el nombre oficial de la alcaldía
+            nombre = nombre_canonico(alcaldia) or alcaldia
+            try:
+                async with db_lock:
+                    with medir("clima_bd"):
+                        # Los 40 bloques guardados desde el bloque en curso; si no hay
+                        # pronóstico vigente, los últimos registros disponibles
+                        pronostico_db_objetos = await asyncio.wait_for(
+                            get_upcoming_clima_by_alcaldia(
+                                db, nombre, datetime.now() - timedelta(hours=PASO_HORAS), limit=SLOTS_MAXIMOS
+                            ),
+                            timeout=PIPELINE_CONFIG["timeout_clima_bd"]
+                        )
+                        if not pronostico_db_objetos:
+                            pronostico_db_objetos = await asyncio.wait_for(
+                                get_recent_clima_by_alcaldia(db, nombre, limit=SLOTS_MAXIMOS),
+                                timeout=PIPELINE_CONFIG["timeout_clima_bd"]
+                            )
+            except asyncio.TimeoutError:
+                pronostico_db_objetos = []
+            serie = ForecastSeries.from_rows(pronostico_db_objetos, alcaldia)
+            if not len(serie):
                 print("ERROR: No se encontraron datos de clima en la base de datos.")
-        
-        # Preparamos los datos para ambos periodos
-        pronostico_24h = pronostico_records[:8]
-        pronostico_48h = pronostico_records[:16]
+            return serie, FUENTE_CLIMA_RESPALDO
 
-        lluvia_24h = sum(p.get('lluvia_mm', 0.0) for p in pronostico_24h)
-        lluvia_48h = sum(p.get('lluvia_mm', 0.0) for p in pronostico_48h)
+    async def _obtener_clima_api(self, alcaldia: str):
+        """Geocodifica la alcaldía y obtiene su pronóstico de OpenWeatherMap."""
+        if not self.weather_service.disponible: raise ValueError("OPENWEATHER_API_KEY no configurada")
+        coords = await self.geocoder.geocode_cdmx_location(alcaldia)
+        if not coords: raise ValueError("Geocodificación fallida")
 
-        return {
-            "datos_atlas": atlas_data,
-            "pronostico_completo": pronostico_records, # Todos los registros obtenidos
-            "pronostico_24h": pronostico_24h,
-            "pronostico_48h": pronostico_48h,
-            "lluvia_total_24h": lluvia_24h,
-            "lluvia_total_48h": lluvia_48h, # Añadimos el cálculo de 48h
-            "fuente_clima": fuente_clima
-        }
+        forecast_api_data = await self.weather_service.get_forecast(coords['lat'], coords['lon'])
+        if not forecast_api_data: raise ValueError("La respuesta de la API de pronóstico está vacía")
+
+        return ForecastSeries.from_api(forecast_api_data, alcaldia)
 
     async def _analizar_con_gemini(self, alcaldia: str, contexto: dict):
-        """Llama a la API de Gemini (sin cambios)."""
+        """Llama a la API de Gemini, reutilizando análisis previos del mismo prompt."""
         if not self.gemini_available:
             return self._analisis_por_defecto("Análisis simulado por falta de API Key de Gemini.")
+        clave = clave_analisis(GEMINI_CONFIG["model"], alcaldia, contexto)
+        analisis = self.analysis_cache.get(clave)
+        if analisis is not None:
+            return analisis
+        tarea = _analisis_en_vuelo.get(clave)
+        if tarea is None:
+            tarea = asyncio.ensure_future(self._consultar_gemini(alcaldia, contexto, clave))
+            _analisis_en_vuelo[clave] = tarea
+            tarea.add_done_callback(lambda _: _analisis_en_vuelo.pop(clave, None))
+        # shield: cancelar esta petición no cancela la llamada compartida
+        return await asyncio.shield(tarea)
+
+    async def _consultar_gemini(self, alcaldia: str, contexto: dict, clave: str):
+        """Envía el prompt a Gemini y guarda el análisis en el caché."""
         try:
             # El prompt ahora recibirá el contexto con datos de 24h y 48h
             prompt = crear_prompt_analisis(alcaldia, contexto)
-            response = await self.llm.generate_content_async(prompt)
-            return json.loads(response.text.strip().replace("```json", "").replace("```", "").strip())
+            with medir("gemini"):
+                response = await self.llm.generate_content_async(prompt)
+            analisis = json.loads(response.text.strip().replace("```json", "").replace("```", "").strip())
+            self.analysis_cache.set(clave, analisis)
+            return analisis
         except Exception as e:
-            return self._analisis_por_defecto(f"Análisis no disponible por error en Gemini: {e}")
+            UPSTREAM_ERRORS.inc(api="gemini")
+            analisis = self._analisis_por_defecto(f"Análisis no disponible por error en Gemini: {e}")
+            analisis["estado"] = "no_disponible"
+            return analisis
             
     # MODIFICADO: Renombrado y ajustado para calcular ambos periodos
     def _calcular_predicciones(self, contexto: dict):
@@ -172,10 +297,30 @@ class FloodPredictionAgent:
         """Formatea una respuesta de error estándar."""
         return {"error": True, "mensaje": mensaje}
 
+    def _analisis_pendiente(self):
+        """Análisis que se entrega cuando Gemini no respondió dentro del presupuesto."""
+        analisis = self._analisis_por_defecto("El análisis contextual sigue en proceso; consulte de nuevo en unos momentos.")
+        analisis["estado"] = "pendiente"
+        return analisis
+
     def _analisis_por_defecto(self, explicacion: str):
         """Genera un análisis por defecto cuando Gemini no está disponible."""
         return {
             "factores_riesgo": ["No disponible"],
             "explicacion_corta": explicacion,
             "recomendaciones": ["Consultar fuentes oficiales."]
-        }
\ No newline at end of file
+        }
+
+
+_agent = None
+
+
+def get_flood_agent() -> FloodPredictionAgent:
+    """
+    Agente compartido por todo el proceso: configura Gemini y los servicios
+    (clientes HTTP, cachés) una sola vez.
+    """
+    global _agent
+    if _agent is None:
+        _agent = FloodPredictionAgent()
+    return _agent
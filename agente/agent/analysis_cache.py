@@ -0,0 +1,92 @@
+# agent/analysis_cache.py
+import hashlib
+import json
+import math
+import os
+import time
+from typing import Any, Dict, Optional
+
+from services.cache import TTLCache
+from .config import ANALISIS_CACHE_CONFIG, crear_prompt_analisis
+
+
+def _bucket(valor: float, tamano: float) -> float:
+    """Redondea la lluvia al múltiplo inferior del bucket."""
+    try:
+        return math.floor(float(valor) / tamano) * tamano
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def clave_analisis(modelo: str, alcaldia: str, contexto: Dict[str, Any],
+                   bucket_mm: float = ANALISIS_CACHE_CONFIG["bucket_lluvia_mm"]) -> str:
+    """
+    Hash del prompt que se enviaría a Gemini con la lluvia agrupada en buckets.
+    Entradas casi idénticas producen la misma llave.
+    """
+    contexto_bucket = dict(contexto)
+    for campo in ("lluvia_total_24h", "lluvia_total_48h"):
+        contexto_bucket[campo] = _bucket(contexto.get(campo, 0.0), bucket_mm)
+    prompt = crear_prompt_analisis(alcaldia, contexto_bucket)
+    prompt_normalizado = " ".join(prompt.split())
+    return hashlib.sha256(f"{modelo}\x00{prompt_normalizado}".encode("utf-8")).hexdigest()
+
+
+class AnalysisCache:
+    """
+    Caché de respuestas de Gemini: LRU en memoria con TTL y, si se configura
+    un directorio, un nivel en disco (un JSON por llave) que sobrevive reinicios.
+    """
+
+    def __init__(self, max_entradas: int = ANALISIS_CACHE_CONFIG["max_entradas"],
+                 ttl: float = ANALISIS_CACHE_CONFIG["ttl_segundos"],
+                 directorio: Optional[str] = ANALISIS_CACHE_CONFIG["directorio"]):
+        self.ttl = ttl
+        self.memoria = TTLCache(maxsize=max_entradas, ttl=ttl)
+        self.directorio = directorio
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+
+    def _ruta(self, clave: str) -> str:
+        return os.path.join(self.directorio, f"{clave}.json")
+
+    def get(self, clave: str) -> Optional[Dict[str, Any]]:
+        analisis = self.memoria.get(clave)
+        if analisis is not None or not self.directorio:
+            return analisis
+        try:
+            with open(self._ruta(clave), "r", encoding="utf-8") as f:
+                entrada = json.load(f)
+        except (OSError, ValueError):
+            return None
+        restante = self.ttl - (time.time() - entrada.get("creado", 0))
+        if restante <= 0:
+            return None
+        self.memoria.set(clave, entrada["analisis"], ttl=restante)
+        return entrada["analisis"]
+
+    def set(self, clave: str, analisis: Dict[str, Any]):
+        self.memoria.set(clave, analisis)
+        if not self.directorio:
+            return
+        ruta = self._ruta(clave)
+        try:
+            with open(f"{ruta}.tmp", "w", encoding="utf-8") as f:
+                json.dump({"creado": time.time(), "analisis": analisis}, f, ensure_ascii=False)
+            os.replace(f"{ruta}.tmp", ruta)
+        except OSError as e:
+            print(f"ADVERTENCIA: No se pudo guardar el análisis en disco: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return self.memoria.stats()
+
+
+_cache: Optional[AnalysisCache] = None
+
+
+def get_analysis_cache() -> AnalysisCache:
+    """Caché compartido por todo el proceso."""
+    global _cache
+    if _cache is None:
+        _cache = AnalysisCache()
+    return _cache
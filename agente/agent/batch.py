@@ -0,0 +1,77 @@
+# agent/batch.py
+import asyncio
+from typing import AsyncIterator, Dict, List
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from db.connection import AsyncSessionLocal
+from services.alcaldias import nombre_canonico, normalizar_alcaldia
+from .config import PIPELINE_CONFIG
+
+
+class BatchPredictor:
+    """
+    Ejecuta predicciones para varias alcaldías en paralelo con concurrencia
+    acotada. Cada predicción usa su propia sesión de BD (tomada de `sesiones`)
+    para que las consultas también corran en paralelo. Las alcaldías repetidas
+    se calculan una sola vez; geocodificación y pronóstico se comparten a través
+    de los cachés con single-flight, y los límites de tasa de cada API externa
+    se aplican en los servicios.
+    """
+
+    def __init__(self, agent, sesiones: async_sessionmaker = AsyncSessionLocal,
+                 max_concurrencia: int = PIPELINE_CONFIG["max_concurrencia_lote"]):
+        self.agent = agent
+        self.sesiones = sesiones
+        self.max_concurrencia = max(1, max_concurrencia)
+
+    @staticmethod
+    def _agrupar(alcaldias: List[str]) -> Dict[str, List[str]]:
+        """Agrupa los nombres recibidos por alcaldía (misma llave = una sola predicción)."""
+        grupos: Dict[str, List[str]] = {}
+        for nombre in alcaldias:
+            nombre = nombre.strip()
+            if not nombre:
+                continue
+            clave = normalizar_alcaldia(nombre_canonico(nombre) or nombre)
+            grupos.setdefault(clave, []).append(nombre)
+        return grupos
+
+    async def _predecir(self, semaforo: asyncio.Semaphore, nombres: List[str], periodo: int):
+        """Predice para el primer nombre del grupo; regresa (nombres, resultado)."""
+        async with semaforo:
+            try:
+                async with self.sesiones() as db:
+                    resultado = await self.agent.predict_for_alcaldia(db, nombres[0], periodo=periodo)
+            except Exception as e:
+                resultado = {
+                    "alcaldia": nombres[0],
+                    "error": True,
+                    "mensaje": f"Error procesando esta alcaldía: {str(e)}"
+                }
+            if "alcaldia" not in resultado:
+                # Las respuestas de error del agente no traen el nombre
+                resultado = {"alcaldia": nombres[0], **resultado}
+            return nombres, resultado
+
+    async def stream(self, alcaldias: List[str], periodo: int = 24) -> AsyncIterator[Dict]:
+        """Entrega cada resultado en cuanto termina (no en el orden recibido)."""
+        semaforo = asyncio.Semaphore(self.max_concurrencia)
+        grupos = self._agrupar(alcaldias)
+        tareas = [asyncio.ensure_future(self._predecir(semaforo, nombres, periodo)) for nombres in grupos.values()]
+        try:
+            for terminada in asyncio.as_completed(tareas):
+                nombres, resultado = await terminada
+                yield resultado
+                # Los nombres repetidos reciben el mismo resultado
+                for nombre in nombres[1:]:
+                    yield {**resultado, "alcaldia": nombre}
+        finally:
+            for tarea in tareas:
+                tarea.cancel()
+
+    async def run(self, alcaldias: List[str], periodo: int = 24) -> List[Dict]:
+        """Todos los resultados, en el mismo orden en que se pidieron."""
+        orden = {nombre.strip(): i for i, nombre in reversed(list(enumerate(alcaldias)))}
+        resultados = [resultado async for resultado in self.stream(alcaldias, periodo)]
+        return sorted(resultados, key=lambda r: orden.get(r.get("alcaldia"), len(orden)))
@@ -1,6 +1,9 @@
 # agent/config.py
+import os
 from typing import Dict, Any
 
+from settings import get_settings
+
 # OPCIÓN 1: Mejor balance velocidad/calidad (RECOMENDADO)
 GEMINI_CONFIG = {
     "model": "models/gemini-2.0-flash",  # Rápido y eficiente
@@ -15,6 +18,25 @@ GEMINI_CONFIG = {
 #    "max_tokens": 800
 #}
 
+# Tiempos límite (segundos) por etapa del pipeline del agente. Si Gemini no
+# responde dentro del presupuesto se entrega la predicción determinista.
+PIPELINE_CONFIG = {
+    "timeout_atlas": 5.0,
+    "timeout_clima_api": 8.0,
+    "timeout_clima_bd": 5.0,
+    "timeout_gemini": 6.0,
+    "presupuesto_total": 12.0,
+    "max_concurrencia_lote": 8,  # predicciones simultáneas en /predict/batch
+}
+
+# Caché de análisis de Gemini (llave = hash del prompt normalizado + modelo)
+ANALISIS_CACHE_CONFIG = {
+    "max_entradas": 512,
+    "ttl_segundos": 6 * 3600,
+    "bucket_lluvia_mm": 2.5,  # 11.2 mm y 11.9 mm generan la misma llave
+    "directorio": get_settings().gemini_cache_dir,  # opcional: nivel en disco
+}
+
 # Mapeo de niveles de riesgo a probabilidades
 RIESGO_A_PROBABILIDAD = {
     "Bajo": 0.2,
@@ -23,9 +45,17 @@ RIESGO_A_PROBABILIDAD = {
     "Muy Alto": 0.85
 }
 
-# Configuración de mapas
+# Configuración de mapas: capa de riesgo servida como Mapbox Vector Tiles
 MAP_CONFIG = {
-    "tipo": "geojson",
+    "tipo": "mvt",
+    "tiles_url": "/api/v1/tiles/{z}/{x}/{y}.pbf",
+    "capa": "atlas_riesgo",
+    "extent": 4096,          # Resolución interna de cada tile
+    "buffer": 64,            # Margen (en unidades del tile) para evitar cortes visibles
+    "zoom_min": 0,
+    "zoom_max": 18,
+    "zoom_pregenerado": 12,  # Se generan por adelantado los tiles de zoom 0..12
+    "directorio_tiles": get_settings().tile_cache_dir or os.path.join(os.path.dirname(os.path.dirname(__file__)), "cache", "tiles"),
     "directorio_salida": "./maps/",
     "zoom_default": 12,
     "centro_cdmx": [19.4326, -99.1332]
@@ -1,48 +1,154 @@
 # apis/routes.py
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
-from typing import List, Dict, Any
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Dict, Any, Optional
+from datetime import datetime, timezone
 import asyncio
+import time
 
-from db.connection import get_db
-from agent import FloodPredictionAgent
+from sqlalchemy import text
+from db.connection import AsyncSessionLocal, async_engine, engine, get_async_db, pool_status
+from db.async_operations import get_all_alcaldias, get_atlas_spatial_index, get_atlas_summary_cache
+from agent import FUENTE_CLIMA_API, FloodPredictionAgent
+from agent.batch import BatchPredictor
+from services.snapshot import get_snapshot
+from services.geojson_export import clave_exportacion, etag_exportacion, get_geojson_exporter
+from services.vector_tiles import MVT_MEDIA_TYPE, get_tile_cache
+from services.cache import TTLCache
+from services.json_payload import JSON_MEDIA_TYPE, json_bytes
+from services.http_cache import (MAX_AGE_ATLAS, bloque_pronostico, cache_control_pronostico, coincide,
+                                 etag, get_http_response_cache, no_modificado)
+from services.alcaldias import clave_alcaldia
+from agent.config import MAP_CONFIG
+from .schemas import AlcaldiasResponse, AtlasResumen, AtlasResumenesResponse, ContextoAlcaldiaResponse
 
 router = APIRouter(prefix="/api/v1", tags=["flood-prediction"])
 
-# Cache simple para evitar crear múltiples instancias del agente
-_agent_cache = {}
+def get_flood_agent(request: Request) -> FloodPredictionAgent:
+    """Dependency injection para el agente de inundaciones (único por aplicación)"""
+    return request.app.state.flood_agent
 
-def get_flood_agent(db: Session = Depends(get_db)) -> FloodPredictionAgent:
-    """Dependency injection para el agente de inundaciones"""
-    if db not in _agent_cache:
-        _agent_cache[db] = FloodPredictionAgent(db)
-    return _agent_cache[db]
+# Cuerpos JSON ya serializados de respuestas que solo cambian con el atlas,
+# por (nombre, versión del atlas); las versiones viejas salen por LRU
+_cuerpos = TTLCache(maxsize=64, ttl=None)
+
+def _json(cuerpo: bytes, headers: Optional[Dict[str, str]] = None) -> Response:
+    return Response(content=cuerpo, media_type=JSON_MEDIA_TYPE, headers=headers)
+
+def _prediccion_degradada(prediccion: Optional[Dict[str, Any]]) -> bool:
+    """
+    Predicción con el análisis de Gemini pendiente o fallido, o con el clima del
+    respaldo en BD. No se guarda en cachés HTTP: la siguiente petición puede
+    obtener el resultado completo.
+    """
+    if not prediccion:
+        return False
+    datos = prediccion.get("datos_utilizados", {})
+    return datos.get("estado_analisis") in ("pendiente", "no_disponible") or datos.get("fuente_clima") != FUENTE_CLIMA_API
+
+# Sin ETag: el cliente debe volver a pedirla para recibir el resultado completo
+_SIN_CACHE = {"Cache-Control": "no-cache"}
+
+# Tiempo máximo para el ping a la BD; si el pool está agotado el ping también lo agota
+HEALTH_DB_TIMEOUT = 2.0
+
+async def _verificar_bd() -> Dict[str, Any]:
+    inicio = time.perf_counter()
+    try:
+        async with AsyncSessionLocal() as db:
+            await asyncio.wait_for(db.execute(text("select 1")), timeout=HEALTH_DB_TIMEOUT)
+        return {"ok": True, "latencia_ms": round((time.perf_counter() - inicio) * 1000, 2)}
+    except asyncio.TimeoutError:
+        return {"ok": False, "error": f"sin respuesta en {HEALTH_DB_TIMEOUT}s"}
+    except Exception as e:
+        return {"ok": False, "error": str(e)}
 
 @router.get("/health")
-async def health_check():
-    """Endpoint para verificar que la API está funcionando"""
+async def health_check(response: Response):
+    """Verifica la BD (ping con tiempo límite) y reporta el estado de los pools de conexiones"""
+    bd = await _verificar_bd()
+    snapshot = get_snapshot()
+    if not bd["ok"]:
+        response.status_code = 503
     return {
-        "status": "healthy",
+        "status": "healthy" if bd["ok"] else "unhealthy",
         "service": "Flood Prediction API",
-        "timestamp": "2024-01-01T00:00:00Z"  # Usar datetime en producción
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "base_datos": bd,
+        "pool": {"sync": pool_status(engine), "async": pool_status(async_engine)},
+        "snapshot": {"version": snapshot.version, "edad_segundos": round(snapshot.edad, 1)} if snapshot else None,
     }
 
-@router.get("/alcaldias")
-async def get_alcaldias(db: Session = Depends(get_db)):
+@router.get("/alcaldias", response_model=AlcaldiasResponse)
+async def get_alcaldias(request: Request, db: AsyncSession = Depends(get_async_db)):
     """Obtiene la lista de alcaldías disponibles en la base de datos"""
     try:
-        from db.operations import get_all_alcaldias
-        alcaldias = get_all_alcaldias(db)
-        return {
-            "alcaldias": alcaldias,
-            "total": len(alcaldias)
-        }
+        # La consulta DISTINCT solo se repite cuando cambia la versión del atlas
+        clave = ("alcaldias", (await get_atlas_summary_cache(db)).version)
+        headers = {"ETag": etag(*clave), "Cache-Control": f"public, max-age={MAX_AGE_ATLAS}"}
+        if coincide(request.headers.get("if-none-match"), headers["ETag"]):
+            return no_modificado(headers)
+        cuerpo = _cuerpos.get(clave)
+        if cuerpo is None:
+            alcaldias = await get_all_alcaldias(db)
+            cuerpo = json_bytes(AlcaldiasResponse(alcaldias=alcaldias, total=len(alcaldias)).model_dump())
+            if not alcaldias:
+                return _json(cuerpo, _SIN_CACHE)
+            _cuerpos.set(clave, cuerpo)
+        return _json(cuerpo, headers)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error obteniendo alcaldías: {str(e)}")
 
+@router.get("/atlas/resumen", response_model=AtlasResumenesResponse)
+async def get_atlas_resumen(db: AsyncSession = Depends(get_async_db)):
+    """Resumen del atlas de todas las alcaldías (distribución de riesgo y área en riesgo alto)"""
+    try:
+        resumenes = await get_atlas_summary_cache(db)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error obteniendo el resumen del atlas: {str(e)}")
+    clave = ("atlas_resumen", resumenes.version)
+    cuerpo = _cuerpos.get(clave)
+    if cuerpo is None:
+        cuerpo = AtlasResumenesResponse(
+            atlas_version=resumenes.version,
+            total=len(resumenes),
+            resumenes=list(resumenes.resumenes.values()),
+        ).model_dump_json().encode()
+        _cuerpos.set(clave, cuerpo)
+    return _json(cuerpo)
+
+@router.get("/atlas/resumen/{alcaldia}", response_model=AtlasResumen)
+async def get_atlas_resumen_alcaldia(alcaldia: str, db: AsyncSession = Depends(get_async_db)):
+    """Resumen del atlas de una alcaldía (acepta variantes del nombre)"""
+    try:
+        resumenes = await get_atlas_summary_cache(db)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error obteniendo el resumen del atlas: {str(e)}")
+    resumen = resumenes.get(alcaldia)
+    if resumen is None:
+        raise HTTPException(status_code=404, detail=f"No se encontraron datos para: {alcaldia}")
+    clave = ("atlas_resumen", resumenes.version, resumen["clave"])
+    cuerpo = _cuerpos.get(clave)
+    if cuerpo is None:
+        cuerpo = AtlasResumen.model_validate(resumen).model_dump_json().encode()
+        _cuerpos.set(clave, cuerpo)
+    return _json(cuerpo)
+
 @router.get("/predict/{alcaldia}")
-async def predict_flood_risk(alcaldia: str, periodo: int = 24, agent: FloodPredictionAgent = Depends(get_flood_agent)):
-    """Obtiene la predicción de riesgo de inundación para una alcaldía específica"""
+async def predict_flood_risk(
+    alcaldia: str,
+    request: Request,
+    periodo: int = 24,
+    agent: FloodPredictionAgent = Depends(get_flood_agent),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Obtiene la predicción de riesgo de inundación para una alcaldía específica.
+    La respuesta se versiona con el atlas y el bloque vigente del pronóstico: un
+    If-None-Match vigente recibe 304 y las repeticiones dentro del bloque se
+    sirven del caché sin correr el agente.
+    """
     try:
         if not alcaldia or not alcaldia.strip():
             raise HTTPException(status_code=400, detail="El nombre de la alcaldía no puede estar vacío")
@@ -51,15 +157,46 @@ async def predict_flood_risk(alcaldia: str, periodo: int = 24, agent: FloodPredi
         if periodo not in [24, 48]:
             raise HTTPException(status_code=400, detail="El periodo debe ser 24 o 48 horas")
 
+        alcaldia = alcaldia.strip()
+        # Camino rápido: predicción precalculada por el refresco en segundo plano
+        snapshot = get_snapshot()
+        cuerpo_snapshot = None
+        if snapshot is not None and snapshot.vigente():
+            cuerpo_snapshot = snapshot.prediccion_json(alcaldia)
+        if cuerpo_snapshot is not None and _prediccion_degradada(snapshot.prediccion(alcaldia)):
+            # El snapshot no se rehace hasta el siguiente refresco; el agente ya
+            # encuentra el análisis en su caché en cuanto Gemini termina
+            cuerpo_snapshot = None
+
+        atlas_version = (await get_atlas_summary_cache(db)).version
+        # Solo las predicciones con clima de la API llevan ETag
+        valor = etag("predict", clave_alcaldia(alcaldia), periodo, atlas_version, bloque_pronostico(), FUENTE_CLIMA_API,
+                     snapshot.version if cuerpo_snapshot is not None else 0)
+        headers = {"ETag": valor, "Cache-Control": cache_control_pronostico()}
+        if coincide(request.headers.get("if-none-match"), valor):
+            return no_modificado(headers)
+
+        respuestas = get_http_response_cache()
+        cuerpo = respuestas.get(valor)
+        if cuerpo is None and cuerpo_snapshot is not None:
+            cuerpo = cuerpo_snapshot
+            respuestas.set(valor, cuerpo)
+        if cuerpo is not None:
+            return _json(cuerpo, headers)
+
         print(f"🔍 Solicitando predicción para: {alcaldia} en un periodo de {periodo}h")
         
         # Pasamos el periodo al agente
-        resultado = await agent.predict_for_alcaldia(alcaldia.strip(), periodo=periodo)
+        resultado = await agent.predict_for_alcaldia(db, alcaldia, periodo=periodo)
         
         if resultado.get("error"):
             raise HTTPException(status_code=404, detail=resultado["mensaje"])
-        
-        return resultado
+
+        cuerpo = json_bytes(resultado)
+        if _prediccion_degradada(resultado):
+            return _json(cuerpo, _SIN_CACHE)
+        respuestas.set(valor, cuerpo)
+        return _json(cuerpo, headers)
         
     except HTTPException:
         raise
@@ -67,30 +204,158 @@ async def predict_flood_risk(alcaldia: str, periodo: int = 24, agent: FloodPredi
         print(f"Error en predicción para {alcaldia}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error interno del servidor: {str(e)}")
 
+@router.get("/snapshot")
+async def get_risk_snapshot():
+    """Riesgo precalculado de todas las alcaldías (versión y fecha de generación incluidas)"""
+    snapshot = get_snapshot()
+    if snapshot is None:
+        raise HTTPException(status_code=503, detail="El snapshot de riesgo aún no está disponible")
+    return Response(content=snapshot.payload, media_type="application/json")
+
+@router.get("/risk/point")
+async def get_risk_at_point(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Zonas del atlas que contienen el punto y su riesgo actual (según el snapshot)"""
+    try:
+        index = await get_atlas_spatial_index(db)
+        zonas = _con_riesgo_actual(index.query_point(lat, lon))
+        return {
+            "lat": lat,
+            "lon": lon,
+            "zonas": zonas,
+            "total": len(zonas),
+            "atlas_version": index.version,
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error consultando el punto: {str(e)}")
+
+@router.get("/risk/bbox")
+async def get_risk_in_bbox(
+    min_lon: float = Query(..., ge=-180, le=180),
+    min_lat: float = Query(..., ge=-90, le=90),
+    max_lon: float = Query(..., ge=-180, le=180),
+    max_lat: float = Query(..., ge=-90, le=90),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Zonas del atlas que intersectan el rectángulo y su riesgo actual"""
+    if min_lon > max_lon or min_lat > max_lat:
+        raise HTTPException(status_code=400, detail="El rectángulo debe cumplir min_lon <= max_lon y min_lat <= max_lat")
+    try:
+        index = await get_atlas_spatial_index(db)
+        zonas = _con_riesgo_actual(index.query_bbox(min_lon, min_lat, max_lon, max_lat))
+        return {"zonas": zonas, "total": len(zonas), "atlas_version": index.version}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error consultando el rectángulo: {str(e)}")
+
+def _con_riesgo_actual(zonas: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Agrega a cada zona el riesgo calculado en el snapshot vigente (si existe)."""
+    snapshot = get_snapshot()
+    return [
+        {**zona, "riesgo_actual": snapshot.riesgo_poligono(zona["id"]) if snapshot is not None else None}
+        for zona in zonas
+    ]
+
+@router.get("/atlas/geojson")
+async def export_atlas_geojson(
+    request: Request,
+    zoom: Optional[int] = Query(None, ge=0, le=22),
+    alcaldia: Optional[str] = None,
+    bbox: Optional[str] = Query(None, description="min_lon,min_lat,max_lon,max_lat"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Exporta el atlas como FeatureCollection GeoJSON en streaming. `zoom`
+    simplifica las geometrías para ese nivel del mapa; `bbox` y `alcaldia` filtran.
+    """
+    caja = _parse_bbox(bbox) if bbox else None
+    try:
+        index = await get_atlas_spatial_index(db)
+        ids = {zona["id"] for zona in index.query_bbox(*caja)} if caja else None
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error preparando la exportación: {str(e)}")
+
+    clave = clave_exportacion(index.version, zoom, alcaldia, caja)
+    etag = etag_exportacion(clave)
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=0, must-revalidate", "Vary": "Accept-Encoding"}
+    if coincide(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    exporter = get_geojson_exporter()
+    cacheada = exporter.get(clave)
+    if cacheada is not None:
+        if "gzip" in request.headers.get("accept-encoding", ""):
+            return Response(content=cacheada.cuerpo_gzip, media_type="application/geo+json",
+                            headers={**headers, "Content-Encoding": "gzip"})
+        return Response(content=cacheada.cuerpo, media_type="application/geo+json", headers=headers)
+
+    return StreamingResponse(
+        exporter.stream(clave, alcaldia=alcaldia.strip() if alcaldia else None, ids=ids, zoom=zoom),
+        media_type="application/geo+json",
+        headers=headers,
+    )
+
+# Bajo /api/v1 como el resto de la API (es la URL que anuncia MAP_CONFIG["tiles_url"])
+@router.get("/tiles/{z}/{x}/{y}.pbf")
+async def get_vector_tile(
+    z: int,
+    x: int,
+    y: int,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Tile Mapbox Vector Tile de la capa de riesgo (riesgo del atlas + riesgo actual)"""
+    if not MAP_CONFIG["zoom_min"] <= z <= MAP_CONFIG["zoom_max"] or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise HTTPException(status_code=404, detail="Tile fuera de rango")
+    try:
+        index = await get_atlas_spatial_index(db)
+        datos, version = await get_tile_cache().obtener(index, get_snapshot(), z, x, y)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error generando el tile: {str(e)}")
+
+    etag = f'"{version}"'
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=300"}
+    if coincide(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    if not datos:
+        return Response(status_code=204, headers=headers)
+    return Response(content=datos, media_type=MVT_MEDIA_TYPE, headers=headers)
+
+def _parse_bbox(bbox: str):
+    """'min_lon,min_lat,max_lon,max_lat' -> tupla de floats (400 si no es válido)."""
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(v) for v in bbox.split(","))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="bbox debe ser min_lon,min_lat,max_lon,max_lat")
+    if min_lon > max_lon or min_lat > max_lat:
+        raise HTTPException(status_code=400, detail="El rectángulo debe cumplir min_lon <= max_lon y min_lat <= max_lat")
+    return min_lon, min_lat, max_lon, max_lat
+
 @router.post("/predict/batch")
 async def predict_batch_flood_risk(
     alcaldias: List[str], 
+    request: Request,
+    periodo: int = 24,
+    stream: bool = False,
     agent: FloodPredictionAgent = Depends(get_flood_agent)
 ):
-    """Obtiene predicciones para múltiples alcaldías en lote"""
+    """
+    Obtiene predicciones para múltiples alcaldías en lote, en paralelo.
+    Con `?stream=true` (o `Accept: application/x-ndjson`) los resultados se
+    envían como NDJSON en cuanto termina cada alcaldía.
+    """
     try:
         if not alcaldias:
             raise HTTPException(status_code=400, detail="La lista de alcaldías no puede estar vacía")
+        if periodo not in [24, 48]:
+            raise HTTPException(status_code=400, detail="El periodo debe ser 24 o 48 horas")
+        
+        if stream or "application/x-ndjson" in request.headers.get("accept", ""):
+            return StreamingResponse(_stream_lote(agent, alcaldias, periodo), media_type="application/x-ndjson")
         
-        resultados = []
-        for alcaldia in alcaldias:
-            if alcaldia.strip():
-                try:
-                    resultado = await agent.predict_for_alcaldia(alcaldia.strip())
-                    resultados.append(resultado)
-                except Exception as e:
-                    resultados.append({
-                        "alcaldia": alcaldia,
-                        "error": True,
-                        "mensaje": f"Error procesando esta alcaldía: {str(e)}"
-                    })
-                # Pequeña pausa para no saturar las APIs externas
-                await asyncio.sleep(0.1)
+        resultados = await BatchPredictor(agent).run(alcaldias, periodo=periodo)
         
         return {
             "resultados": resultados,
@@ -103,28 +368,55 @@ async def predict_batch_flood_risk(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error procesando lote: {str(e)}")
 
-@router.get("/alcaldia/{alcaldia}/context")
+async def _stream_lote(agent: FloodPredictionAgent, alcaldias: List[str], periodo: int):
+    """Genera una línea JSON por alcaldía en cuanto termina su predicción."""
+    async for resultado in BatchPredictor(agent).stream(alcaldias, periodo=periodo):
+        yield json_bytes(resultado) + b"\n"
+
+@router.get("/alcaldia/{alcaldia}/context", response_model=ContextoAlcaldiaResponse)
 async def get_alcaldia_context(
     alcaldia: str, 
-    agent: FloodPredictionAgent = Depends(get_flood_agent)
+    request: Request,
+    agent: FloodPredictionAgent = Depends(get_flood_agent),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Obtiene solo el contexto de datos para una alcaldía (sin análisis de IA)"""
     try:
-        contexto = await agent._obtener_contexto_hibrido(alcaldia.strip())
+        alcaldia = alcaldia.strip()
+        atlas_version = (await get_atlas_summary_cache(db)).version
+        valor = etag("context", clave_alcaldia(alcaldia), atlas_version, bloque_pronostico(), FUENTE_CLIMA_API)
+        headers = {"ETag": valor, "Cache-Control": cache_control_pronostico()}
+        if coincide(request.headers.get("if-none-match"), valor):
+            return no_modificado(headers)
+        respuestas = get_http_response_cache()
+        cuerpo = respuestas.get(valor)
+        if cuerpo is not None:
+            return _json(cuerpo, headers)
+
+        contexto = await agent._obtener_contexto_hibrido(db, alcaldia)
         
         if not contexto.get('datos_atlas'):
             raise HTTPException(status_code=404, detail=f"No se encontraron datos para: {alcaldia}")
         
-        return {
+        respuesta = ContextoAlcaldiaResponse.model_validate({
             "alcaldia": alcaldia,
             "datos_atlas": contexto.get('datos_atlas', {}),
             "datos_clima": {
                 "pronostico_24h": contexto.get('pronostico_24h', []),
                 "lluvia_total_24h": contexto.get('lluvia_total_24h', 0),
+                "lluvia_por_horizonte": contexto.get('lluvia_por_horizonte', {}),
                 "fuente": contexto.get('fuente_clima', 'Desconocida')
             },
-            "timestamp": "2024-01-01T00:00:00Z"  # Usar datetime en producción
-        }
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+        })
+        cuerpo = respuesta.model_dump_json().encode()
+        # Sin pronóstico de la API (respaldo en BD o ninguno) no se fija la respuesta para todo el bloque
+        if not contexto.get('pronostico_completo') or contexto.get('fuente_clima') != FUENTE_CLIMA_API:
+            return _json(cuerpo, _SIN_CACHE)
+        respuestas.set(valor, cuerpo)
+        return _json(cuerpo, headers)
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error obteniendo contexto: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,70 @@
+# apis/schemas.py
+"""
+Modelos de respuesta de la API. Con `from_attributes` se construyen igual a
+partir de filas del ORM que de diccionarios, y FastAPI los serializa con
+pydantic-core sin pasar por jsonable_encoder.
+"""
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, ConfigDict
+
+
+class _Modelo(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+
+class AlcaldiasResponse(_Modelo):
+    alcaldias: List[str]
+    total: int
+
+
+class DistribucionNivel(_Modelo):
+    poligonos: int
+    area_m2: float
+
+
+class AtlasResumen(_Modelo):
+    """Una fila de atlas_resumen_alcaldia (los Numeric llegan como Decimal y salen como float)."""
+    clave: str
+    alcaldia: str
+    poligonos: int
+    area_total_m2: float
+    area_riesgo_alto_m2: float
+    proporcion_area_alto: float
+    riesgo_ponderado: Optional[float] = None
+    riesgo: Optional[str] = None
+    distribucion: Dict[str, DistribucionNivel] = {}
+    actualizado_en: Optional[datetime] = None
+
+
+class AtlasResumenesResponse(_Modelo):
+    atlas_version: str
+    total: int
+    resumenes: List[AtlasResumen]
+
+
+class ClimaBloque(_Modelo):
+    """Un bloque de 3 horas del pronóstico (fila de la tabla clima o de la serie)."""
+    fecha: datetime
+    alcaldia: Optional[str] = None
+    lluvia_mm: Optional[float] = None
+    prob_lluvia: Optional[float] = None
+    temperatura: Optional[float] = None
+    humedad: Optional[float] = None
+    presion: Optional[float] = None
+    fuente: Optional[str] = None
+
+
+class DatosClimaContexto(_Modelo):
+    pronostico_24h: List[ClimaBloque]
+    lluvia_total_24h: float
+    lluvia_por_horizonte: Dict[int, float]
+    fuente: str
+
+
+class ContextoAlcaldiaResponse(_Modelo):
+    alcaldia: str
+    datos_atlas: Dict
+    datos_clima: DatosClimaContexto
+    timestamp: str
@@ -1,22 +1,75 @@
 # app.py
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-import uvicorn
-import os
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
+from contextlib import asynccontextmanager
+import asyncio
 
-from db.connection import engine, Base
+from db.connection import AsyncSessionLocal, async_engine
+from db.async_operations import get_atlas_spatial_index
 from apis import router as api_router
+from services.http_client import start_http_client, close_http_client
+from agent import get_flood_agent
+from services.snapshot import SNAPSHOT_ENABLED, SnapshotRefresher
+from services.ingestion import INGESTION_ENABLED, ForecastIngestionWorker
+from services.vector_tiles import get_tile_cache
+from services.metrics import PROMETHEUS_MEDIA_TYPE, REGISTRY, MetricsMiddleware
+from settings import get_settings
 
-# Crear tablas si no existen
-Base.metadata.create_all(bind=engine)
+# Las tablas se crean con `python -m db.init_db`, no al importar la app
+
+async def precargar_indice_espacial():
+    """Construye el índice espacial del atlas antes de la primera consulta por punto."""
+    try:
+        async with AsyncSessionLocal() as db:
+            await get_atlas_spatial_index(db)
+    except Exception as e:
+        print(f"ADVERTENCIA: No se pudo precargar el índice espacial: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Abre los recursos compartidos al arrancar y los libera al apagar."""
+    await start_http_client()
+    # Un solo agente por proceso con sus clientes, cachés y modelo de Gemini
+    app.state.flood_agent = get_flood_agent()
+    # El SDK de Gemini se importa en un hilo para no retrasar el arranque
+    tarea_llm = None
+    if app.state.flood_agent.gemini_available:
+        tarea_llm = asyncio.create_task(asyncio.to_thread(app.state.flood_agent.precargar_llm))
+    # Recalcula periódicamente el riesgo de toda la ciudad para servirlo desde memoria
+    tarea_indice = asyncio.create_task(precargar_indice_espacial())
+    tarea_snapshot = None
+    if SNAPSHOT_ENABLED:
+        tarea_snapshot = asyncio.create_task(SnapshotRefresher(app.state.flood_agent).run_forever())
+    # Tiles de zoom bajo listos en disco; se regeneran al cambiar atlas o snapshot
+    tarea_tiles = asyncio.create_task(get_tile_cache().run_forever())
+    # Ingesta del pronóstico de las 16 alcaldías a la tabla clima; solo con
+    # INGESTION_ENABLED=true en un único proceso (ver services/ingestion.py)
+    tarea_ingesta = None
+    if INGESTION_ENABLED:
+        tarea_ingesta = asyncio.create_task(
+            ForecastIngestionWorker(app.state.flood_agent.weather_service).run_forever()
+        )
+    try:
+        yield
+    finally:
+        tareas = [t for t in (tarea_indice, tarea_tiles, tarea_llm, tarea_snapshot, tarea_ingesta) if t is not None]
+        for tarea in tareas:
+            tarea.cancel()
+        # Espera a que suelten sus conexiones antes de cerrar el pool
+        await asyncio.gather(*tareas, return_exceptions=True)
+        await async_engine.dispose()
+        await close_http_client()
 
 app = FastAPI(
     title="Flood Prediction API",
     description="API para predicción de riesgo de inundaciones en CDMX",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan,
+    # orjson para todas las respuestas; las rutas de lectura frecuente devuelven bytes ya serializados
+    default_response_class=ORJSONResponse,
 )
 
 # Configurar CORS para React
@@ -28,6 +81,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Latencia de cada petición por ruta (se expone en /metrics)
+app.add_middleware(MetricsMiddleware)
+
 # Manejo global de excepciones
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
@@ -47,8 +103,15 @@ async def root():
         "docs": "/docs"
     }
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Métricas del proceso en formato de texto de Prometheus"""
+    return Response(REGISTRY.render(), media_type=PROMETHEUS_MEDIA_TYPE)
+
 if __name__ == "__main__":
-    port = int(os.getenv("PORT", 8000))
+    import uvicorn
+
+    port = get_settings().port
     uvicorn.run(
         "app:app",
         host="0.0.0.0",
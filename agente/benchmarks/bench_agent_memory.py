@@ -0,0 +1,84 @@
+# benchmarks/bench_agent_memory.py
+"""
+Envía muchas peticiones a /api/v1/predict/{alcaldia} (en proceso, vía ASGI) y
+registra la memoria residente para comprobar que se mantiene plana con el
+agente único por aplicación.
+
+Uso (desde agente/):
+    python -m benchmarks.bench_agent_memory --requests 100000 --concurrency 50
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import time
+
+from benchmarks.fixtures import ALCALDIAS_BENCH, apuntar_a_stubs, rss_mb, sembrar_bd, usar_sqlite_temporal
+
+usar_sqlite_temporal()
+
+import httpx
+
+from benchmarks.stubs import StubServer
+from db.connection import async_engine
+
+
+async def correr(base_url: str, total: int, concurrencia: int, muestras: int):
+    from app import app
+
+    registros = []
+    enviados = 0
+    errores = 0
+
+    async with app.router.lifespan_context(app):
+        apuntar_a_stubs(app.state.flood_agent, base_url)
+        transporte = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transporte, base_url="http://bench") as client:
+
+            async def trabajador():
+                nonlocal enviados, errores
+                while enviados < total:
+                    i = enviados
+                    enviados += 1
+                    alcaldia = ALCALDIAS_BENCH[i % len(ALCALDIAS_BENCH)]
+                    respuesta = await client.get(f"/api/v1/predict/{alcaldia}")
+                    if respuesta.status_code != 200:
+                        errores += 1
+                    if (i + 1) % muestras == 0:
+                        registros.append({"peticiones": i + 1, "rss_mb": round(rss_mb(), 1)})
+
+            inicio = time.perf_counter()
+            # Los servicios imprimen cada paso; se silencian para no medir la consola
+            with contextlib.redirect_stdout(io.StringIO()):
+                await asyncio.gather(*(trabajador() for _ in range(concurrencia)))
+            duracion = time.perf_counter() - inicio
+    await async_engine.dispose()
+
+    base = registros[0]["rss_mb"] if registros else rss_mb()
+    return {
+        "peticiones": total,
+        "errores": errores,
+        "req_por_s": round(total / duracion, 1),
+        "rss_inicial_mb": base,
+        "rss_final_mb": registros[-1]["rss_mb"] if registros else base,
+        "crecimiento_mb": round((registros[-1]["rss_mb"] if registros else base) - base, 1),
+        "muestras": registros,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=100_000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--sample-every", type=int, default=10_000)
+    args = parser.parse_args()
+
+    sembrar_bd()
+    with StubServer() as server:
+        resultado = asyncio.run(correr(server.url, args.requests, args.concurrency, args.sample_every))
+    print(json.dumps(resultado, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+# benchmarks/bench_clima_queries.py
+"""
+Tiempo de las consultas calientes de la tabla clima sobre una tabla sintética
+de varios años, con el esquema anterior (índices sueltos, suma mensual con
+EXTRACT) y con el índice único (alcaldia, fecha, fuente) + rangos de fecha.
+
+Uso (desde agente/):
+    python -m benchmarks.bench_clima_queries --years 3
+    # decenas de millones de filas (16 alcaldías, cada 5 min, 10 años ≈ 17M):
+    python -m benchmarks.bench_clima_queries --years 10 --step-minutes 5
+
+Con DB_URL definida se usa esa base (p. ej. MySQL); si no, un SQLite temporal.
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.fixtures import usar_sqlite_temporal
+
+usar_sqlite_temporal()
+
+import numpy as np
+from sqlalchemy import func, insert, select, text
+
+from db.connection import Base, SessionLocal, engine
+from db.models import Clima, ClimaDiario, ClimaMensual
+from db import operations
+from db.clima_maintenance import rebuild_clima_rollups
+from services.alcaldias import ALCALDIAS_CDMX
+
+LOTE = 50_000
+
+
+def generar_clima(years: int, step_minutes: int):
+    """Crea la tabla clima y la llena con registros sintéticos hasta 5 días en el futuro."""
+    tablas = [Clima.__table__, ClimaDiario.__table__, ClimaMensual.__table__]
+    Base.metadata.drop_all(bind=engine, tables=tablas)
+    Base.metadata.create_all(bind=engine, tables=tablas)
+    fin = datetime.utcnow().replace(minute=0, second=0, microsecond=0) + timedelta(days=5)
+    inicio = fin - timedelta(days=365 * years)
+    fechas = np.arange(np.datetime64(inicio), np.datetime64(fin), np.timedelta64(step_minutes, "m"))
+    rng = np.random.default_rng(7)
+    total = 0
+    with engine.begin() as conn:
+        for alcaldia in ALCALDIAS_CDMX:
+            for i in range(0, len(fechas), LOTE):
+                bloque = fechas[i:i + LOTE].astype("datetime64[s]").astype(datetime)
+                lluvia = np.round(rng.gamma(0.3, 2.0, len(bloque)), 2)
+                conn.execute(insert(Clima), [
+                    {"fecha": f, "alcaldia": alcaldia, "lluvia_mm": float(l), "fuente": "sintetico"}
+                    for f, l in zip(bloque, lluvia)
+                ])
+                total += len(bloque)
+    return total, inicio, fin
+
+
+def esquema_anterior():
+    """Índices como en la versión anterior del modelo: alcaldía y fecha por separado."""
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX ux_clima_alcaldia_fecha_fuente" + (" ON clima" if engine.dialect.name == "mysql" else "")))
+        conn.execute(text("CREATE INDEX ix_clima_alcaldia ON clima (alcaldia)"))
+        if engine.dialect.name == "mysql":
+            conn.execute(text("ANALYZE TABLE clima"))
+        else:
+            conn.execute(text("ANALYZE"))
+
+
+def esquema_nuevo():
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX ix_clima_alcaldia" + (" ON clima" if engine.dialect.name == "mysql" else "")))
+        conn.execute(text("CREATE UNIQUE INDEX ux_clima_alcaldia_fecha_fuente ON clima (alcaldia, fecha, fuente)"))
+        if engine.dialect.name == "mysql":
+            conn.execute(text("ANALYZE TABLE clima"))
+        else:
+            conn.execute(text("ANALYZE"))
+
+
+def suma_mensual_extract(db, alcaldia: str, year: int, month: int) -> float:
+    """Versión anterior de get_monthly_rainfall_sum (EXTRACT sobre la columna)."""
+    stmt = select(func.sum(Clima.lluvia_mm)).where(
+        Clima.alcaldia == alcaldia,
+        func.extract('year', Clima.fecha) == year,
+        func.extract('month', Clima.fecha) == month
+    )
+    res = db.execute(stmt).scalar_one_or_none()
+    return float(res) if res is not None else 0.0
+
+
+def suma_mensual_rango(db, alcaldia: str, year: int, month: int) -> float:
+    """Suma mensual sobre los datos crudos con rango de fechas (usa el índice)."""
+    inicio, fin = operations.month_range(year, month)
+    stmt = select(func.sum(Clima.lluvia_mm)).where(
+        Clima.alcaldia == alcaldia,
+        Clima.fecha >= inicio,
+        Clima.fecha < fin
+    )
+    res = db.execute(stmt).scalar_one_or_none()
+    return float(res) if res is not None else 0.0
+
+
+def plan(db, stmt) -> str:
+    prefijo = "EXPLAIN QUERY PLAN " if engine.dialect.name == "sqlite" else "EXPLAIN "
+    compilado = stmt.compile(engine, compile_kwargs={"literal_binds": True})
+    filas = db.execute(text(prefijo + str(compilado))).all()
+    return " | ".join(" ".join(str(c) for c in fila if c is not None) for fila in filas)
+
+
+def medir(funcion, casos, repeticiones: int):
+    tiempos = []
+    for _ in range(repeticiones):
+        for caso in casos:
+            inicio = time.perf_counter()
+            funcion(*caso)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+    tiempos.sort()
+    return {
+        "p50_ms": round(statistics.median(tiempos), 3),
+        "p95_ms": round(tiempos[int(len(tiempos) * 0.95) - 1], 3),
+    }
+
+
+def correr_consultas(casos_mes, casos_rango, repeticiones: int):
+    with SessionLocal() as db:
+        alcaldias = [(a,) for a, _, _ in casos_mes]
+        resultado = {
+            "recientes_24": medir(lambda a: operations.get_recent_clima_by_alcaldia(db, a, 24), alcaldias, repeticiones),
+            "pronostico_48h": medir(lambda a: operations.get_forecast_from_db(db, a, 48), alcaldias, repeticiones),
+            "rango_7_dias": medir(lambda a, i, f: operations.get_clima_by_date_range(db, a, i, f), casos_rango, repeticiones),
+            "suma_mensual_extract": medir(lambda a, y, m: suma_mensual_extract(db, a, y, m), casos_mes, repeticiones),
+            "suma_mensual_rango": medir(lambda a, y, m: suma_mensual_rango(db, a, y, m), casos_mes, repeticiones),
+            # get_monthly_rainfall_sum lee el agregado clima_mensual
+            "suma_mensual_agregado": medir(lambda a, y, m: operations.get_monthly_rainfall_sum(db, a, y, m), casos_mes, repeticiones),
+        }
+        a, y, m = casos_mes[0]
+        inicio, fin = operations.month_range(y, m)
+        resultado["plan_suma_mensual_rango"] = plan(db, select(func.sum(Clima.lluvia_mm)).where(
+            Clima.alcaldia == a, Clima.fecha >= inicio, Clima.fecha < fin))
+        resultado["plan_suma_mensual_extract"] = plan(db, select(func.sum(Clima.lluvia_mm)).where(
+            Clima.alcaldia == a, func.extract('year', Clima.fecha) == y, func.extract('month', Clima.fecha) == m))
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--step-minutes", type=int, default=180)
+    parser.add_argument("--cases", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    inicio_carga = time.perf_counter()
+    total, inicio, fin = generar_clima(args.years, args.step_minutes)
+    carga_s = time.perf_counter() - inicio_carga
+    with SessionLocal() as db:
+        inicio_agregados = time.perf_counter()
+        rebuild_clima_rollups(db)
+        agregados_s = time.perf_counter() - inicio_agregados
+
+    rnd = random.Random(11)
+    alcaldias = list(ALCALDIAS_CDMX)
+    casos_mes, casos_rango = [], []
+    for _ in range(args.cases):
+        dia = inicio + timedelta(days=rnd.randrange((fin - inicio).days - 8))
+        alcaldia = rnd.choice(alcaldias)
+        casos_mes.append((alcaldia, dia.year, dia.month))
+        casos_rango.append((alcaldia, dia, dia + timedelta(days=7)))
+
+    esquema_anterior()
+    antes = correr_consultas(casos_mes, casos_rango, args.repeat)
+    esquema_nuevo()
+    despues = correr_consultas(casos_mes, casos_rango, args.repeat)
+
+    print(json.dumps({
+        "motor": engine.dialect.name,
+        "filas": total,
+        "carga_s": round(carga_s, 1),
+        "agregados_s": round(agregados_s, 1),
+        "indices_separados": antes,
+        "indice_alcaldia_fecha_fuente": despues,
+    }, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
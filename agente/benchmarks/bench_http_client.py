@@ -0,0 +1,100 @@
+# benchmarks/bench_http_client.py
+"""
+Compara la latencia de GeocodingService/WeatherService con un cliente HTTP nuevo
+por llamada (comportamiento anterior) contra el cliente compartido con pool.
+
+Uso (desde agente/):
+    python -m benchmarks.bench_http_client --requests 500 --tls
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+import httpx
+
+os.environ.setdefault("OPENWEATHER_API_KEY", "stub")
+
+from benchmarks.stubs import StubServer
+from services.http_client import HTTP_LIMITS, HTTP_TIMEOUT
+from services.rate_limit import TokenBucket
+from services.wheater_api import GeocodingService, WeatherService
+
+
+class _SinCache:
+    """Desactiva los cachés de geocodificación y pronóstico para medir siempre la red."""
+    def get(self, nombre):
+        return None
+
+    def set(self, nombre, coords, fuente="nominatim"):
+        pass
+
+    async def get_or_fetch(self, lat, lon, fetch):
+        return await fetch()
+
+
+# Sin límite de tasa: el servidor local no lo necesita
+_SIN_LIMITE = TokenBucket(rate=1e9, capacity=10**9)
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+async def _una_prediccion(client: httpx.AsyncClient, base_url: str):
+    """Geocodificación + pronóstico, igual que el Plan A del agente."""
+    geocoder = GeocodingService(client=client, cache=_SinCache(), rate_limiter=_SIN_LIMITE)
+    geocoder.nominatim_url = f"{base_url}/search"
+    weather = WeatherService(client=client, cache=_SinCache(), rate_limiter=_SIN_LIMITE)
+    weather.weather_api_base = base_url
+    coords = await geocoder.geocode_cdmx_location("Iztapalapa")
+    await weather.get_forecast(coords["lat"], coords["lon"])
+
+
+async def medir(modo: str, base_url: str, cafile, n: int, concurrencia: int):
+    latencias = []
+    semaforo = asyncio.Semaphore(concurrencia)
+    compartido = httpx.AsyncClient(timeout=HTTP_TIMEOUT, limits=HTTP_LIMITS, verify=cafile or True)
+
+    async def una():
+        async with semaforo:
+            inicio = time.perf_counter()
+            if modo == "compartido":
+                await _una_prediccion(compartido, base_url)
+            else:
+                async with httpx.AsyncClient(verify=cafile or True) as client:
+                    await _una_prediccion(client, base_url)
+            latencias.append((time.perf_counter() - inicio) * 1000)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(una() for _ in range(n)))
+    total = time.perf_counter() - inicio
+    await compartido.aclose()
+    return {
+        "modo": modo,
+        "p50_ms": round(statistics.median(latencias), 3),
+        "p99_ms": round(percentil(latencias, 99), 3),
+        "req_por_s": round(n / total, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.0, help="Latencia simulada del servidor (s)")
+    parser.add_argument("--tls", action="store_true", help="Servir por HTTPS con certificado autofirmado")
+    args = parser.parse_args()
+
+    with StubServer(latency=args.latency, tls=args.tls) as server:
+        for modo in ("por_llamada", "compartido"):
+            conexiones_previas = server.connections
+            resultado = asyncio.run(medir(modo, server.url, server.cafile, args.requests, args.concurrency))
+            resultado["conexiones_tcp"] = server.connections - conexiones_previas
+            print(resultado)
+
+
+if __name__ == "__main__":
+    main()
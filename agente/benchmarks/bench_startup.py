@@ -0,0 +1,90 @@
+# benchmarks/bench_startup.py
+"""
+Tiempo de arranque en frío de la API: cada corrida es un intérprete nuevo que
+importa `app`, ejecuta el lifespan y repite GET /api/v1/alcaldias hasta la
+primera respuesta 200. Se reporta la mediana y el peor caso de cada fase.
+
+Uso (desde agente/):
+    python -m benchmarks.bench_startup --runs 10
+    python -m benchmarks.bench_startup --sin-gemini     # sin GOOGLE_API_KEY
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.fixtures import sembrar_bd, usar_sqlite_temporal
+
+# Código que corre en cada intérprete nuevo; imprime una línea JSON con las fases
+_HIJO = r"""
+import asyncio, contextlib, io, json, time
+inicio = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    import app as modulo
+importado = time.perf_counter()
+
+async def primera_respuesta():
+    import httpx
+    app = modulo.app
+    with contextlib.redirect_stdout(io.StringIO()):
+        async with app.router.lifespan_context(app):
+            listo = time.perf_counter()
+            transporte = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transporte, base_url="http://bench") as client:
+                while (await client.get("/api/v1/alcaldias")).status_code != 200:
+                    await asyncio.sleep(0.01)
+            respuesta = time.perf_counter()
+    from db.connection import async_engine
+    await async_engine.dispose()
+    return listo, respuesta
+
+listo, respuesta = asyncio.run(primera_respuesta())
+print(json.dumps({
+    "import_s": importado - inicio,
+    "lifespan_s": listo - importado,
+    "primera_respuesta_s": respuesta - inicio,
+}))
+"""
+
+
+def _corrida(env) -> dict:
+    inicio = time.perf_counter()
+    salida = subprocess.run([sys.executable, "-c", _HIJO], env=env, capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    total = time.perf_counter() - inicio
+    if salida.returncode != 0:
+        raise RuntimeError(salida.stderr.strip().splitlines()[-1] if salida.stderr else "falló la corrida")
+    fases = json.loads(salida.stdout.strip().splitlines()[-1])
+    # Incluye el arranque del intérprete y la salida del proceso
+    fases["proceso_s"] = total
+    return fases
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--sin-gemini", action="store_true", help="arrancar sin GOOGLE_API_KEY")
+    args = parser.parse_args()
+
+    usar_sqlite_temporal()
+    sembrar_bd(limite=2000)
+    env = {**os.environ, "SNAPSHOT_ENABLED": "false", "INGESTION_ENABLED": "false", "PYTHONWARNINGS": "ignore"}
+    if args.sin_gemini:
+        env.pop("GOOGLE_API_KEY", None)
+    else:
+        # La llave no se usa para llamar a la API: solo activa la carga del SDK
+        env.setdefault("GOOGLE_API_KEY", "stub")
+
+    corridas = [_corrida(env) for _ in range(args.runs)]
+    resultado = {"corridas": args.runs, "gemini": not args.sin_gemini}
+    for fase in ("import_s", "lifespan_s", "primera_respuesta_s", "proceso_s"):
+        valores = [c[fase] for c in corridas]
+        resultado[fase] = {"mediana": round(statistics.median(valores), 3), "max": round(max(valores), 3)}
+    print(json.dumps(resultado, indent=2))
+
+
+if __name__ == "__main__":
+    main()
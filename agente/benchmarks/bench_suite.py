@@ -0,0 +1,289 @@
+# benchmarks/bench_suite.py
+"""
+Pruebas de carga sin red: la app corre en proceso (vía ASGI) contra una BD
+SQLite sembrada con data_geo_limpia.csv, y Nominatim, OpenWeatherMap y Gemini
+se sustituyen por servidores locales que reproducen respuestas grabadas con
+latencia y proporción de errores configurables.
+
+Escenarios (cada uno con concurrencia creciente):
+    predict   GET  /api/v1/predict/{alcaldia}
+    batch     POST /api/v1/predict/batch con las 16 alcaldías
+    geojson   GET  /api/v1/atlas/geojson sin caché de exportación
+    ingesta   un ciclo de ForecastIngestionWorker con N ubicaciones
+
+Antes de cada nivel se vacían los cachés de pronóstico, de análisis y de
+respuestas HTTP, así cada nivel vuelve a pasar por las APIs simuladas. El
+resultado es un JSON con throughput, p50/p95/p99 y memoria por escenario y
+nivel, comparable entre commits con --compare.
+
+Uso (desde agente/):
+    python -m benchmarks.bench_suite --output resultados.json
+    python -m benchmarks.bench_suite --scenarios predict,geojson --concurrency 1,8,32 \\
+        --latency-gemini 1.5 --error-rate 0.05 --compare anterior.json
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from benchmarks.fixtures import apuntar_a_stubs, rss_mb, sembrar_bd, usar_sqlite_temporal
+
+usar_sqlite_temporal()
+# Sin tareas de fondo: solo se mide lo que generan los escenarios
+os.environ["SNAPSHOT_ENABLED"] = "false"
+os.environ["INGESTION_ENABLED"] = "false"
+os.environ.pop("GEMINI_CACHE_DIR", None)
+
+import httpx
+
+from benchmarks.stubs import StubServer
+from db.connection import async_engine
+
+ESCENARIOS = ("predict", "batch", "geojson", "ingesta")
+Operacion = Callable[[int], Awaitable[bool]]
+
+
+def percentil(valores: List[float], p: float) -> float:
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+def _commit_actual() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _vaciar_caches():
+    from agent.analysis_cache import get_analysis_cache
+    from services.forecast_cache import get_forecast_cache
+    from services.geojson_export import get_geojson_exporter
+    from services.http_cache import get_http_response_cache
+
+    get_http_response_cache().cache.clear()
+    get_forecast_cache()._cache.clear()
+    get_analysis_cache().memoria.clear()
+    get_geojson_exporter().clear()
+
+
+async def medir_nivel(operacion: Operacion, total: int, concurrencia: int) -> Dict:
+    """Ejecuta `total` operaciones con `concurrencia` trabajadores y resume sus latencias."""
+    latencias: List[float] = []
+    errores = 0
+    siguiente = 0
+
+    async def trabajador():
+        nonlocal errores, siguiente
+        while siguiente < total:
+            i = siguiente
+            siguiente += 1
+            inicio = time.perf_counter()
+            try:
+                ok = await operacion(i)
+            except Exception:
+                ok = False
+            latencias.append(time.perf_counter() - inicio)
+            if not ok:
+                errores += 1
+
+    inicio = time.perf_counter()
+    # Los servicios imprimen cada paso; se silencian para no medir la consola
+    with contextlib.redirect_stdout(io.StringIO()):
+        await asyncio.gather(*(trabajador() for _ in range(concurrencia)))
+    duracion = time.perf_counter() - inicio
+    return {
+        "concurrencia": concurrencia,
+        "operaciones": total,
+        "errores": errores,
+        "segundos": round(duracion, 3),
+        "ops_por_s": round(total / duracion, 2),
+        "p50_ms": round(percentil(latencias, 50) * 1000, 2),
+        "p95_ms": round(percentil(latencias, 95) * 1000, 2),
+        "p99_ms": round(percentil(latencias, 99) * 1000, 2),
+        "rss_mb": round(rss_mb(), 1),
+    }
+
+
+def _operacion(escenario: str, client: httpx.AsyncClient) -> Operacion:
+    from services.alcaldias import ALCALDIAS_CDMX
+    from services.geojson_export import get_geojson_exporter
+
+    nombres = list(ALCALDIAS_CDMX)
+
+    async def predict(i: int) -> bool:
+        respuesta = await client.get(f"/api/v1/predict/{nombres[i % len(nombres)]}")
+        return respuesta.status_code == 200
+
+    async def batch(i: int) -> bool:
+        respuesta = await client.post("/api/v1/predict/batch", json=nombres)
+        return respuesta.status_code == 200 and respuesta.json()["exitosas"] == len(nombres)
+
+    async def geojson(i: int) -> bool:
+        # Sin el cuerpo guardado cada petición lee y serializa el atlas completo
+        get_geojson_exporter().clear()
+        respuesta = await client.get("/api/v1/atlas/geojson", params={"zoom": 12})
+        return respuesta.status_code == 200
+
+    return {"predict": predict, "batch": batch, "geojson": geojson}[escenario]
+
+
+async def medir_ingesta(agent, ubicaciones: int, repeticiones: int) -> Dict:
+    """Ciclos completos de ingesta; cada ubicación sintética es una llamada distinta a la API."""
+    from services.alcaldias import ALCALDIAS_CDMX
+    from services.ingestion import ForecastIngestionWorker
+
+    base = list(ALCALDIAS_CDMX.items())
+    alcaldias = {}
+    for i in range(ubicaciones):
+        nombre, (lat, lon) = base[i % len(base)]
+        vuelta = i // len(base)
+        # Las primeras 16 son las alcaldías reales; las demás se desplazan para
+        # que el caché de pronóstico no junte ubicaciones distintas
+        alcaldias[f"{nombre} {vuelta}" if vuelta else nombre] = (lat + 0.01 * vuelta, lon)
+    worker = ForecastIngestionWorker(agent.weather_service, alcaldias=alcaldias, reintentos=1, backoff=0.01)
+    reportes = []
+
+    async def ciclo(_: int) -> bool:
+        _vaciar_caches()
+        reporte = await worker.ejecutar_ciclo()
+        reportes.append(reporte)
+        return not reporte["fallidas"]
+
+    resultado = await medir_nivel(ciclo, repeticiones, 1)
+    registros = sum(r["registros"] for r in reportes)
+    return {
+        **resultado,
+        "concurrencia": ubicaciones,
+        "ubicaciones_por_s": round(ubicaciones * repeticiones / resultado["segundos"], 2),
+        "registros_por_s": round(registros / resultado["segundos"], 2),
+    }
+
+
+async def correr(args, urls: Dict[str, str]) -> Dict[str, List[Dict]]:
+    from app import app
+    from agent import get_flood_agent
+    from services.http_client import close_http_client, start_http_client
+    from services.rate_limit import TokenBucket
+
+    await start_http_client()
+    # Sin el lifespan: no arranca el snapshot, los tiles ni la ingesta periódica
+    agent = app.state.flood_agent = get_flood_agent()
+    apuntar_a_stubs(agent, urls["openweather"], nominatim_url=urls["nominatim"], gemini_url=urls["gemini"])
+    # Los servidores locales no necesitan el límite de tasa de las APIs reales
+    agent.geocoder.rate_limiter = TokenBucket(rate=1e9, capacity=10**9)
+    agent.weather_service.rate_limiter = TokenBucket(rate=1e9, capacity=10**9)
+
+    resultados: Dict[str, List[Dict]] = {}
+    transporte = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transporte, base_url="http://bench", timeout=None) as client:
+            # Deja datos en la tabla clima para el respaldo cuando el stub responde con error
+            with contextlib.redirect_stdout(io.StringIO()):
+                await medir_ingesta(agent, 16, 1)
+            for escenario in args.scenarios:
+                resultados[escenario] = []
+                for concurrencia in args.concurrency:
+                    _vaciar_caches()
+                    if escenario == "ingesta":
+                        nivel = await medir_ingesta(agent, concurrencia * 16, args.repeat)
+                    else:
+                        total = max(args.requests, concurrencia) if escenario == "predict" else max(args.repeat, concurrencia)
+                        nivel = await medir_nivel(_operacion(escenario, client), total, concurrencia)
+                    resultados[escenario].append(nivel)
+                    print(f"{escenario:8} c={nivel['concurrencia']:<5} {nivel['ops_por_s']:>9} op/s  "
+                          f"p50={nivel['p50_ms']}ms p95={nivel['p95_ms']}ms p99={nivel['p99_ms']}ms "
+                          f"errores={nivel['errores']}", file=sys.stderr)
+    finally:
+        await close_http_client()
+        await async_engine.dispose()
+    return resultados
+
+
+def comparar(actual: Dict, anterior: Dict):
+    """Imprime la variación de throughput y p95 contra un resultado previo."""
+    print(f"\nComparación contra {anterior['meta'].get('commit')} ({anterior['meta'].get('fecha')}):")
+    for escenario, niveles in actual["escenarios"].items():
+        previos = {n["concurrencia"]: n for n in anterior.get("escenarios", {}).get(escenario, [])}
+        for nivel in niveles:
+            previo = previos.get(nivel["concurrencia"])
+            if previo is None:
+                continue
+            delta_ops = (nivel["ops_por_s"] / previo["ops_por_s"] - 1) * 100 if previo["ops_por_s"] else 0.0
+            delta_p95 = (nivel["p95_ms"] / previo["p95_ms"] - 1) * 100 if previo["p95_ms"] else 0.0
+            print(f"  {escenario:8} c={nivel['concurrencia']:<5} op/s {previo['ops_por_s']} -> "
+                  f"{nivel['ops_por_s']} ({delta_ops:+.1f}%)  p95 {previo['p95_ms']} -> "
+                  f"{nivel['p95_ms']}ms ({delta_p95:+.1f}%)")
+
+
+def _lista(tipo):
+    return lambda valor: [tipo(v) for v in valor.split(",") if v]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", type=_lista(str), default=list(ESCENARIOS))
+    parser.add_argument("--concurrency", type=_lista(int), default=[1, 4, 16, 64])
+    parser.add_argument("--requests", type=int, default=200, help="peticiones por nivel en predict")
+    parser.add_argument("--repeat", type=int, default=5, help="operaciones por nivel en batch, geojson e ingesta")
+    parser.add_argument("--latency-nominatim", type=float, default=0.05)
+    parser.add_argument("--latency-openweather", type=float, default=0.08)
+    parser.add_argument("--latency-gemini", type=float, default=0.8)
+    parser.add_argument("--jitter", type=float, default=0.02, help="variación uniforme extra (s) en cada stub")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="proporción de 503 en las tres APIs")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--atlas-limit", type=int, default=None, help="polígonos a cargar (por defecto todo el CSV)")
+    parser.add_argument("--output", help="archivo JSON de salida (por defecto stdout)")
+    parser.add_argument("--compare", help="JSON de una corrida anterior")
+    args = parser.parse_args()
+    desconocidos = set(args.scenarios) - set(ESCENARIOS)
+    if desconocidos:
+        parser.error(f"escenarios desconocidos: {', '.join(sorted(desconocidos))}")
+
+    sembrar_bd(args.atlas_limit)
+    comunes = {"jitter": args.jitter, "error_rate": args.error_rate}
+    with StubServer(latency=args.latency_nominatim, seed=args.seed, **comunes) as nominatim, \
+            StubServer(latency=args.latency_openweather, seed=args.seed + 1, **comunes) as openweather, \
+            StubServer(latency=args.latency_gemini, seed=args.seed + 2, **comunes) as gemini:
+        urls = {"nominatim": nominatim.url, "openweather": openweather.url, "gemini": gemini.url}
+        escenarios = asyncio.run(correr(args, urls))
+        errores_inyectados = {"nominatim": nominatim.errors, "openweather": openweather.errors,
+                              "gemini": gemini.errors}
+
+    parametros = {k: v for k, v in vars(args).items() if k not in ("output", "compare")}
+    resultado = {
+        "meta": {
+            "commit": _commit_actual(),
+            "fecha": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "db": os.environ["DB_URL"].split(":", 1)[0],
+            "parametros": parametros,
+            "errores_inyectados": errores_inyectados,
+        },
+        "escenarios": escenarios,
+    }
+    salida = json.dumps(resultado, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(salida + "\n")
+        print(f"Resultados guardados en {args.output}")
+    else:
+        print(salida)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            comparar(resultado, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# benchmarks/fixtures.py
+"""
+Base de datos local (SQLite) sembrada con el atlas real para correr los
+benchmarks sin MySQL. Los módulos de benchmark deben llamar a
+`usar_sqlite_temporal()` antes de importar `db.connection`.
+"""
+import os
+import tempfile
+from typing import Optional
+
+# Alcaldías cuyo nombre en el CSV coincide con el oficial (sin acentos perdidos)
+ALCALDIAS_BENCH = ["Iztapalapa", "Tlalpan", "Xochimilco", "Iztacalco", "Azcapotzalco",
+                   "Miguel Hidalgo", "Venustiano Carranza", "Milpa Alta"]
+
+
+def usar_sqlite_temporal() -> str:
+    """Apunta DB_URL a un archivo SQLite temporal, salvo que ya esté definida."""
+    if not os.getenv("DB_URL"):
+        ruta = os.path.join(tempfile.mkdtemp(prefix="bench-db-"), "inundaciones.db")
+        os.environ["DB_URL"] = f"sqlite:///{ruta}"
+    os.environ.setdefault("OPENWEATHER_API_KEY", "stub")
+    return os.environ["DB_URL"]
+
+
+def sembrar_bd(limite: Optional[int] = None):
+    """Crea las tablas y carga el atlas del CSV (si la tabla está vacía)."""
+    from sqlalchemy import func, select
+    from db.atlas_summary import refresh_atlas_summary
+    from db.atlas_loader import ATLAS_CSV, iter_atlas_chunks, load_atlas_csv, upsert_atlas_rows
+    from db.connection import Base, engine
+    from db.models import AtlasInundaciones
+
+    Base.metadata.create_all(bind=engine)
+    with engine.connect() as conn:
+        if conn.execute(select(func.count(AtlasInundaciones.id))).scalar():
+            return
+    if limite is None:
+        load_atlas_csv(engine)
+        return
+    with engine.begin() as conn:
+        upsert_atlas_rows(conn, next(iter_atlas_chunks(ATLAS_CSV, chunk_size=limite), []))
+        refresh_atlas_summary(conn)
+
+
+def apuntar_a_stubs(agent, base_url: str, nominatim_url: Optional[str] = None,
+                    gemini_url: Optional[str] = None):
+    """
+    Redirige los servicios del agente al servidor local. Nominatim usa `base_url`
+    salvo que se indique otro servidor; Gemini solo se redirige si se da `gemini_url`.
+    """
+    agent.geocoder.nominatim_url = f"{nominatim_url or base_url}/search"
+    agent.weather_service.weather_api_base = base_url
+    if gemini_url:
+        from agent.config import GEMINI_CONFIG
+        from benchmarks.stubs import GeminiStubModel
+
+        agent.llm = GeminiStubModel(gemini_url, GEMINI_CONFIG["model"])
+        agent.gemini_available = True
+
+
+def rss_mb() -> float:
+    """Memoria residente actual del proceso en MB."""
+    try:
+        with open("/proc/self/status") as f:
+            for linea in f:
+                if linea.startswith("VmRSS:"):
+                    return int(linea.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
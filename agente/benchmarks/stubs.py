@@ -0,0 +1,194 @@
+# benchmarks/stubs.py
+"""
+Servidores HTTP locales que imitan a las APIs externas (Nominatim,
+OpenWeatherMap y Gemini) para medir el agente sin salir a internet. Las
+respuestas son grabaciones reales guardadas en benchmarks/respuestas/; la
+latencia, su variación y la proporción de errores se configuran por servidor.
+"""
+import asyncio
+import copy
+import json
+import os
+import random
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Optional, Tuple
+
+RESPUESTAS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "respuestas")
+MODELO_GEMINI = "models/gemini-2.0-flash"
+
+
+def respuesta_grabada(nombre: str):
+    """Carga una respuesta grabada (benchmarks/respuestas/<nombre>.json)."""
+    with open(os.path.join(RESPUESTAS_DIR, f"{nombre}.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+NOMINATIM_RESPONSE = respuesta_grabada("nominatim_search")
+GEMINI_RESPONSE = respuesta_grabada("gemini_generate_content")
+
+
+def openweather_response(slots: int = 40, inicio: Optional[int] = None) -> Dict:
+    """
+    Pronóstico grabado de 5 días / 3 horas, recorrido para que empiece en el
+    bloque de 3 horas actual (`inicio` en segundos epoch) y no quede en el pasado.
+    """
+    grabado = respuesta_grabada("openweather_forecast")
+    if inicio is None:
+        inicio = int(time.time()) // 10800 * 10800
+    desfase = inicio - grabado["list"][0]["dt"]
+    lista = copy.deepcopy(grabado["list"][:slots])
+    for bloque in lista:
+        bloque["dt"] += desfase
+        bloque["dt_txt"] = datetime.utcfromtimestamp(bloque["dt"]).strftime("%Y-%m-%d %H:%M:%S")
+    return {**grabado, "cnt": len(lista), "list": lista}
+
+
+def gemini_path(modelo: str = MODELO_GEMINI) -> str:
+    return f"/v1beta/{modelo}:generateContent"
+
+
+Handler = Callable[[str, str, bytes], Tuple[int, bytes]]
+
+
+def default_routes(modelo_gemini: str = MODELO_GEMINI) -> Dict[str, Handler]:
+    """Rutas por defecto: /search (Nominatim), /forecast (OpenWeatherMap) y generateContent (Gemini)."""
+    nominatim = json.dumps(NOMINATIM_RESPONSE).encode()
+    forecast = json.dumps(openweather_response()).encode()
+    gemini = json.dumps(GEMINI_RESPONSE).encode()
+    return {
+        "/search": lambda method, query, body: (200, nominatim),
+        "/forecast": lambda method, query, body: (200, forecast),
+        gemini_path(modelo_gemini): lambda method, query, body: (200, gemini),
+    }
+
+
+class _RespuestaGemini:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class GeminiStubModel:
+    """
+    Sustituto de `genai.GenerativeModel` que manda `generate_content_async` al
+    servidor local. El SDK solo hace llamadas asíncronas por gRPC, así que el
+    stub se conecta en la frontera del SDK y no a nivel de transporte.
+    """
+
+    def __init__(self, base_url: str, modelo: str = MODELO_GEMINI, client=None):
+        self.url = f"{base_url}{gemini_path(modelo)}"
+        self._client = client
+
+    async def generate_content_async(self, prompt: str) -> _RespuestaGemini:
+        from services.http_client import get_http_client
+
+        client = self._client or get_http_client()
+        response = await client.post(self.url, json={"contents": [{"parts": [{"text": prompt}]}]})
+        response.raise_for_status()
+        data = response.json()
+        return _RespuestaGemini(data["candidates"][0]["content"]["parts"][0]["text"])
+
+
+def self_signed_context() -> Tuple[ssl.SSLContext, str]:
+    """Genera un certificado autofirmado con openssl para medir también el handshake TLS."""
+    tmpdir = tempfile.mkdtemp(prefix="stub-tls-")
+    cert, key = os.path.join(tmpdir, "cert.pem"), os.path.join(tmpdir, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+         "-subj", "/CN=127.0.0.1", "-addext", "subjectAltName=IP:127.0.0.1",
+         "-keyout", key, "-out", cert],
+        check=True, capture_output=True,
+    )
+    ctx = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    ctx.load_cert_chain(cert, key)
+    return ctx, cert
+
+
+class StubServer:
+    """
+    Servidor HTTP/1.1 con keep-alive que corre en su propio hilo y event loop.
+    Cada respuesta tarda `latency` más un extra uniforme en [0, jitter) segundos;
+    una proporción `error_rate` de las peticiones responde 503.
+    Uso:
+        with StubServer() as server:
+            url = server.url  # http://127.0.0.1:<puerto>
+    """
+
+    def __init__(self, routes: Optional[Dict[str, Handler]] = None, latency: float = 0.0,
+                 tls: bool = False, jitter: float = 0.0, error_rate: float = 0.0,
+                 seed: Optional[int] = None):
+        self.routes = routes or default_routes()
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self.ssl_context, self.cafile = self_signed_context() if tls else (None, None)
+        self.connections = 0
+        self.requests = 0
+        self.errors = 0
+        self._loop = asyncio.new_event_loop()
+        self._server = None
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        scheme = "https" if self.ssl_context else "http"
+        host, port = self._server.sockets[0].getsockname()[:2]
+        return f"{scheme}://{host}:{port}"
+
+    def __enter__(self):
+        self._thread.start()
+        future = asyncio.run_coroutine_threadsafe(
+            asyncio.start_server(self._handle, "127.0.0.1", 0, ssl=self.ssl_context), self._loop
+        )
+        self._server = future.result()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.close()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                lines = head.decode("latin-1").split("\r\n")
+                method, target, _ = lines[0].split(" ", 2)
+                headers = {}
+                for line in lines[1:]:
+                    if ":" in line:
+                        name, value = line.split(":", 1)
+                        headers[name.strip().lower()] = value.strip()
+                body = b""
+                if int(headers.get("content-length", 0)):
+                    body = await reader.readexactly(int(headers["content-length"]))
+
+                path, _, query = target.partition("?")
+                handler = self.routes.get(path)
+                demora = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+                if demora:
+                    await asyncio.sleep(demora)
+                if handler and self.error_rate and self._random.random() < self.error_rate:
+                    self.errors += 1
+                    status, payload = 503, b'{"error": "stub: error inyectado"}'
+                else:
+                    status, payload = handler(method, query, body) if handler else (404, b"{}")
+                self.requests += 1
+                writer.write(
+                    f"HTTP/1.1 {status} OK\r\nContent-Type: application/json\r\n"
+                    f"Content-Length: {len(payload)}\r\nConnection: keep-alive\r\n\r\n".encode()
+                    + payload
+                )
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ssl.SSLError):
+            pass
+        finally:
+            writer.close()
@@ -0,0 +1,211 @@
+import asyncio
+import time
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func
+from .models import AtlasInundaciones, AtlasResumenAlcaldia, Clima, atlas_revision
+from . import atlas_summary, spatial_index
+from services.alcaldias import clave_alcaldia
+from services.forecast_series import FUENTE_OPENWEATHER
+
+# Versiones asíncronas de las consultas de db/operations.py que usan el agente
+# y los endpoints. Se ejecutan sobre AsyncSession para no bloquear el event loop.
+
+# ---------------------------
+# Atlas (polígonos / zonas)
+# ---------------------------
+
+async def get_atlas_by_alcaldia(db: AsyncSession, alcaldia: str, exact: bool = False) -> List[AtlasInundaciones]:
+    """
+    Buscar por alcaldía. Si exact=True hace coincidencia exacta (case-insensitive),
+    si exact=False usa LIKE (%alcaldia%).
+    """
+    if exact:
+        stmt = select(AtlasInundaciones).where(func.lower(AtlasInundaciones.alcaldia) == alcaldia.lower())
+    else:
+        stmt = select(AtlasInundaciones).where(AtlasInundaciones.alcaldia.like(f"%{alcaldia}%"))
+    result = await db.execute(stmt)
+    return result.scalars().all()
+
+
+async def get_all_alcaldias(db: AsyncSession) -> List[str]:
+    """Obtiene todas las alcaldías únicas de la base de datos"""
+    try:
+        result = await db.execute(select(AtlasInundaciones.alcaldia).distinct())
+        return [row[0] for row in result.all() if row[0]]  # Filtra valores None
+    except Exception as e:
+        print(f"Error obteniendo alcaldías: {e}")
+        return []
+
+
+async def get_atlas_risk_columns(db: AsyncSession) -> List[tuple]:
+    """(id, cvegeo, alcaldia, riesgo) de todos los polígonos, sin cargar las geometrías."""
+    stmt = select(AtlasInundaciones.id, AtlasInundaciones.cvegeo, AtlasInundaciones.alcaldia,
+                  AtlasInundaciones.riesgo).order_by(AtlasInundaciones.id)
+    result = await db.execute(stmt)
+    return result.all()
+
+
+async def get_atlas_version(db: AsyncSession) -> str:
+    """
+    Versión del atlas: total de polígonos, id máximo y última actualización.
+    Sale solo del estado de la BD para que todos los procesos (y sus ETags)
+    coincidan; la revisión local solo adelanta la siguiente verificación.
+    """
+    stmt = select(func.count(AtlasInundaciones.id), func.max(AtlasInundaciones.id),
+                  func.max(AtlasInundaciones.actualizado_en))
+    total, max_id, actualizado = (await db.execute(stmt)).one()
+    marca = actualizado.strftime("%Y%m%d%H%M%S") if isinstance(actualizado, datetime) else str(actualizado or 0)
+    return f"{total}-{max_id or 0}-{marca}"
+
+
+_index_lock = asyncio.Lock()
+
+
+async def get_atlas_spatial_index(db: AsyncSession) -> spatial_index.AtlasSpatialIndex:
+    """
+    Índice espacial del atlas. Se construye una vez y solo se reconstruye si
+    cambia la versión del atlas (revisada cada VERIFICACION_SEGUNDOS).
+    """
+    index = spatial_index.get_index()
+    if not spatial_index.debe_verificar(index):
+        return index
+    async with _index_lock:
+        index = spatial_index.get_index()
+        if not spatial_index.debe_verificar(index):
+            return index
+        revision = atlas_revision()
+        version = await get_atlas_version(db)
+        if index is not None and index.version == version:
+            index.revision = revision
+            index.verificado = time.monotonic()
+            return index
+        filas = (await db.execute(select(*spatial_index.INDEX_COLUMNS))).all()
+        # Parsear y preparar ~miles de polígonos es CPU: fuera del event loop
+        index = await asyncio.to_thread(spatial_index.AtlasSpatialIndex, filas, version)
+        spatial_index.publicar(index)
+        print(f"Índice espacial del atlas construido ({len(index)} polígonos, versión {version}).")
+        return index
+
+
+_summary_lock = asyncio.Lock()
+
+
+async def get_atlas_summary_cache(db: AsyncSession) -> atlas_summary.AtlasSummaryCache:
+    """
+    Resúmenes del atlas por alcaldía en memoria. Se leen de atlas_resumen_alcaldia
+    solo cuando cambia la versión del atlas; si la tabla está vacía (atlas
+    cargado antes de existir el resumen) se calcula en memoria sin escribirla.
+    """
+    cache = atlas_summary.get_cache()
+    if not atlas_summary.debe_verificar(cache):
+        return cache
+    async with _summary_lock:
+        cache = atlas_summary.get_cache()
+        if not atlas_summary.debe_verificar(cache):
+            return cache
+        revision = atlas_revision()
+        version = await get_atlas_version(db)
+        if cache is not None and cache.version == version:
+            cache.revision = revision
+            cache.verificado = time.monotonic()
+            return cache
+        resumenes = [f.as_dict() for f in (await db.execute(select(AtlasResumenAlcaldia))).scalars().all()]
+        if not resumenes and not version.startswith("0-"):
+            # Solo en memoria: guardar la tabla toca al cargador o a `python -m db.atlas_summary`
+            print("ADVERTENCIA: atlas_resumen_alcaldia está vacía; el resumen se calcula desde el atlas.")
+            filas = (await db.execute(atlas_summary.consulta_agregada())).all()
+            resumenes = [{**r, "actualizado_en": r["actualizado_en"].isoformat()}
+                         for r in atlas_summary.calcular_resumenes(filas)]
+        cache = atlas_summary.AtlasSummaryCache(resumenes, version)
+        atlas_summary.publicar(cache)
+        return cache
+
+
+async def get_atlas_summary(db: AsyncSession, alcaldia: str) -> Optional[Dict[str, Any]]:
+    """Resumen del atlas de una alcaldía (cualquier variante de su nombre), o None."""
+    return (await get_atlas_summary_cache(db)).get(alcaldia)
+
+
+async def get_atlas_at_point(db: AsyncSession, lat: float, lon: float) -> List[Dict[str, Any]]:
+    """Polígonos del atlas que contienen el punto (lat, lon)."""
+    index = await get_atlas_spatial_index(db)
+    return index.query_point(lat, lon)
+
+
+async def get_atlas_in_bbox(db: AsyncSession, min_lon: float, min_lat: float,
+                            max_lon: float, max_lat: float) -> List[Dict[str, Any]]:
+    """Polígonos del atlas que intersectan el rectángulo dado."""
+    index = await get_atlas_spatial_index(db)
+    return index.query_bbox(min_lon, min_lat, max_lon, max_lat)
+
+
+async def variantes_alcaldia(db: AsyncSession, alcaldia: str) -> List[str]:
+    """
+    Nombres tal como aparecen en el atlas ("lvaro Obregn", "COYOACÁN") que
+    corresponden a la misma alcaldía, agrupados igual que en calcular_resumenes.
+    """
+    clave = clave_alcaldia(alcaldia)
+    result = await db.execute(select(AtlasInundaciones.alcaldia).distinct())
+    return [nombre for nombre in result.scalars() if nombre and clave_alcaldia(nombre) == clave]
+
+
+# Columnas de la exportación GeoJSON (propiedades + geometría)
+EXPORT_COLUMNS = (
+    AtlasInundaciones.id,
+    AtlasInundaciones.cvegeo,
+    AtlasInundaciones.alcaldia,
+    AtlasInundaciones.riesgo,
+    AtlasInundaciones.area_m2,
+    AtlasInundaciones.perimetro_m,
+    AtlasInundaciones.descripcion,
+    AtlasInundaciones.fuente,
+    AtlasInundaciones.poligono,
+)
+
+
+async def stream_atlas_rows(db: AsyncSession, alcaldia: Optional[str] = None,
+                            ids: Optional[Iterable[int]] = None,
+                            yield_per: int = 500) -> AsyncIterator[Any]:
+    """
+    Recorre los polígonos del atlas (EXPORT_COLUMNS) por lotes del cursor, sin
+    materializar toda la tabla. `alcaldia` filtra por nombre normalizado (todas
+    las variantes del CSV de esa alcaldía) e `ids` restringe a los polígonos dados.
+    """
+    stmt = select(*EXPORT_COLUMNS).order_by(AtlasInundaciones.id)
+    if alcaldia:
+        stmt = stmt.where(AtlasInundaciones.alcaldia.in_(await variantes_alcaldia(db, alcaldia)))
+    if ids is not None:
+        stmt = stmt.where(AtlasInundaciones.id.in_(list(ids)))
+    result = await db.stream(stmt.execution_options(yield_per=yield_per))
+    async for fila in result:
+        yield fila
+
+
+# ---------------------------
+# Clima (historico / pronosticos)
+# ---------------------------
+
+async def get_recent_clima_by_alcaldia(db: AsyncSession, alcaldia: str, limit: int = 24) -> List[Clima]:
+    """Obtener últimos `limit` registros de clima para una alcaldía."""
+    stmt = select(Clima).where(Clima.alcaldia == alcaldia).order_by(Clima.fecha.desc()).limit(limit)
+    result = await db.execute(stmt)
+    return result.scalars().all()
+
+
+async def get_upcoming_clima_by_alcaldia(db: AsyncSession, alcaldia: str, desde: datetime,
+                                         limit: int = 40, fuente: str = FUENTE_OPENWEATHER) -> List[Clima]:
+    """
+    Pronóstico guardado de una sola `fuente` a partir de `desde`, en orden
+    cronológico (usa el índice único alcaldia+fecha+fuente). Con dos fuentes
+    para el mismo bloque la serie sumaría la lluvia de ambas.
+    """
+    stmt = (
+        select(Clima)
+        .where(Clima.alcaldia == alcaldia, Clima.fecha >= desde, Clima.fuente == fuente)
+        .order_by(Clima.fecha.asc())
+        .limit(limit)
+    )
+    result = await db.execute(stmt)
+    return result.scalars().all()
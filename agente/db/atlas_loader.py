@@ -0,0 +1,212 @@
+# db/atlas_loader.py
+"""
+Carga del atlas de inundaciones desde los CSV de db/data (data_geo_limpia.csv
+o data-2025-09-28.csv). Lee el archivo por bloques, valida cada geometría una
+sola vez y escribe con INSERT multi-fila que actualiza por `cvegeo`, todo en
+una transacción: repetir la carga no duplica polígonos.
+
+data-2025-09-28.csv trae cada zona dos veces y las geometrías recortadas a
+254 caracteres: de ese archivo solo se cargan los atributos, sin sobrescribir
+el polígono que ya esté en la BD.
+
+Uso (desde agente/):
+    python -m db.atlas_loader ../db/data/data_geo_limpia.csv
+    python -m db.atlas_loader ../db/data/data-2025-09-28.csv --chunk-size 1000
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection, Engine
+
+from .atlas_summary import refresh_atlas_summary
+from .models import AtlasInundaciones, AtlasResumenAlcaldia, marcar_atlas_modificado
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "db", "data")
+ATLAS_CSV = os.path.join(DATA_DIR, "data_geo_limpia.csv")
+CHUNK_SIZE = 500
+TIPOS_GEOMETRIA = ("Polygon", "MultiPolygon")
+
+# Columna del CSV -> columna de atlas_inundaciones
+ATLAS_CSV_COLUMNS = {
+    "cvegeo": "cvegeo",
+    "alcaldi": "alcaldia",
+    "intnsdd": "riesgo",
+    "g_pnt_2": "coordenadas",
+    "geo_shp": "poligono",
+    "area_m2": "area_m2",
+    "perim_m": "perimetro_m",
+    "descrpc": "descripcion",
+    "fuente": "fuente",
+}
+ATLAS_UPDATE_COLUMNS = [c for c in ATLAS_CSV_COLUMNS.values() if c != "cvegeo"] + ["actualizado_en"]
+# Para filas cuya geometría no se pudo leer: se actualiza todo menos el polígono
+ATLAS_UPDATE_COLUMNS_SIN_GEOMETRIA = [c for c in ATLAS_UPDATE_COLUMNS if c != "poligono"]
+
+# Los polígonos del atlas pueden superar el límite de campo por defecto (128 KB)
+csv.field_size_limit(min(sys.maxsize, 2 ** 31 - 1))
+
+
+def _float(valor: str) -> Optional[float]:
+    try:
+        return float(valor) if valor not in (None, "") else None
+    except ValueError:
+        return None
+
+
+def parse_geometry(texto: str) -> Optional[Dict[str, Any]]:
+    """GeoJSON del CSV -> dict, o None si no es un (Multi)Polygon con coordenadas."""
+    try:
+        geometria = json.loads(texto)
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(geometria, dict) or geometria.get("type") not in TIPOS_GEOMETRIA:
+        return None
+    if not geometria.get("coordinates"):
+        return None
+    return geometria
+
+
+def iter_atlas_chunks(path: str, chunk_size: int = CHUNK_SIZE,
+                      stats: Optional[Dict[str, int]] = None) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Recorre el CSV por bloques de filas ya convertidas a columnas de la tabla.
+    Las filas sin cvegeo se descartan, las repetidas (mismo cvegeo) se cargan
+    una sola vez y las de geometría inválida llegan sin la llave "poligono".
+    """
+    stats = stats if stats is not None else {}
+    for clave in ("leidas", "sin_cvegeo", "geometria_invalida", "duplicadas"):
+        stats.setdefault(clave, 0)
+    vistos = set()
+    bloque: List[Dict[str, Any]] = []
+    with open(path, newline="", encoding="utf-8", errors="replace") as f:
+        for fila in csv.DictReader(f):
+            stats["leidas"] += 1
+            cvegeo = (fila.get("cvegeo") or "").strip()
+            if not cvegeo:
+                stats["sin_cvegeo"] += 1
+                continue
+            if cvegeo in vistos:
+                stats["duplicadas"] += 1
+                continue
+            vistos.add(cvegeo)
+            registro = {
+                "cvegeo": cvegeo,
+                "alcaldia": fila.get("alcaldi") or None,
+                "riesgo": fila.get("intnsdd") or None,
+                "coordenadas": fila.get("g_pnt_2") or None,
+                "area_m2": _float(fila.get("area_m2")),
+                "perimetro_m": _float(fila.get("perim_m")),
+                "descripcion": fila.get("descrpc") or None,
+                "fuente": fila.get("fuente") or None,
+            }
+            poligono = parse_geometry(fila.get("geo_shp"))
+            if poligono is None:
+                stats["geometria_invalida"] += 1
+            else:
+                registro["poligono"] = poligono
+            bloque.append(registro)
+            if len(bloque) >= chunk_size:
+                yield bloque
+                bloque = []
+    if bloque:
+        yield bloque
+
+
+# Motores con INSERT ... ON DUPLICATE KEY / ON CONFLICT
+DIALECTOS_UPSERT = ("mysql", "mariadb", "sqlite", "postgresql")
+
+
+def _atlas_upsert_stmt(dialect: str, columnas: List[str]):
+    """INSERT que actualiza `columnas` del registro existente con el mismo cvegeo, según el motor."""
+    if dialect in ("mysql", "mariadb"):
+        stmt = mysql_insert(AtlasInundaciones)
+        return stmt.on_duplicate_key_update({c: stmt.inserted[c] for c in columnas})
+    if dialect in ("sqlite", "postgresql"):
+        insert_fn = sqlite_insert if dialect == "sqlite" else postgresql_insert
+        stmt = insert_fn(AtlasInundaciones)
+        return stmt.on_conflict_do_update(
+            index_elements=["cvegeo"],
+            set_={c: stmt.excluded[c] for c in columnas},
+        )
+    raise ValueError(f"Upsert del atlas no soportado para el motor '{dialect}'")
+
+
+def upsert_atlas_rows(conn: Connection, filas: List[Dict[str, Any]]) -> Tuple[int, int]:
+    """Escribe un bloque (una sentencia multi-fila por tipo de fila). Retorna (insertadas, actualizadas)."""
+    if not filas:
+        return 0, 0
+    ahora = datetime.utcnow()
+    for fila in filas:
+        fila["actualizado_en"] = ahora
+    existentes = conn.execute(
+        select(AtlasInundaciones.cvegeo).where(AtlasInundaciones.cvegeo.in_([f["cvegeo"] for f in filas]))
+    ).scalars().all()
+    con_geometria = [f for f in filas if "poligono" in f]
+    sin_geometria = [f for f in filas if "poligono" not in f]
+    if con_geometria:
+        conn.execute(_atlas_upsert_stmt(conn.dialect.name, ATLAS_UPDATE_COLUMNS), con_geometria)
+    if sin_geometria:
+        conn.execute(_atlas_upsert_stmt(conn.dialect.name, ATLAS_UPDATE_COLUMNS_SIN_GEOMETRIA), sin_geometria)
+    return len(filas) - len(existentes), len(existentes)
+
+
+def load_atlas_csv(engine: Engine, path: str = ATLAS_CSV, chunk_size: int = CHUNK_SIZE) -> Dict[str, Any]:
+    """
+    Carga (o refresca) el atlas desde `path` en una sola transacción.
+    Retorna un reporte con conteos y rendimiento.
+    """
+    # Antes de leer el CSV: un motor sin upsert fallaría hasta el primer bloque
+    if engine.dialect.name not in DIALECTOS_UPSERT:
+        raise ValueError(f"Upsert del atlas no soportado para el motor '{engine.dialect.name}'")
+    stats: Dict[str, Any] = {}
+    insertadas = actualizadas = 0
+    inicio = time.perf_counter()
+    with engine.begin() as conn:
+        for bloque in iter_atlas_chunks(path, chunk_size, stats):
+            nuevas, existentes = upsert_atlas_rows(conn, bloque)
+            insertadas += nuevas
+            actualizadas += existentes
+        # Resumen por alcaldía en la misma transacción que los polígonos
+        resumenes = refresh_atlas_summary(conn)
+    duracion = time.perf_counter() - inicio
+    # Índice espacial, exportaciones y tiles se reconstruyen con la nueva versión
+    marcar_atlas_modificado()
+
+    tamano_mb = os.path.getsize(path) / (1024 * 1024)
+    return {
+        "archivo": os.path.basename(path),
+        **stats,
+        "insertadas": insertadas,
+        "actualizadas": actualizadas,
+        "resumenes_alcaldia": resumenes,
+        "segundos": round(duracion, 2),
+        "filas_por_s": round((insertadas + actualizadas) / duracion, 1) if duracion else None,
+        "mb_por_s": round(tamano_mb / duracion, 2) if duracion else None,
+    }
+
+
+def main():
+    from .connection import Base, engine
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("csv", nargs="?", default=ATLAS_CSV, help="Ruta del CSV del atlas")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine, tables=[AtlasInundaciones.__table__, AtlasResumenAlcaldia.__table__])
+    reporte = load_atlas_csv(engine, args.csv, args.chunk_size)
+    print(json.dumps(reporte, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+# db/atlas_summary.py
+"""
+Resumen del atlas por alcaldía: distribución de niveles de riesgo, riesgo
+ponderado por área, proporción del área en riesgo alto y área total. Se
+calcula con una sola consulta agregada al cargar el atlas, se guarda en
+atlas_resumen_alcaldia y cada proceso lo mantiene en memoria, de modo que una
+predicción solo hace una búsqueda por llave normalizada.
+
+Uso (desde agente/):
+    python -m db.atlas_summary      # recalcular la tabla a partir del atlas
+"""
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from sqlalchemy import delete, func, insert, select
+
+from services.alcaldias import clave_alcaldia, nombre_canonico
+from services.risk_calculator import BASE_RISK_SCORES
+
+from .models import AtlasInundaciones, AtlasResumenAlcaldia, atlas_revision
+from .spatial_index import VERIFICACION_SEGUNDOS
+
+# Niveles del atlas que cuentan como "riesgo alto"
+NIVELES_ALTOS = ("Alto", "Muy Alto")
+# Puntaje base -> nivel del atlas (0 = "Muy Bajo" o sin dato)
+NIVEL_POR_PUNTAJE = {0: "Muy Bajo", **{puntaje: nivel for nivel, puntaje in BASE_RISK_SCORES.items()}}
+
+
+def consulta_agregada():
+    """Polígonos y área por (alcaldía, nivel de riesgo); no lee los polígonos."""
+    return select(
+        AtlasInundaciones.alcaldia,
+        AtlasInundaciones.riesgo,
+        func.count(AtlasInundaciones.id),
+        func.coalesce(func.sum(AtlasInundaciones.area_m2), 0),
+    ).group_by(AtlasInundaciones.alcaldia, AtlasInundaciones.riesgo)
+
+
+def calcular_resumenes(filas: Iterable[Sequence[Any]]) -> List[Dict[str, Any]]:
+    """
+    (alcaldía, riesgo, polígonos, área) -> un resumen por alcaldía. Las variantes
+    de nombre del CSV ("Coyoacn", "COYOACÁN") se agrupan bajo el nombre oficial.
+    """
+    grupos: Dict[str, Dict[str, Any]] = {}
+    for alcaldia, riesgo, poligonos, area in filas:
+        if not alcaldia:
+            continue
+        clave = clave_alcaldia(alcaldia)
+        grupo = grupos.setdefault(clave, {
+            "alcaldia": nombre_canonico(alcaldia) or alcaldia.strip(),
+            "distribucion": defaultdict(lambda: {"poligonos": 0, "area_m2": 0.0}),
+        })
+        nivel = riesgo or "Sin dato"
+        grupo["distribucion"][nivel]["poligonos"] += int(poligonos)
+        grupo["distribucion"][nivel]["area_m2"] += float(area or 0)
+
+    resumenes = []
+    ahora = datetime.utcnow()
+    for clave, grupo in sorted(grupos.items()):
+        distribucion = {
+            nivel: {"poligonos": d["poligonos"], "area_m2": round(d["area_m2"], 2)}
+            for nivel, d in sorted(grupo["distribucion"].items())
+        }
+        poligonos = sum(d["poligonos"] for d in distribucion.values())
+        area_total = sum(d["area_m2"] for d in distribucion.values())
+        area_alto = sum(distribucion[n]["area_m2"] for n in NIVELES_ALTOS if n in distribucion)
+        # Ponderado por área; si no hay áreas registradas, por número de polígonos
+        peso = "area_m2" if area_total > 0 else "poligonos"
+        total_peso = sum(d[peso] for d in distribucion.values())
+        ponderado = (
+            sum(BASE_RISK_SCORES.get(n, 0) * d[peso] for n, d in distribucion.items()) / total_peso
+            if total_peso else None
+        )
+        resumenes.append({
+            "clave": clave,
+            "alcaldia": grupo["alcaldia"],
+            "poligonos": poligonos,
+            "area_total_m2": round(area_total, 2),
+            "area_riesgo_alto_m2": round(area_alto, 2),
+            "proporcion_area_alto": round(area_alto / area_total, 4) if area_total else 0.0,
+            "riesgo_ponderado": round(ponderado, 3) if ponderado is not None else None,
+            "riesgo": NIVEL_POR_PUNTAJE[int(round(ponderado))] if ponderado is not None else None,
+            "distribucion": distribucion,
+            "actualizado_en": ahora,
+        })
+    return resumenes
+
+
+def refresh_atlas_summary(db) -> int:
+    """
+    Recalcula atlas_resumen_alcaldia desde el atlas (Session o Connection).
+    No hace commit: el cargador lo llama dentro de su propia transacción.
+    """
+    resumenes = calcular_resumenes(db.execute(consulta_agregada()).all())
+    db.execute(delete(AtlasResumenAlcaldia))
+    if resumenes:
+        db.execute(insert(AtlasResumenAlcaldia), resumenes)
+    return len(resumenes)
+
+
+def contexto_atlas(resumen: Dict[str, Any]) -> Dict[str, Any]:
+    """Resumen -> datos_atlas del agente (riesgo, área y descripción para el cálculo y el prompt)."""
+    return {
+        **resumen,
+        "area_m2": resumen["area_total_m2"],
+        "descripcion": (
+            f"{resumen['poligonos']} zonas del atlas; {resumen['proporcion_area_alto']:.0%} "
+            f"del área en riesgo alto o muy alto"
+        ),
+    }
+
+
+class AtlasSummaryCache:
+    """Resúmenes por llave normalizada, asociados a una versión del atlas."""
+
+    def __init__(self, resumenes: Iterable[Dict[str, Any]], version: str):
+        self.version = version
+        self.revision = atlas_revision()
+        self.verificado = time.monotonic()
+        self.resumenes: Dict[str, Dict[str, Any]] = {r["clave"]: r for r in resumenes}
+
+    def __len__(self) -> int:
+        return len(self.resumenes)
+
+    def get(self, alcaldia: str) -> Optional[Dict[str, Any]]:
+        return self.resumenes.get(clave_alcaldia(alcaldia))
+
+
+_cache: Optional[AtlasSummaryCache] = None
+
+
+def get_cache() -> Optional[AtlasSummaryCache]:
+    return _cache
+
+
+def publicar(cache: AtlasSummaryCache):
+    global _cache
+    _cache = cache
+
+
+def debe_verificar(cache: Optional[AtlasSummaryCache]) -> bool:
+    """Misma política que el índice espacial: cambio local o revisión periódica de la BD."""
+    return (
+        cache is None
+        or cache.revision != atlas_revision()
+        or time.monotonic() - cache.verificado > VERIFICACION_SEGUNDOS
+    )
+
+
+def main():
+    import json
+    from .connection import Base, engine
+
+    Base.metadata.create_all(bind=engine, tables=[AtlasResumenAlcaldia.__table__])
+    with engine.begin() as conn:
+        total = refresh_atlas_summary(conn)
+        filas = conn.execute(select(AtlasResumenAlcaldia)).all()
+    print(f"Resumen del atlas recalculado: {total} alcaldías.")
+    for fila in filas:
+        print(json.dumps({"alcaldia": fila.alcaldia, "riesgo": fila.riesgo,
+                          "proporcion_area_alto": float(fila.proporcion_area_alto)}, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
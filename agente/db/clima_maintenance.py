@@ -0,0 +1,220 @@
+# db/clima_maintenance.py
+"""
+Mantenimiento de la tabla clima: particiones mensuales (MySQL), retención de
+datos crudos y agregados diarios/mensuales de lluvia.
+
+Uso (desde agente/):
+    python -m db.clima_maintenance                 # particiones + retención
+    python -m db.clima_maintenance --rebuild-rollups
+"""
+import argparse
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import case, delete, func, insert, select, text, tuple_
+from sqlalchemy.orm import Session
+
+from settings import get_settings
+
+from .models import Clima, ClimaDiario, ClimaMensual
+
+# Meses de datos crudos que se conservan (los agregados no se borran nunca)
+CLIMA_RETENTION_MONTHS = get_settings().clima_retention_months
+# Particiones mensuales que se crean por adelantado
+CLIMA_PARTITIONS_AHEAD = get_settings().clima_partitions_ahead
+
+
+def _inicio_mes(d) -> datetime:
+    return datetime(d.year, d.month, 1)
+
+
+def _sumar_meses(d: datetime, meses: int) -> datetime:
+    total = d.year * 12 + d.month - 1 + meses
+    return datetime(total // 12, total % 12 + 1, 1)
+
+
+# ---------------------------
+# Agregados (rollups)
+# ---------------------------
+
+def refresh_clima_rollups(db: Session, desde: datetime, hasta: datetime,
+                          alcaldias: Optional[Iterable[str]] = None) -> Dict[str, int]:
+    """
+    Recalcula clima_diario para los días de [desde, hasta] y clima_mensual para
+    los meses que los contienen, a partir de los datos crudos. No hace commit.
+    """
+    dia_inicio = datetime(desde.year, desde.month, desde.day)
+    dia_fin = datetime(hasta.year, hasta.month, hasta.day) + timedelta(days=1)
+    alcaldias = sorted(set(alcaldias)) if alcaldias is not None else None
+
+    # Diario: borrar e insertar desde los crudos (filtro por rango, usa el índice)
+    borrar = delete(ClimaDiario).where(ClimaDiario.fecha >= dia_inicio.date(), ClimaDiario.fecha < dia_fin.date())
+    crudos = [Clima.fecha >= dia_inicio, Clima.fecha < dia_fin]
+    if alcaldias is not None:
+        borrar = borrar.where(ClimaDiario.alcaldia.in_(alcaldias))
+        crudos.append(Clima.alcaldia.in_(alcaldias))
+    db.execute(borrar)
+    dia = func.date(Clima.fecha)
+    diario = db.execute(insert(ClimaDiario).from_select(
+        ["alcaldia", "fecha", "lluvia_total_mm", "lluvia_max_mm", "prob_lluvia_max", "registros"],
+        select(
+            Clima.alcaldia, dia,
+            func.coalesce(func.sum(Clima.lluvia_mm), 0),
+            func.max(Clima.lluvia_mm),
+            func.max(Clima.prob_lluvia),
+            func.count(Clima.id),
+        ).where(*crudos).group_by(Clima.alcaldia, dia),
+    ))
+
+    # Mensual: desde el diario, para los meses completos que tocan el rango
+    mes_inicio = _inicio_mes(dia_inicio)
+    mes_fin = _sumar_meses(_inicio_mes(dia_fin - timedelta(days=1)), 1)
+    meses = []
+    m = mes_inicio
+    while m < mes_fin:
+        meses.append((m.year, m.month))
+        m = _sumar_meses(m, 1)
+    borrar = delete(ClimaMensual).where(tuple_(ClimaMensual.anio, ClimaMensual.mes).in_(meses))
+    diarios = [ClimaDiario.fecha >= mes_inicio.date(), ClimaDiario.fecha < mes_fin.date()]
+    if alcaldias is not None:
+        borrar = borrar.where(ClimaMensual.alcaldia.in_(alcaldias))
+        diarios.append(ClimaDiario.alcaldia.in_(alcaldias))
+    db.execute(borrar)
+    anio = func.extract("year", ClimaDiario.fecha)
+    mes = func.extract("month", ClimaDiario.fecha)
+    mensual = db.execute(insert(ClimaMensual).from_select(
+        ["alcaldia", "anio", "mes", "lluvia_total_mm", "lluvia_max_diaria_mm", "dias_con_lluvia", "registros"],
+        select(
+            ClimaDiario.alcaldia, anio, mes,
+            func.sum(ClimaDiario.lluvia_total_mm),
+            func.max(ClimaDiario.lluvia_total_mm),
+            func.sum(case((ClimaDiario.lluvia_total_mm > 0, 1), else_=0)),
+            func.sum(ClimaDiario.registros),
+        ).where(*diarios).group_by(ClimaDiario.alcaldia, anio, mes),
+    ))
+    return {"dias": diario.rowcount, "meses": mensual.rowcount}
+
+
+def rebuild_clima_rollups(db: Session) -> Dict[str, int]:
+    """Recalcula todos los agregados a partir de los datos crudos disponibles."""
+    desde, hasta = db.execute(select(func.min(Clima.fecha), func.max(Clima.fecha))).one()
+    if desde is None:
+        return {"dias": 0, "meses": 0}
+    resultado = refresh_clima_rollups(db, desde, hasta)
+    db.commit()
+    return resultado
+
+
+# ---------------------------
+# Particiones (solo MySQL)
+# ---------------------------
+
+def _nombre_particion(mes: datetime) -> str:
+    return f"p{mes.year}{mes.month:02d}"
+
+
+def _particiones(db: Session) -> List[Tuple[str, Optional[str]]]:
+    """(nombre, límite superior) de las particiones de clima, en orden."""
+    filas = db.execute(text(
+        "select partition_name, partition_description from information_schema.partitions "
+        "where table_schema = database() and table_name = 'clima' and partition_name is not null "
+        "order by partition_ordinal_position"
+    )).all()
+    return [(nombre, limite) for nombre, limite in filas]
+
+
+def _es_mysql(db: Session) -> bool:
+    return db.get_bind().dialect.name in ("mysql", "mariadb")
+
+
+def ensure_clima_partitions(db: Session, meses_adelante: int = CLIMA_PARTITIONS_AHEAD,
+                            hoy: Optional[datetime] = None) -> List[str]:
+    """
+    Crea las particiones mensuales que falten hasta `meses_adelante` meses en el
+    futuro, partiendo la partición pmax. No hace nada si clima no está
+    particionada (o el motor no es MySQL). Retorna las particiones creadas.
+    """
+    if not _es_mysql(db):
+        return []
+    existentes = _particiones(db)
+    if not existentes or existentes[-1][0] != "pmax":
+        return []
+    nombres = {nombre for nombre, _ in existentes}
+    # Límite más alto ya cubierto por una partición mensual
+    limites = [datetime.fromisoformat(l.strip("'")) for n, l in existentes if n != "pmax" and l and l != "MAXVALUE"]
+    siguiente = max(limites) if limites else _inicio_mes(hoy or datetime.utcnow())
+    objetivo = _sumar_meses(_inicio_mes(hoy or datetime.utcnow()), meses_adelante + 1)
+
+    nuevas = []
+    while siguiente < objetivo:
+        nombre = _nombre_particion(siguiente)
+        fin = _sumar_meses(siguiente, 1)
+        if nombre not in nombres:
+            nuevas.append(f"partition {nombre} values less than ('{fin:%Y-%m-%d}')")
+            nombres.add(nombre)
+        siguiente = fin
+    if nuevas:
+        db.execute(text(
+            "alter table clima reorganize partition pmax into ("
+            + ", ".join(nuevas) + ", partition pmax values less than (MAXVALUE))"
+        ))
+    return [n.split()[1] for n in nuevas]
+
+
+# ---------------------------
+# Retención
+# ---------------------------
+
+def apply_clima_retention(db: Session, meses: int = CLIMA_RETENTION_MONTHS,
+                          hoy: Optional[datetime] = None) -> Dict[str, object]:
+    """
+    Borra los datos crudos anteriores a `meses` meses completos. Antes se
+    recalculan los agregados de ese periodo para no perderlos. En MySQL
+    particionado se eliminan particiones enteras (DROP PARTITION, sin escanear
+    filas); en otros motores se usa DELETE por rango de fecha.
+    """
+    corte = _sumar_meses(_inicio_mes(hoy or datetime.utcnow()), -meses)
+    primero = db.execute(select(func.min(Clima.fecha)).where(Clima.fecha < corte)).scalar()
+    if primero is not None:
+        refresh_clima_rollups(db, primero, corte - timedelta(days=1))
+        db.commit()
+
+    if _es_mysql(db) and _particiones(db):
+        viejas = [
+            nombre for nombre, limite in _particiones(db)
+            if limite and limite != "MAXVALUE" and datetime.fromisoformat(limite.strip("'")) <= corte
+        ]
+        if viejas:
+            db.execute(text(f"alter table clima drop partition {', '.join(viejas)}"))
+        return {"corte": corte.isoformat(), "particiones_eliminadas": viejas}
+
+    borradas = db.execute(delete(Clima).where(Clima.fecha < corte)).rowcount
+    db.commit()
+    return {"corte": corte.isoformat(), "filas_eliminadas": borradas}
+
+
+def run_clima_maintenance(db: Session) -> Dict[str, object]:
+    """Particiones futuras + retención. Pensado para correr una vez al día."""
+    creadas = ensure_clima_partitions(db)
+    retencion = apply_clima_retention(db)
+    return {"particiones_creadas": creadas, **retencion}
+
+
+def main():
+    from .connection import SessionLocal
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rebuild-rollups", action="store_true", help="Recalcular todos los agregados")
+    parser.add_argument("--retention-months", type=int, default=CLIMA_RETENTION_MONTHS)
+    args = parser.parse_args()
+
+    with SessionLocal() as db:
+        if args.rebuild_rollups:
+            print(f"Agregados recalculados: {rebuild_clima_rollups(db)}")
+        creadas = ensure_clima_partitions(db)
+        print(f"Particiones creadas: {creadas or 'ninguna'}")
+        print(f"Retención aplicada: {apply_clima_retention(db, meses=args.retention_months)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,53 @@
-import os
-from dotenv import load_dotenv
+from typing import Any, Dict
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
 
-load_dotenv()
+from settings import get_settings
 
-DB_URL = os.getenv("DB_URL")
+DB_URL = get_settings().db_url
 
 # engine y Session (síncrono)
 engine = create_engine(DB_URL, pool_pre_ping=True, future=True)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, expire_on_commit=False, future=True)
 
+# Drivers asíncronos equivalentes a los drivers síncronos que se usan en DB_URL
+_ASYNC_DRIVERS = {
+    "mysql": "aiomysql",
+    "sqlite": "aiosqlite",
+    "postgresql": "asyncpg",
+}
+
+def _to_async_url(url: str) -> str:
+    """
+    Convierte la URL síncrona (ej. mysql+pymysql://...) a su equivalente asíncrono
+    (mysql+aiomysql://...). Se puede sobreescribir con la variable ASYNC_DB_URL.
+    """
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    driver = _ASYNC_DRIVERS.get(backend)
+    if driver is None:
+        raise ValueError(f"No hay driver asíncrono configurado para el backend '{backend}'.")
+    return parsed.set(drivername=f"{backend}+{driver}").render_as_string(hide_password=False)
+
+ASYNC_DB_URL = get_settings().async_db_url or _to_async_url(DB_URL)
+
+# engine y Session (asíncrono) para los endpoints de FastAPI
+async_engine = create_async_engine(ASYNC_DB_URL, pool_pre_ping=True)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+def pool_status(motor) -> Dict[str, Any]:
+    """Estado del pool de conexiones (engine síncrono o asíncrono)."""
+    pool = motor.pool
+    estado: Dict[str, Any] = {"tipo": type(pool).__name__}
+    # NullPool/StaticPool (p. ej. SQLite en memoria) no llevan estas cuentas
+    for nombre in ("size", "checkedin", "checkedout", "overflow"):
+        metodo = getattr(pool, nombre, None)
+        if callable(metodo):
+            estado[nombre] = metodo()
+    return estado
+
 # Base declarativa para modelos
 Base = declarative_base()
 
@@ -37,4 +74,14 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    """
+    Generador asíncrono para usar como dependencia en FastAPI.
+    Uso:
+        async def endpoint(db: AsyncSession = Depends(get_async_db)):
+            ...
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,23 @@
+# db/init_db.py
+"""
+Crea las tablas que falten en la BD de DB_URL. La API ya no lo hace al
+importarse: se corre una vez al instalar o después de agregar un modelo (en
+MySQL también están los scripts de db/scripts/migraciones).
+
+Uso (desde agente/):
+    python -m db.init_db
+"""
+from sqlalchemy import inspect
+
+from .connection import Base, engine, init_db
+
+
+def main():
+    existentes = set(inspect(engine).get_table_names())
+    init_db()
+    nuevas = sorted(set(Base.metadata.tables) - existentes)
+    print(f"Tablas creadas: {', '.join(nuevas)}" if nuevas else "Todas las tablas ya existían.")
+
+
+if __name__ == "__main__":
+    main()
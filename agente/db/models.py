@@ -1,13 +1,13 @@
-from sqlalchemy import Column, Integer, String, Numeric, Text, DateTime, JSON
+from sqlalchemy import Column, Integer, String, Numeric, Text, Date, DateTime, JSON, Index, event
 from .connection import Base
-from datetime import datetime
+from datetime import date, datetime
 from decimal import Decimal
 from typing import Dict, Any
 
 class AtlasInundaciones(Base):
     __tablename__ = "atlas_inundaciones"
     id = Column(Integer, primary_key=True, index=True)
-    cvegeo = Column(String(20), nullable=True, index=True)
+    cvegeo = Column(String(20), nullable=True, unique=True, index=True)   # Clave de upsert del cargador
     alcaldia = Column(String(100), nullable=True, index=True)
     riesgo = Column(String(50), nullable=True, index=True)
     coordenadas = Column(String(100), nullable=True)
@@ -16,6 +16,8 @@ class AtlasInundaciones(Base):
     perimetro_m = Column(Numeric(15, 2), nullable=True)
     descripcion = Column(Text, nullable=True)
     fuente = Column(String(255), nullable=True)
+    # Última carga/actualización del registro (forma parte de la versión del atlas)
+    actualizado_en = Column(DateTime, nullable=True, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     def __repr__(self) -> str:
         return f"<AtlasInundaciones(id={self.id}, alcaldia={self.alcaldia}, riesgo={self.riesgo})>"
@@ -36,18 +38,44 @@ class AtlasInundaciones(Base):
         }
 
 
+# Revisión local del atlas: sube con cada cambio hecho por el ORM en este
+# proceso. Los cargadores masivos (Core) llaman a marcar_atlas_modificado().
+_atlas_revision = 0
+
+
+def atlas_revision() -> int:
+    return _atlas_revision
+
+
+def marcar_atlas_modificado(*_):
+    """Invalida las estructuras derivadas del atlas (índice espacial, exportaciones)."""
+    global _atlas_revision
+    _atlas_revision += 1
+
+
+for _evento in ("after_insert", "after_update", "after_delete"):
+    event.listen(AtlasInundaciones, _evento, marcar_atlas_modificado)
+
+
 class Clima(Base):
     __tablename__ = "clima"
+    # Un registro por (alcaldía, fecha, fuente): la ingesta hace upsert sobre esta
+    # clave. Su prefijo (alcaldia, fecha) sirve además a todas las consultas, que
+    # filtran por alcaldía y rango de fecha y ordenan por fecha.
+    __table_args__ = (
+        Index("ux_clima_alcaldia_fecha_fuente", "alcaldia", "fecha", "fuente", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     fecha = Column(DateTime, nullable=False, index=True)   # datetime del pronóstico/registro
-    alcaldia = Column(String(100), nullable=False, index=True)
+    alcaldia = Column(String(100), nullable=False)
     lluvia_mm = Column(Numeric(5, 2), nullable=True)
     prob_lluvia = Column(Numeric(5, 2), nullable=True)    # porcentaje 0..100
     temperatura = Column(Numeric(5, 2), nullable=True)
     humedad = Column(Numeric(5, 2), nullable=True)
     presion = Column(Numeric(7, 2), nullable=True)
-    fuente = Column(String(100), nullable=True)
+    # Parte de la clave única: nunca nula
+    fuente = Column(String(100), nullable=False, default="Desconocida", server_default="Desconocida")
 
     def __repr__(self) -> str:
         return f"<Clima(id={self.id}, fecha={self.fecha}, alcaldia={self.alcaldia})>"
@@ -64,3 +92,89 @@ class Clima(Base):
             "presion": float(self.presion) if self.presion is not None else None,
             "fuente": self.fuente,
         }
+
+# Resumen del atlas por alcaldía; se recalcula al cargar el atlas (db/atlas_summary.py)
+
+class AtlasResumenAlcaldia(Base):
+    __tablename__ = "atlas_resumen_alcaldia"
+
+    clave = Column(String(100), primary_key=True)            # Nombre normalizado (sin acentos, minúsculas)
+    alcaldia = Column(String(100), nullable=False)            # Nombre oficial
+    poligonos = Column(Integer, nullable=False, default=0)
+    area_total_m2 = Column(Numeric(18, 2), nullable=False, default=0)
+    area_riesgo_alto_m2 = Column(Numeric(18, 2), nullable=False, default=0)   # Alto + Muy Alto
+    proporcion_area_alto = Column(Numeric(6, 4), nullable=False, default=0)
+    riesgo_ponderado = Column(Numeric(5, 3), nullable=True)   # Puntaje base promedio ponderado por área (0-4)
+    riesgo = Column(String(50), nullable=True)                # Nivel del atlas más cercano al promedio ponderado
+    distribucion = Column(JSON, nullable=True)                # {nivel: {"poligonos": n, "area_m2": a}}
+    actualizado_en = Column(DateTime, nullable=True, default=datetime.utcnow)
+
+    def __repr__(self) -> str:
+        return f"<AtlasResumenAlcaldia(alcaldia={self.alcaldia}, riesgo={self.riesgo}, poligonos={self.poligonos})>"
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "clave": self.clave,
+            "alcaldia": self.alcaldia,
+            "poligonos": self.poligonos,
+            "area_total_m2": float(self.area_total_m2) if self.area_total_m2 is not None else 0.0,
+            "area_riesgo_alto_m2": float(self.area_riesgo_alto_m2) if self.area_riesgo_alto_m2 is not None else 0.0,
+            "proporcion_area_alto": float(self.proporcion_area_alto) if self.proporcion_area_alto is not None else 0.0,
+            "riesgo_ponderado": float(self.riesgo_ponderado) if self.riesgo_ponderado is not None else None,
+            "riesgo": self.riesgo,
+            "distribucion": self.distribucion or {},
+            "actualizado_en": self.actualizado_en.isoformat() if isinstance(self.actualizado_en, datetime) else self.actualizado_en,
+        }
+
+
+# Agregados de lluvia. En MySQL la tabla clima está particionada por mes y la
+# retención borra particiones viejas; estos resúmenes se conservan siempre.
+
+class ClimaDiario(Base):
+    __tablename__ = "clima_diario"
+
+    alcaldia = Column(String(100), primary_key=True)
+    fecha = Column(Date, primary_key=True)
+    lluvia_total_mm = Column(Numeric(8, 2), nullable=False, default=0)
+    lluvia_max_mm = Column(Numeric(5, 2), nullable=True)      # Máximo de un registro (3h)
+    prob_lluvia_max = Column(Numeric(5, 2), nullable=True)
+    registros = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self) -> str:
+        return f"<ClimaDiario(alcaldia={self.alcaldia}, fecha={self.fecha}, lluvia={self.lluvia_total_mm})>"
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "alcaldia": self.alcaldia,
+            "fecha": self.fecha.isoformat() if isinstance(self.fecha, date) else self.fecha,
+            "lluvia_total_mm": float(self.lluvia_total_mm) if self.lluvia_total_mm is not None else 0.0,
+            "lluvia_max_mm": float(self.lluvia_max_mm) if self.lluvia_max_mm is not None else None,
+            "prob_lluvia_max": float(self.prob_lluvia_max) if self.prob_lluvia_max is not None else None,
+            "registros": self.registros,
+        }
+
+
+class ClimaMensual(Base):
+    __tablename__ = "clima_mensual"
+
+    alcaldia = Column(String(100), primary_key=True)
+    anio = Column(Integer, primary_key=True)
+    mes = Column(Integer, primary_key=True)
+    lluvia_total_mm = Column(Numeric(10, 2), nullable=False, default=0)
+    lluvia_max_diaria_mm = Column(Numeric(8, 2), nullable=True)
+    dias_con_lluvia = Column(Integer, nullable=False, default=0)
+    registros = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self) -> str:
+        return f"<ClimaMensual(alcaldia={self.alcaldia}, {self.anio}-{self.mes:02d}, lluvia={self.lluvia_total_mm})>"
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "alcaldia": self.alcaldia,
+            "anio": self.anio,
+            "mes": self.mes,
+            "lluvia_total_mm": float(self.lluvia_total_mm) if self.lluvia_total_mm is not None else 0.0,
+            "lluvia_max_diaria_mm": float(self.lluvia_max_diaria_mm) if self.lluvia_max_diaria_mm is not None else None,
+            "dias_con_lluvia": self.dias_con_lluvia,
+            "registros": self.registros,
+        }
@@ -1,9 +1,16 @@
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import select, func
-from .models import AtlasInundaciones, Clima
+from sqlalchemy import literal_column, select, func
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from .models import AtlasInundaciones, Clima, ClimaDiario, ClimaMensual, atlas_revision
+from .clima_maintenance import refresh_clima_rollups
+from . import spatial_index
 import json
-from datetime import datetime, timedelta
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
 
 # ---------------------------
 # Atlas (polígonos / zonas)
@@ -12,10 +19,10 @@ from datetime import datetime, timedelta
 def get_forecast_from_db(db: Session, alcaldia: str, periodo_horas: int = 24) -> List[Clima]:
     """
     Obtiene el pronóstico del clima más reciente de la BD para una alcaldía
-    en un periodo determinado (24 o 48 horas).
+    en un periodo determinado (24, 48, 72 o 120 horas).
     """
-    # Determina el número de registros a obtener (8 para 24h, 16 para 48h)
-    limit = 8 if periodo_horas == 24 else 16
+    # Un registro por bloque de 3 horas (8 para 24h, 16 para 48h, 40 para 5 días)
+    limit = max(1, -(-periodo_horas // 3))
     
     # Busca los registros más recientes dentro de la ventana de tiempo
     ahora = datetime.utcnow()
@@ -56,6 +63,54 @@ def get_atlas_by_alcaldia(db: Session, alcaldia: str, exact: bool = False) -> Li
     return db.execute(stmt).scalars().all()
 
 
+def get_atlas_version(db: Session) -> str:
+    """
+    Versión del atlas: total de polígonos, id máximo y última actualización.
+    Sale solo del estado de la BD para que todos los procesos (y sus ETags)
+    coincidan; la revisión local solo adelanta la siguiente verificación.
+    """
+    stmt = select(func.count(AtlasInundaciones.id), func.max(AtlasInundaciones.id),
+                  func.max(AtlasInundaciones.actualizado_en))
+    total, max_id, actualizado = db.execute(stmt).one()
+    marca = actualizado.strftime("%Y%m%d%H%M%S") if isinstance(actualizado, datetime) else str(actualizado or 0)
+    return f"{total}-{max_id or 0}-{marca}"
+
+
+_index_lock = threading.Lock()
+
+
+def get_atlas_spatial_index(db: Session) -> spatial_index.AtlasSpatialIndex:
+    """Índice espacial del atlas (se reconstruye solo si cambia la versión)."""
+    index = spatial_index.get_index()
+    if not spatial_index.debe_verificar(index):
+        return index
+    with _index_lock:
+        index = spatial_index.get_index()
+        if not spatial_index.debe_verificar(index):
+            return index
+        revision = atlas_revision()
+        version = get_atlas_version(db)
+        if index is not None and index.version == version:
+            index.revision = revision
+            index.verificado = time.monotonic()
+            return index
+        filas = db.execute(select(*spatial_index.INDEX_COLUMNS)).all()
+        index = spatial_index.AtlasSpatialIndex(filas, version)
+        spatial_index.publicar(index)
+        return index
+
+
+def get_atlas_at_point(db: Session, lat: float, lon: float) -> List[Dict[str, Any]]:
+    """Polígonos del atlas que contienen el punto (lat, lon)."""
+    return get_atlas_spatial_index(db).query_point(lat, lon)
+
+
+def get_atlas_in_bbox(db: Session, min_lon: float, min_lat: float,
+                      max_lon: float, max_lat: float) -> List[Dict[str, Any]]:
+    """Polígonos del atlas que intersectan el rectángulo dado."""
+    return get_atlas_spatial_index(db).query_bbox(min_lon, min_lat, max_lon, max_lat)
+
+
 def create_atlas(db: Session, *, cvegeo: Optional[str] = None, alcaldia: Optional[str] = None,
                  riesgo: Optional[str] = None, coordenadas: Optional[str] = None,
                  poligono: Optional[Dict] = None, area_m2: Optional[float] = None,
@@ -144,7 +199,7 @@ def insert_clima_record(db: Session, *, fecha: datetime, alcaldia: str,
         temperatura=temperatura,
         humedad=humedad,
         presion=presion,
-        fuente=fuente,
+        fuente=fuente or CLIMA_FUENTE_DEFAULT,
     )
     db.add(obj)
     db.commit()
@@ -152,15 +207,98 @@ def insert_clima_record(db: Session, *, fecha: datetime, alcaldia: str,
     return obj
 
 
-def bulk_insert_clima(db: Session, records: List[Dict[str, Any]]) -> int:
+# Columnas que se sobrescriben cuando el registro (alcaldia, fecha, fuente) ya existe
+CLIMA_UPDATE_COLUMNS = ("lluvia_mm", "prob_lluvia", "temperatura", "humedad", "presion")
+CLIMA_FUENTE_DEFAULT = "Desconocida"
+UPSERT_BATCH_SIZE = 1000
+
+
+def _clima_upsert_stmt(dialect: str):
     """
-    Insertar lista de registros (cada registro es un dict con llaves compatibles).
-    Retorna número de registros insertados.
+    INSERT que actualiza en conflicto con la clave única, según el motor. Se
+    ejecuta con la lista de filas: el driver (pymysql) o SQLAlchemy
+    (insertmanyvalues) lo envían como un solo INSERT multi-fila por lote. En
+    PostgreSQL y SQLite regresa por fila lo necesario para saber si se insertó.
     """
-    objs = [Clima(**r) for r in records]
-    db.add_all(objs)
+    if dialect in ("mysql", "mariadb"):
+        stmt = mysql_insert(Clima)
+        return stmt.on_duplicate_key_update({c: stmt.inserted[c] for c in CLIMA_UPDATE_COLUMNS})
+    if dialect in ("sqlite", "postgresql"):
+        insert_fn = sqlite_insert if dialect == "sqlite" else postgresql_insert
+        stmt = insert_fn(Clima)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["alcaldia", "fecha", "fuente"],
+            set_={c: stmt.excluded[c] for c in CLIMA_UPDATE_COLUMNS},
+        )
+        # PostgreSQL: xmax = 0 solo en filas recién insertadas. SQLite: el id
+        # (rowid) de una fila nueva es mayor que el de cualquier fila anterior
+        return stmt.returning(literal_column("(xmax = 0)") if dialect == "postgresql" else Clima.id)
+    raise ValueError(f"Upsert de clima no soportado para el motor '{dialect}'")
+
+
+def _fecha_clima(fecha) -> datetime:
+    """Fecha del registro (datetime o texto ISO, como en Clima.as_dict) -> datetime sin zona, en UTC."""
+    if isinstance(fecha, str):
+        fecha = datetime.fromisoformat(fecha)
+    if fecha.tzinfo is not None:
+        fecha = fecha.astimezone(timezone.utc).replace(tzinfo=None)
+    return fecha
+
+
+def upsert_clima_records(db: Session, records: List[Dict[str, Any]],
+                         batch_size: int = UPSERT_BATCH_SIZE) -> Dict[str, int]:
+    """
+    Inserta o actualiza registros de clima en lotes (un INSERT ... ON DUPLICATE
+    KEY UPDATE / ON CONFLICT por lote) sobre la clave (alcaldia, fecha, fuente).
+    Repetir la misma carga no duplica filas. Los agregados diarios/mensuales
+    de los días tocados se recalculan en la misma transacción.
+    Retorna {"insertados": n, "actualizados": m}, contados por el mismo INSERT:
+    RETURNING en PostgreSQL y SQLite, rowcount en MySQL (1 por fila nueva, 2 por
+    fila modificada). Con CLIENT_FOUND_ROWS, que SQLAlchemy activa en MySQL, una
+    fila reescrita con los mismos valores también cuenta 1 y queda en "insertados".
+    """
+    columnas = [c.name for c in Clima.__table__.columns if c.name != "id"]
+    # Registros repetidos dentro de la misma carga: gana el último
+    unicos = {}
+    for r in records:
+        fila = {c: r.get(c) for c in columnas}
+        fila["fuente"] = fila["fuente"] or CLIMA_FUENTE_DEFAULT
+        fila["fecha"] = _fecha_clima(fila["fecha"])
+        unicos[(fila["alcaldia"], fila["fecha"], fila["fuente"])] = fila
+    filas = list(unicos.values())
+
+    dialect = db.get_bind().dialect.name
+    stmt = _clima_upsert_stmt(dialect)
+    insertados = actualizados = 0
+    # SQLite serializa las escrituras: los ids por encima de este son filas nuevas
+    ultimo_id = (db.execute(select(func.max(Clima.id))).scalar() or 0) if dialect == "sqlite" and filas else 0
+    for i in range(0, len(filas), batch_size):
+        lote = filas[i:i + batch_size]
+        resultado = db.execute(stmt, lote)
+        if dialect == "postgresql":
+            nuevos = sum(1 for (insertado,) in resultado if insertado)
+        elif dialect == "sqlite":
+            ids = resultado.scalars().all()
+            nuevos = sum(1 for id_ in ids if id_ > ultimo_id)
+            ultimo_id = max([ultimo_id, *ids])
+        else:
+            nuevos = len(lote) - max(0, resultado.rowcount - len(lote))
+        insertados += nuevos
+        actualizados += len(lote) - nuevos
+    if filas:
+        fechas = [f["fecha"] for f in filas]
+        refresh_clima_rollups(db, min(fechas), max(fechas), alcaldias={f["alcaldia"] for f in filas})
     db.commit()
-    return len(objs)
+    return {"insertados": insertados, "actualizados": actualizados}
+
+
+def bulk_insert_clima(db: Session, records: List[Dict[str, Any]]) -> int:
+    """
+    Guarda una lista de registros (dicts con llaves compatibles) mediante
+    upsert_clima_records. Retorna número de registros escritos.
+    """
+    resultado = upsert_clima_records(db, records)
+    return resultado["insertados"] + resultado["actualizados"]
 
 
 def get_recent_clima_by_alcaldia(db: Session, alcaldia: str, limit: int = 24) -> List[Clima]:
@@ -179,19 +317,46 @@ def get_clima_by_date_range(db: Session, alcaldia: str, start: datetime, end: da
     return db.execute(stmt).scalars().all()
 
 
+def month_range(year: int, month: int) -> Tuple[datetime, datetime]:
+    """[inicio, fin) del mes: comparar `fecha` contra un rango permite usar el índice."""
+    inicio = datetime(year, month, 1)
+    fin = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+    return inicio, fin
+
+
 def get_monthly_rainfall_sum(db: Session, alcaldia: str, year: int, month: int) -> float:
     """
     Suma de lluvia (lluvia_mm) para una alcaldía en mes/año dados.
-    (Usa func.extract; para MySQL funciona mediante YEAR/MONTH)
+    Se lee del agregado clima_mensual (una fila), no de los datos crudos,
+    que además pueden haberse eliminado por retención.
     """
-    stmt = select(func.sum(Clima.lluvia_mm)).where(
-        Clima.alcaldia == alcaldia,
-        func.extract('year', Clima.fecha) == year,
-        func.extract('month', Clima.fecha) == month
+    stmt = select(ClimaMensual.lluvia_total_mm).where(
+        ClimaMensual.alcaldia == alcaldia,
+        ClimaMensual.anio == year,
+        ClimaMensual.mes == month
     )
     res = db.execute(stmt).scalar_one_or_none()
     return float(res) if res is not None else 0.0
 
+
+def get_daily_rainfall(db: Session, alcaldia: str, start: date, end: date) -> List[ClimaDiario]:
+    """Lluvia diaria agregada de una alcaldía entre dos fechas (inclusive)."""
+    stmt = select(ClimaDiario).where(
+        ClimaDiario.alcaldia == alcaldia,
+        ClimaDiario.fecha >= start,
+        ClimaDiario.fecha <= end
+    ).order_by(ClimaDiario.fecha)
+    return db.execute(stmt).scalars().all()
+
+
+def get_monthly_rainfall(db: Session, alcaldia: str, year: int) -> List[ClimaMensual]:
+    """Agregados mensuales de lluvia de una alcaldía para un año."""
+    stmt = select(ClimaMensual).where(
+        ClimaMensual.alcaldia == alcaldia,
+        ClimaMensual.anio == year
+    ).order_by(ClimaMensual.mes)
+    return db.execute(stmt).scalars().all()
+
 def get_all_alcaldias(db: Session) -> List[str]:
     """Obtiene todas las alcaldías únicas de la base de datos"""
     try:
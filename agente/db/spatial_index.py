@@ -0,0 +1,97 @@
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import shapely
+from shapely.geometry import box, shape
+
+from .models import AtlasInundaciones, atlas_revision
+
+# Columnas necesarias para construir el índice (sin descripción ni fuente)
+INDEX_COLUMNS = (
+    AtlasInundaciones.id,
+    AtlasInundaciones.cvegeo,
+    AtlasInundaciones.alcaldia,
+    AtlasInundaciones.riesgo,
+    AtlasInundaciones.area_m2,
+    AtlasInundaciones.poligono,
+)
+# Cada cuánto se compara la versión del atlas en BD contra la del índice (segundos)
+VERIFICACION_SEGUNDOS = 60.0
+
+
+class AtlasSpatialIndex:
+    """
+    Índice espacial en memoria (STRtree) sobre los polígonos del atlas, con
+    geometrías preparadas para consultas punto-en-polígono y por bbox.
+    Coordenadas en grados (lon, lat), igual que el GeoJSON almacenado.
+    """
+
+    def __init__(self, filas: Sequence[Sequence[Any]], version: str):
+        self.version = version
+        self.revision = atlas_revision()
+        self.propiedades: List[Dict[str, Any]] = []
+        geometrias = []
+        for id_, cvegeo, alcaldia, riesgo, area_m2, poligono in filas:
+            geom = _a_geometria(poligono)
+            if geom is None:
+                continue
+            geometrias.append(geom)
+            self.propiedades.append({
+                "id": id_,
+                "cvegeo": cvegeo,
+                "alcaldia": alcaldia,
+                "riesgo": riesgo,
+                "area_m2": float(area_m2) if area_m2 is not None else None,
+            })
+        self.geometrias = shapely.make_valid(geometrias) if geometrias else geometrias
+        shapely.prepare(self.geometrias)
+        self.tree = shapely.STRtree(self.geometrias)
+        self.verificado = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self.propiedades)
+
+    def query_point(self, lat: float, lon: float) -> List[Dict[str, Any]]:
+        """Polígonos que contienen (o tocan) el punto."""
+        indices = self.tree.query(shapely.Point(lon, lat), predicate="intersects")
+        return [self.propiedades[i] for i in sorted(indices)]
+
+    def query_bbox_indices(self, min_lon: float, min_lat: float, max_lon: float, max_lat: float):
+        """Índices (posiciones) de los polígonos que intersectan el rectángulo."""
+        return sorted(self.tree.query(box(min_lon, min_lat, max_lon, max_lat), predicate="intersects"))
+
+    def query_bbox(self, min_lon: float, min_lat: float, max_lon: float, max_lat: float) -> List[Dict[str, Any]]:
+        """Polígonos que intersectan el rectángulo."""
+        return [self.propiedades[i] for i in self.query_bbox_indices(min_lon, min_lat, max_lon, max_lat)]
+
+
+def _a_geometria(poligono):
+    """GeoJSON (dict o str) -> geometría shapely; None si no es válido."""
+    try:
+        if isinstance(poligono, str):
+            return shapely.from_geojson(poligono)
+        return shape(poligono) if poligono else None
+    except Exception:
+        return None
+
+
+_index: Optional[AtlasSpatialIndex] = None
+
+
+def get_index() -> Optional[AtlasSpatialIndex]:
+    """Índice publicado actualmente (puede estar pendiente de verificar)."""
+    return _index
+
+
+def publicar(index: AtlasSpatialIndex):
+    global _index
+    _index = index
+
+
+def debe_verificar(index: Optional[AtlasSpatialIndex]) -> bool:
+    """True si no hay índice, si el atlas cambió en este proceso o si toca revisar la BD."""
+    return (
+        index is None
+        or index.revision != atlas_revision()
+        or time.monotonic() - index.verificado > VERIFICACION_SEGUNDOS
+    )
@@ -0,0 +1,65 @@
+# services/alcaldias.py
+import unicodedata
+from typing import Dict, Optional
+
+# Coordenadas de referencia de las 16 alcaldías (las mismas que usa
+# db/scripts/cargar_clima_report.py). No cambian, así que sirven como
+# semilla del caché de geocodificación.
+ALCALDIAS_CDMX = {
+    "Álvaro Obregón": (19.3500, -99.2361),
+    "Azcapotzalco": (19.4833, -99.1703),
+    "Benito Juárez": (19.4008, -99.1641),
+    "Coyoacán": (19.3500, -99.1625),
+    "Cuajimalpa de Morelos": (19.3556, -99.2747),
+    "Cuauhtémoc": (19.4333, -99.1333),
+    "Gustavo A. Madero": (19.4861, -99.1200),
+    "Iztacalco": (19.3897, -99.0961),
+    "Iztapalapa": (19.3569, -99.0721),
+    "La Magdalena Contreras": (19.2833, -99.2333),
+    "Miguel Hidalgo": (19.4270, -99.1826),
+    "Milpa Alta": (19.0960, -99.0300),
+    "Tláhuac": (19.3200, -99.0020),
+    "Tlalpan": (19.2826, -99.1406),
+    "Venustiano Carranza": (19.4240, -99.1000),
+    "Xochimilco": (19.2579, -99.1005),
+}
+
+# Nombres alternos que aparecen en scripts y consultas de usuarios
+_ALIAS = {
+    "cuajimalpa": "Cuajimalpa de Morelos",
+    "magdalena contreras": "La Magdalena Contreras",
+    "gam": "Gustavo A. Madero",
+}
+
+
+def _sin_acentos(texto: str) -> str:
+    return "".join(c for c in unicodedata.normalize("NFKD", texto) if not unicodedata.combining(c))
+
+
+def normalizar_alcaldia(nombre: str) -> str:
+    """Llave normalizada: minúsculas, sin acentos y con espacios simples."""
+    return " ".join(_sin_acentos(nombre).lower().split())
+
+
+def _construir_indice() -> Dict[str, str]:
+    indice = {}
+    for canonico in ALCALDIAS_CDMX:
+        indice[normalizar_alcaldia(canonico)] = canonico
+        # El CSV del atlas trae los caracteres acentuados eliminados ("lvaro Obregn")
+        sin_no_ascii = "".join(c for c in canonico if ord(c) < 128)
+        indice[normalizar_alcaldia(sin_no_ascii)] = canonico
+    for alias, canonico in _ALIAS.items():
+        indice[alias] = canonico
+    return indice
+
+_INDICE = _construir_indice()
+
+
+def nombre_canonico(nombre: str) -> Optional[str]:
+    """Regresa el nombre oficial de la alcaldía, o None si no es una de las 16."""
+    return _INDICE.get(normalizar_alcaldia(nombre))
+
+
+def clave_alcaldia(nombre: str) -> str:
+    """Llave de búsqueda: nombre oficial normalizado (o el nombre tal cual si no es una de las 16)."""
+    return normalizar_alcaldia(nombre_canonico(nombre) or nombre)
@@ -0,0 +1,62 @@
+# services/cache.py
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+_SIN_VALOR = object()
+
+
+class TTLCache:
+    """
+    Caché LRU en memoria con expiración por entrada.
+    No es thread-safe: está pensado para usarse dentro del event loop de la app.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = 3600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._datos: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entrada = self._datos.get(key, _SIN_VALOR)
+        if entrada is _SIN_VALOR:
+            self.misses += 1
+            return default
+        valor, expira = entrada
+        if expira is not None and expira <= time.monotonic():
+            del self._datos[key]
+            self.misses += 1
+            return default
+        self._datos.move_to_end(key)
+        self.hits += 1
+        return valor
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = _SIN_VALOR):
+        """Guarda un valor. `ttl=None` hace que la entrada no expire."""
+        ttl = self.ttl if ttl is _SIN_VALOR else ttl
+        expira = time.monotonic() + ttl if ttl is not None else None
+        self._datos[key] = (value, expira)
+        self._datos.move_to_end(key)
+        while len(self._datos) > self.maxsize:
+            self._datos.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entrada = self._datos.pop(key, None)
+        return entrada[0] if entrada else default
+
+    def clear(self):
+        self._datos.clear()
+
+    def __len__(self) -> int:
+        return len(self._datos)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entradas": len(self._datos),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
@@ -0,0 +1,94 @@
+# services/forecast_cache.py
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from services.cache import TTLCache
+from settings import get_settings
+
+# OpenWeatherMap publica un pronóstico por bloque de 3 horas (00, 03, 06... UTC).
+# Una entrada vive como máximo hasta el siguiente bloque.
+FORECAST_STEP_SECONDS = 3 * 3600
+FORECAST_CACHE_TTL = get_settings().forecast_cache_ttl or FORECAST_STEP_SECONDS
+# 2 decimales ~ 1.1 km: todas las consultas de una misma alcaldía caen en la misma llave
+FORECAST_CACHE_PRECISION = 2
+
+
+def segundos_hasta_siguiente_bloque(ahora: Optional[float] = None) -> float:
+    """Segundos que faltan para el siguiente bloque de 3h del pronóstico."""
+    ahora = time.time() if ahora is None else ahora
+    return FORECAST_STEP_SECONDS - (ahora % FORECAST_STEP_SECONDS)
+
+
+class ForecastCache:
+    """
+    Caché de pronósticos por coordenada redondeada con de-duplicación
+    (single-flight): si varias peticiones piden la misma llave mientras la
+    primera sigue esperando a la API, todas comparten esa única llamada.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = FORECAST_CACHE_TTL,
+                 precision: int = FORECAST_CACHE_PRECISION):
+        self.ttl = ttl
+        self.precision = precision
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._en_vuelo: Dict[Tuple[float, float], asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def clave(self, lat: float, lon: float) -> Tuple[float, float]:
+        return (round(lat, self.precision), round(lon, self.precision))
+
+    async def get_or_fetch(self, lat: float, lon: float,
+                           fetch: Callable[[], Awaitable[Optional[Dict]]]) -> Optional[Dict]:
+        """Regresa el pronóstico en caché o ejecuta `fetch` una sola vez por llave."""
+        clave = self.clave(lat, lon)
+        datos = self._cache.get(clave)
+        if datos is not None:
+            self.hits += 1
+            return datos
+
+        tarea = self._en_vuelo.get(clave)
+        if tarea is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            tarea = asyncio.ensure_future(self._obtener(clave, fetch))
+            self._en_vuelo[clave] = tarea
+        # shield: si una petición se cancela, las demás siguen esperando el resultado
+        return await asyncio.shield(tarea)
+
+    async def _obtener(self, clave, fetch) -> Optional[Dict]:
+        try:
+            datos = await fetch()
+            if datos is not None:
+                self._cache.set(clave, datos, ttl=min(self.ttl, segundos_hasta_siguiente_bloque()))
+            return datos
+        finally:
+            self._en_vuelo.pop(clave, None)
+
+    def invalidate(self, lat: float, lon: float):
+        self._cache.pop(self.clave(lat, lon))
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses + self.coalesced
+        return {
+            "entradas": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "en_vuelo": len(self._en_vuelo),
+            "hit_rate": round((self.hits + self.coalesced) / total, 4) if total else 0.0,
+        }
+
+
+_cache: Optional[ForecastCache] = None
+
+
+def get_forecast_cache() -> ForecastCache:
+    """Caché compartido por todo el proceso."""
+    global _cache
+    if _cache is None:
+        _cache = ForecastCache()
+    return _cache
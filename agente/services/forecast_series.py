@@ -0,0 +1,126 @@
+# services/forecast_series.py
+"""
+Pronóstico de una alcaldía en columnas (un arreglo numpy por variable) con los
+40 bloques de 3 horas que entrega OpenWeatherMap (5 días). Cualquier horizonte
+(24/48/72/120 h) se obtiene rebanando la misma serie, sin volver a llamar a la API.
+"""
+import math
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Mapping
+
+import numpy as np
+
+PASO_HORAS = 3
+SLOTS_MAXIMOS = 40  # 5 días / 3 horas
+HORIZONTES = (24, 48, 72, 120)
+FUENTE_OPENWEATHER = "OpenWeatherMap"
+
+# Variables numéricas de la serie (mismos nombres que las columnas de la tabla clima)
+COLUMNAS = ("lluvia_mm", "prob_lluvia", "temperatura", "humedad", "presion")
+
+
+def slots_para_horizonte(horas: int) -> int:
+    """Bloques de 3 horas necesarios para cubrir `horas` (24h -> 8, 48h -> 16)."""
+    return min(SLOTS_MAXIMOS, max(0, math.ceil(horas / PASO_HORAS)))
+
+
+def _epoch(fecha) -> int:
+    """Fecha del registro (datetime o texto ISO, como en Clima.as_dict) -> segundos epoch."""
+    if isinstance(fecha, str):
+        fecha = datetime.fromisoformat(fecha)
+    return int(fecha.timestamp())
+
+
+def _columna(valores: Iterable[Any]) -> np.ndarray:
+    return np.array([np.nan if v is None else float(v) for v in valores], dtype=np.float64)
+
+
+@dataclass(frozen=True)
+class ForecastSeries:
+    """Serie columnar de pronóstico; `dt` son segundos epoch del inicio de cada bloque."""
+    alcaldia: str
+    fuente: str
+    dt: np.ndarray
+    lluvia_mm: np.ndarray
+    prob_lluvia: np.ndarray
+    temperatura: np.ndarray
+    humedad: np.ndarray
+    presion: np.ndarray
+
+    @classmethod
+    def from_api(cls, forecast_data: Mapping[str, Any], alcaldia: str) -> "ForecastSeries":
+        """Respuesta de /forecast de OpenWeatherMap -> serie con todos sus bloques."""
+        lista = forecast_data.get('list', [])[:SLOTS_MAXIMOS]
+        return cls(
+            alcaldia=alcaldia,
+            fuente=FUENTE_OPENWEATHER,
+            dt=np.array([f['dt'] for f in lista], dtype=np.int64),
+            # El valor '3h' es el volumen de las últimas 3h. No se necesita dividir.
+            lluvia_mm=_columna(f.get('rain', {}).get('3h', 0.0) for f in lista),
+            # 'pop' es la probabilidad de precipitación (0 a 1), se guarda en %.
+            prob_lluvia=_columna(f.get('pop', 0.0) * 100 for f in lista),
+            temperatura=_columna(f['main']['temp'] for f in lista),
+            humedad=_columna(f['main']['humidity'] for f in lista),
+            presion=_columna(f['main']['pressure'] for f in lista),
+        )
+
+    @classmethod
+    def from_records(cls, registros: List[Dict[str, Any]], alcaldia: str) -> "ForecastSeries":
+        """Registros de la tabla clima (en cualquier orden) -> serie ordenada por fecha."""
+        registros = sorted(registros, key=lambda r: _epoch(r["fecha"]))
+        fuente = (registros[0].get("fuente") if registros else None) or FUENTE_OPENWEATHER
+        return cls(
+            alcaldia=alcaldia,
+            fuente=fuente,
+            dt=np.array([_epoch(r["fecha"]) for r in registros], dtype=np.int64),
+            **{c: _columna(r.get(c) for r in registros) for c in COLUMNAS},
+        )
+
+    @classmethod
+    def from_rows(cls, filas: Iterable[Any], alcaldia: str) -> "ForecastSeries":
+        """Filas del ORM (Clima) -> serie; lee los atributos sin pasar por as_dict."""
+        filas = sorted(filas, key=lambda f: _epoch(f.fecha))
+        fuente = (filas[0].fuente if filas else None) or FUENTE_OPENWEATHER
+        return cls(
+            alcaldia=alcaldia,
+            fuente=fuente,
+            dt=np.array([_epoch(f.fecha) for f in filas], dtype=np.int64),
+            **{c: _columna(getattr(f, c) for f in filas) for c in COLUMNAS},
+        )
+
+    def __len__(self) -> int:
+        return len(self.dt)
+
+    def horizonte(self, horas: int) -> "ForecastSeries":
+        """Los primeros bloques que cubren `horas` (vistas de los mismos arreglos, sin copiar)."""
+        n = slots_para_horizonte(horas)
+        return ForecastSeries(
+            alcaldia=self.alcaldia,
+            fuente=self.fuente,
+            dt=self.dt[:n],
+            **{c: getattr(self, c)[:n] for c in COLUMNAS},
+        )
+
+    def lluvia_total(self, horas: int) -> float:
+        """Lluvia acumulada (mm) en las próximas `horas`."""
+        return round(float(np.nansum(self.lluvia_mm[:slots_para_horizonte(horas)])), 2)
+
+    def lluvia_por_horizonte(self, horizontes: Iterable[int] = HORIZONTES) -> Dict[int, float]:
+        """Lluvia acumulada para cada horizonte con una sola suma acumulada."""
+        acumulada = np.concatenate(([0.0], np.cumsum(np.nan_to_num(self.lluvia_mm))))
+        return {h: round(float(acumulada[min(slots_para_horizonte(h), len(self))]), 2) for h in horizontes}
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        """Registros con el formato de la tabla clima."""
+        columnas = {c: getattr(self, c).tolist() for c in COLUMNAS}
+        registros = []
+        for i, dt in enumerate(self.dt.tolist()):
+            registro = {
+                "fecha": datetime.fromtimestamp(dt),
+                "alcaldia": self.alcaldia,
+                **{c: (None if math.isnan(columnas[c][i]) else columnas[c][i]) for c in COLUMNAS},
+                "fuente": self.fuente,
+            }
+            registros.append(registro)
+        return registros
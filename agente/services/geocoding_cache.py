@@ -0,0 +1,118 @@
+# services/geocoding_cache.py
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+from services.alcaldias import ALCALDIAS_CDMX, nombre_canonico, normalizar_alcaldia
+from services.cache import TTLCache
+from settings import get_settings
+
+# Las coordenadas de una alcaldía no cambian: en memoria se guardan un día y en
+# disco 30 días. Las entradas sembradas con la tabla de alcaldías nunca expiran.
+GEOCODING_MEMORY_TTL = 24 * 3600
+GEOCODING_DISK_TTL = 30 * 24 * 3600
+GEOCODING_CACHE_PATH = get_settings().geocoding_cache_path or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache", "geocoding.sqlite"
+)
+
+
+class GeocodingCache:
+    """
+    Caché de geocodificación en dos niveles: LRU en memoria con TTL y un
+    respaldo persistente en SQLite que sobrevive reinicios.
+    """
+
+    def __init__(self, path: Optional[str] = GEOCODING_CACHE_PATH, maxsize: int = 512):
+        self.memoria = TTLCache(maxsize=maxsize, ttl=GEOCODING_MEMORY_TTL)
+        self._lock = threading.Lock()
+        self._conn = None
+        if path:
+            try:
+                if path != ":memory:":
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                self._conn = sqlite3.connect(path, check_same_thread=False)
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS geocoding ("
+                    " clave TEXT PRIMARY KEY, lat REAL NOT NULL, lon REAL NOT NULL,"
+                    " fuente TEXT NOT NULL, actualizado REAL NOT NULL)"
+                )
+                self._conn.commit()
+            except sqlite3.Error as e:
+                print(f"ADVERTENCIA: caché de geocodificación sin persistencia ({e}).")
+                self._conn = None
+        self.sembrar_alcaldias()
+
+    @staticmethod
+    def clave(nombre: str) -> str:
+        """Las 16 alcaldías comparten llave sin importar acentos o alias."""
+        canonico = nombre_canonico(nombre)
+        return normalizar_alcaldia(canonico or nombre)
+
+    def sembrar_alcaldias(self):
+        """Precarga la tabla fija de coordenadas de las alcaldías."""
+        filas = []
+        for nombre, (lat, lon) in ALCALDIAS_CDMX.items():
+            clave = self.clave(nombre)
+            self.memoria.set(clave, {"lat": lat, "lon": lon}, ttl=None)
+            filas.append((clave, lat, lon, "semilla", time.time()))
+        if self._conn is None:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO geocoding (clave, lat, lon, fuente, actualizado) VALUES (?, ?, ?, ?, ?)",
+                filas,
+            )
+            self._conn.commit()
+
+    def get(self, nombre: str) -> Optional[Dict[str, float]]:
+        clave = self.clave(nombre)
+        coords = self.memoria.get(clave)
+        if coords is not None:
+            return coords
+        coords = self._leer_disco(clave)
+        if coords is not None:
+            self.memoria.set(clave, coords)
+        return coords
+
+    def set(self, nombre: str, coords: Dict[str, float], fuente: str = "nominatim"):
+        clave = self.clave(nombre)
+        coords = {"lat": float(coords["lat"]), "lon": float(coords["lon"])}
+        self.memoria.set(clave, coords)
+        if self._conn is None:
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO geocoding (clave, lat, lon, fuente, actualizado) VALUES (?, ?, ?, ?, ?)",
+                (clave, coords["lat"], coords["lon"], fuente, time.time()),
+            )
+            self._conn.commit()
+
+    def _leer_disco(self, clave: str) -> Optional[Dict[str, float]]:
+        if self._conn is None:
+            return None
+        with self._lock:
+            fila = self._conn.execute(
+                "SELECT lat, lon, fuente, actualizado FROM geocoding WHERE clave = ?", (clave,)
+            ).fetchone()
+        if fila is None:
+            return None
+        lat, lon, fuente, actualizado = fila
+        if fuente != "semilla" and time.time() - actualizado > GEOCODING_DISK_TTL:
+            return None
+        return {"lat": lat, "lon": lon}
+
+    def stats(self) -> Dict:
+        return self.memoria.stats()
+
+
+_cache: Optional[GeocodingCache] = None
+
+
+def get_geocoding_cache() -> GeocodingCache:
+    """Caché compartido por todo el proceso."""
+    global _cache
+    if _cache is None:
+        _cache = GeocodingCache()
+    return _cache
@@ -0,0 +1,153 @@
+# services/geojson_export.py
+import asyncio
+import gzip
+import hashlib
+import json
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional, Tuple
+
+import orjson
+import shapely
+from shapely.geometry import shape
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from db.async_operations import stream_atlas_rows
+from db.connection import AsyncSessionLocal
+from services.alcaldias import clave_alcaldia
+from services.cache import TTLCache
+from settings import get_settings
+
+# Exportaciones completas guardadas en memoria (las claves incluyen la versión del atlas)
+GEOJSON_CACHE_MAX = get_settings().geojson_cache_max
+# Tolerancia de simplificación en píxeles de pantalla (tiles de 256 px)
+TOLERANCIA_PIXELES = 0.5
+# Features por bloque enviado al cliente
+FEATURES_POR_BLOQUE = 200
+
+Bbox = Tuple[float, float, float, float]
+
+
+def tolerancia_para_zoom(zoom: Optional[int]) -> float:
+    """Grados equivalentes a TOLERANCIA_PIXELES al zoom dado (0 = sin simplificar)."""
+    if zoom is None:
+        return 0.0
+    return TOLERANCIA_PIXELES * 360.0 / (256 * 2 ** zoom)
+
+
+def clave_exportacion(atlas_version: str, zoom: Optional[int], alcaldia: Optional[str],
+                      bbox: Optional[Bbox]) -> Tuple:
+    return (
+        atlas_version,
+        zoom,
+        clave_alcaldia(alcaldia) if alcaldia else None,
+        tuple(round(c, 6) for c in bbox) if bbox else None,
+    )
+
+
+def etag_exportacion(clave: Tuple) -> str:
+    return '"' + hashlib.sha1(repr(clave).encode("utf-8")).hexdigest()[:24] + '"'
+
+
+@dataclass(frozen=True)
+class ExportacionCacheada:
+    etag: str
+    cuerpo: bytes
+    cuerpo_gzip: bytes
+
+
+def _geometria(poligono, tolerancia: float):
+    """Geometría lista para orjson: el dict original, o simplificada como fragmento JSON."""
+    if isinstance(poligono, str):
+        try:
+            poligono = json.loads(poligono)
+        except Exception:
+            return None
+    if not poligono or tolerancia <= 0:
+        return poligono
+    try:
+        geom = shapely.simplify(shape(poligono), tolerancia, preserve_topology=True)
+        return orjson.Fragment(shapely.to_geojson(geom))
+    except Exception:
+        return poligono
+
+
+def feature_bytes(fila, tolerancia: float = 0.0) -> bytes:
+    """Serializa una fila de EXPORT_COLUMNS como Feature GeoJSON."""
+    return orjson.dumps({
+        "type": "Feature",
+        "geometry": _geometria(fila.poligono, tolerancia),
+        "properties": {
+            "id": fila.id,
+            "cvegeo": fila.cvegeo,
+            "alcaldia": fila.alcaldia,
+            "riesgo": fila.riesgo,
+            "area_m2": float(fila.area_m2) if fila.area_m2 is not None else None,
+            "perimetro_m": float(fila.perimetro_m) if fila.perimetro_m is not None else None,
+            "descripcion": fila.descripcion,
+            "fuente": fila.fuente,
+        },
+    })
+
+
+def _bloque_bytes(filas, tolerancia: float, primera: bool) -> bytes:
+    """Features de un bloque separadas por comas (con la coma inicial si no es el primero)."""
+    if not filas:
+        return b""
+    datos = b",".join(feature_bytes(fila, tolerancia) for fila in filas)
+    return datos if primera else b"," + datos
+
+
+class GeoJSONExporter:
+    """
+    Exporta el atlas como FeatureCollection enviando las features conforme se
+    leen de la BD. Al terminar una exportación completa guarda el cuerpo (y su
+    versión gzip) para que las siguientes peticiones iguales no toquen la BD.
+    """
+
+    def __init__(self, sesiones: async_sessionmaker = AsyncSessionLocal,
+                 maxsize: int = GEOJSON_CACHE_MAX):
+        self.sesiones = sesiones
+        self.cache = TTLCache(maxsize=maxsize, ttl=None)
+
+    def get(self, clave: Tuple) -> Optional[ExportacionCacheada]:
+        return self.cache.get(clave)
+
+    async def stream(self, clave: Tuple, alcaldia: Optional[str] = None, ids=None,
+                     zoom: Optional[int] = None) -> AsyncIterator[bytes]:
+        tolerancia = tolerancia_para_zoom(zoom)
+        partes = []
+        filas = []
+        primera = True
+        inicio = b'{"type":"FeatureCollection","features":['
+        partes.append(inicio)
+        yield inicio
+        # Sesión propia: la del endpoint se cierra antes de enviar el cuerpo
+        async with self.sesiones() as db:
+            async for fila in stream_atlas_rows(db, alcaldia=alcaldia, ids=ids):
+                filas.append(fila)
+                if len(filas) >= FEATURES_POR_BLOQUE:
+                    # shapely y orjson fuera del event loop, un bloque a la vez
+                    datos = await asyncio.to_thread(_bloque_bytes, filas, tolerancia, primera)
+                    partes.append(datos)
+                    filas, primera = [], False
+                    yield datos
+        datos = await asyncio.to_thread(_bloque_bytes, filas, tolerancia, primera) + b"]}"
+        partes.append(datos)
+        yield datos
+
+        cuerpo = b"".join(partes)
+        cuerpo_gzip = await asyncio.to_thread(gzip.compress, cuerpo, 6)
+        self.cache.set(clave, ExportacionCacheada(etag_exportacion(clave), cuerpo, cuerpo_gzip))
+
+    def clear(self):
+        self.cache.clear()
+
+
+_exporter: Optional[GeoJSONExporter] = None
+
+
+def get_geojson_exporter() -> GeoJSONExporter:
+    global _exporter
+    if _exporter is None:
+        _exporter = GeoJSONExporter()
+    return _exporter
@@ -0,0 +1,74 @@
+# services/http_cache.py
+"""
+Caché HTTP de las respuestas que dependen del pronóstico y del atlas. Cada
+respuesta se versiona con la versión del atlas y el bloque de 3 horas del
+pronóstico vigente, así que la ETag se calcula sin correr el agente: un
+If-None-Match que coincide se contesta con 304, y un 200 con la misma ETag
+regresa exactamente los mismos bytes (ETag fuerte), guardados hasta que empiece
+el siguiente bloque.
+"""
+import hashlib
+import time
+from typing import Dict, Optional
+
+from fastapi.responses import Response
+
+from services.cache import TTLCache
+from services.forecast_cache import FORECAST_STEP_SECONDS, segundos_hasta_siguiente_bloque
+
+# La lista de alcaldías solo cambia con el atlas
+MAX_AGE_ATLAS = 3600
+RESPUESTAS_MAX = 512
+
+
+def bloque_pronostico(ahora: Optional[float] = None) -> int:
+    """Número del bloque de 3 horas en curso (cambia cuando OpenWeatherMap publica uno nuevo)."""
+    return int((time.time() if ahora is None else ahora) // FORECAST_STEP_SECONDS)
+
+
+def etag(*partes) -> str:
+    """ETag fuerte a partir de las partes que determinan la respuesta."""
+    return '"' + hashlib.sha1("|".join(map(str, partes)).encode("utf-8")).hexdigest()[:24] + '"'
+
+
+def cache_control_pronostico(ahora: Optional[float] = None) -> str:
+    """La respuesta vale hasta el siguiente bloque del pronóstico."""
+    return f"public, max-age={max(1, int(segundos_hasta_siguiente_bloque(ahora)))}"
+
+
+def coincide(if_none_match: Optional[str], valor: str) -> bool:
+    """Comparación de If-None-Match (débil, como pide HTTP para GET): lista de ETags o '*'."""
+    if not if_none_match:
+        return False
+    candidatos = [c.strip() for c in if_none_match.split(",")]
+    return "*" in candidatos or any(c.removeprefix("W/") == valor for c in candidatos)
+
+
+def no_modificado(headers: Dict[str, str]) -> Response:
+    return Response(status_code=304, headers=headers)
+
+
+class HTTPResponseCache:
+    """Cuerpos ya serializados por ETag; cada uno vive hasta el fin de su bloque."""
+
+    def __init__(self, maxsize: int = RESPUESTAS_MAX):
+        self.cache = TTLCache(maxsize=maxsize, ttl=FORECAST_STEP_SECONDS)
+
+    def get(self, valor: str) -> Optional[bytes]:
+        return self.cache.get(valor)
+
+    def set(self, valor: str, cuerpo: bytes, ttl: Optional[float] = None):
+        self.cache.set(valor, cuerpo, ttl=ttl if ttl is not None else segundos_hasta_siguiente_bloque())
+
+    def stats(self) -> Dict:
+        return self.cache.stats()
+
+
+_cache: Optional[HTTPResponseCache] = None
+
+
+def get_http_response_cache() -> HTTPResponseCache:
+    global _cache
+    if _cache is None:
+        _cache = HTTPResponseCache()
+    return _cache
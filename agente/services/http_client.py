@@ -0,0 +1,35 @@
+# services/http_client.py
+import httpx
+from typing import Optional
+
+# Cliente HTTP compartido por todo el proceso. Mantiene un pool de conexiones
+# keep-alive hacia Nominatim y OpenWeatherMap, así cada predicción reutiliza
+# conexiones TCP/TLS ya abiertas en lugar de hacer un handshake nuevo.
+HTTP_TIMEOUT = httpx.Timeout(10.0, connect=3.0, pool=5.0)
+HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=60.0)
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+async def start_http_client() -> httpx.AsyncClient:
+    """Abre el cliente compartido (se llama desde el lifespan de la app)."""
+    return get_http_client()
+
+
+async def close_http_client():
+    """Cierra el cliente compartido y libera las conexiones del pool."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Regresa el cliente compartido. Si la app no lo abrió (scripts, pruebas),
+    se crea bajo demanda y queda vivo para el resto del proceso.
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(timeout=HTTP_TIMEOUT, limits=HTTP_LIMITS)
+    return _client
@@ -0,0 +1,134 @@
+# services/ingestion.py
+"""
+Ingesta del pronóstico de OpenWeatherMap para las 16 alcaldías: todas las
+peticiones salen en paralelo (limitadas por el token bucket compartido, con
+reintentos y backoff con jitter) y el ciclo termina con una sola escritura por
+lotes en la tabla clima.
+
+Uso (desde agente/):
+    python -m services.ingestion            # un ciclo
+    python -m services.ingestion --loop     # ciclo cada INGESTION_INTERVAL segundos
+
+La ingesta programada corre en un solo proceso: `--loop` como servicio aparte
+(o desde cron sin `--loop`), o bien INGESTION_ENABLED=true en un único worker
+de la API. El límite de 60 llamadas/min de OpenWeatherMap se cumple por
+proceso, así que N procesos con ingesta harían N veces las llamadas.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from sqlalchemy.orm import sessionmaker
+
+from db.connection import SessionLocal
+from db.operations import upsert_clima_records
+from services.alcaldias import ALCALDIAS_CDMX
+from services.http_client import close_http_client
+from services.wheater_api import WeatherService, transform_forecast_to_db_records
+from settings import get_settings
+
+_settings = get_settings()
+INGESTION_INTERVAL = _settings.ingestion_interval
+INGESTION_ENABLED = _settings.ingestion_enabled
+INGESTION_RETRIES = _settings.ingestion_retries
+INGESTION_BACKOFF = _settings.ingestion_backoff
+
+
+class ForecastIngestionWorker:
+    """Descarga el pronóstico de todas las alcaldías y lo guarda en un solo lote."""
+
+    def __init__(self, weather: Optional[WeatherService] = None,
+                 sesiones: sessionmaker = SessionLocal,
+                 alcaldias: Mapping[str, Tuple[float, float]] = ALCALDIAS_CDMX,
+                 reintentos: int = INGESTION_RETRIES, backoff: float = INGESTION_BACKOFF):
+        self.weather = weather or WeatherService()
+        self.sesiones = sesiones
+        self.alcaldias = alcaldias
+        self.reintentos = reintentos
+        self.backoff = backoff
+
+    async def _pronostico(self, alcaldia: str, lat: float, lon: float) -> Optional[Dict]:
+        """Pronóstico de una alcaldía con reintentos (backoff exponencial con jitter completo)."""
+        for intento in range(self.reintentos + 1):
+            datos = await self.weather.get_forecast(lat, lon)
+            if datos:
+                return datos
+            if intento < self.reintentos:
+                espera = random.uniform(0, self.backoff * 2 ** intento)
+                print(f"Reintentando pronóstico de {alcaldia} en {espera:.1f}s ({intento + 1}/{self.reintentos})")
+                await asyncio.sleep(espera)
+        return None
+
+    def _guardar(self, registros: List[Dict[str, Any]]) -> Dict[str, int]:
+        with self.sesiones() as db:
+            return upsert_clima_records(db, registros)
+
+    async def ejecutar_ciclo(self) -> Dict[str, Any]:
+        """Un ciclo completo: descarga en paralelo y una escritura por lotes."""
+        inicio = time.perf_counter()
+        nombres = list(self.alcaldias)
+        if not self.weather.disponible:
+            print("ADVERTENCIA: Ingesta de pronóstico omitida: falta OPENWEATHER_API_KEY.")
+            return {"alcaldias": 0, "fallidas": nombres, "registros": 0, "insertados": 0,
+                    "actualizados": 0, "segundos": 0.0}
+        resultados = await asyncio.gather(
+            *(self._pronostico(nombre, *self.alcaldias[nombre]) for nombre in nombres)
+        )
+        registros: List[Dict[str, Any]] = []
+        fallidas = []
+        for nombre, datos in zip(nombres, resultados):
+            if datos:
+                registros.extend(transform_forecast_to_db_records(datos, nombre))
+            else:
+                fallidas.append(nombre)
+
+        escritura = {"insertados": 0, "actualizados": 0}
+        if registros:
+            # La sesión síncrona va en un hilo para no bloquear el event loop de la API
+            escritura = await asyncio.to_thread(self._guardar, registros)
+
+        reporte = {
+            "alcaldias": len(nombres) - len(fallidas),
+            "fallidas": fallidas,
+            "registros": len(registros),
+            **escritura,
+            "segundos": round(time.perf_counter() - inicio, 2),
+        }
+        print(f"Ingesta de pronóstico: {reporte}")
+        return reporte
+
+    async def run_forever(self, intervalo: float = INGESTION_INTERVAL):
+        """Ciclo de ingesta; un error no detiene el ciclo, se reintenta en el siguiente."""
+        while True:
+            try:
+                await self.ejecutar_ciclo()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"ADVERTENCIA: Falló el ciclo de ingesta de pronóstico: {e}")
+            await asyncio.sleep(intervalo)
+
+
+async def _main(loop: bool):
+    worker = ForecastIngestionWorker()
+    try:
+        if loop:
+            await worker.run_forever()
+        else:
+            print(json.dumps(await worker.ejecutar_ciclo(), indent=2, ensure_ascii=False))
+    finally:
+        await close_http_client()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--loop", action="store_true", help=f"Repetir cada {INGESTION_INTERVAL:.0f} s")
+    args = parser.parse_args()
+    asyncio.run(_main(args.loop))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,18 @@
+# services/json_payload.py
+"""
+Serialización JSON con orjson para las respuestas de la API. Los cuerpos que
+cambian poco (lista de alcaldías, resúmenes del atlas, snapshot) se serializan
+una vez y se sirven como bytes.
+"""
+from typing import Any
+
+import orjson
+
+JSON_MEDIA_TYPE = "application/json"
+# Llaves no texto (p. ej. {24: 3.5, 48: 7.1}) y escalares/arreglos de numpy
+OPCIONES_JSON = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def json_bytes(datos: Any) -> bytes:
+    """Serializa a JSON (UTF-8); lo que orjson no conoce (Decimal, etc.) se convierte a texto."""
+    return orjson.dumps(datos, default=str, option=OPCIONES_JSON)
@@ -0,0 +1,265 @@
+# services/metrics.py
+"""
+Métricas del proceso en formato de texto de Prometheus (GET /metrics), sin
+dependencias externas: contadores, histogramas y colectores que se evalúan al
+momento de la consulta (estado de cachés y del pool de la BD).
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+PROMETHEUS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Segundos; cubren desde una búsqueda en caché hasta una llamada lenta a Gemini
+BUCKETS_LATENCIA = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Muestra = Tuple[Dict[str, str], float]
+
+
+def _escapar(valor: str) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _etiquetas(nombres: Sequence[str], valores: Sequence[str], extra: str = "") -> str:
+    partes = [f'{n}="{_escapar(v)}"' for n, v in zip(nombres, valores)]
+    if extra:
+        partes.append(extra)
+    return "{" + ",".join(partes) + "}" if partes else ""
+
+
+def _numero(valor: float) -> str:
+    if valor == float("inf"):
+        return "+Inf"
+    return repr(float(valor)) if not float(valor).is_integer() else str(int(valor))
+
+
+class Counter:
+    """Contador monótono con etiquetas."""
+    tipo = "counter"
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = ()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._valores: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, cantidad: float = 1.0, **etiquetas: str):
+        clave = tuple(str(etiquetas.get(n, "")) for n in self.etiquetas)
+        with self._lock:
+            self._valores[clave] = self._valores.get(clave, 0.0) + cantidad
+
+    def valor(self, **etiquetas: str) -> float:
+        return self._valores.get(tuple(str(etiquetas.get(n, "")) for n in self.etiquetas), 0.0)
+
+    def lineas(self) -> Iterator[str]:
+        with self._lock:
+            valores = sorted(self._valores.items())
+        for clave, valor in valores:
+            yield f"{self.nombre}{_etiquetas(self.etiquetas, clave)} {_numero(valor)}"
+
+
+class Histogram:
+    """Histograma acumulado con buckets fijos, como los de Prometheus."""
+    tipo = "histogram"
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = (),
+                 buckets: Sequence[float] = BUCKETS_LATENCIA):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self.buckets = tuple(sorted(buckets))
+        # Por combinación de etiquetas: [conteos por bucket (+Inf al final), suma]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, valor: float, **etiquetas: str):
+        clave = tuple(str(etiquetas.get(n, "")) for n in self.etiquetas)
+        posicion = bisect.bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(clave)
+            if serie is None:
+                serie = self._series[clave] = [[0] * (len(self.buckets) + 1), 0.0]
+            serie[0][posicion] += 1
+            serie[1] += valor
+
+    @contextmanager
+    def time(self, **etiquetas: str):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - inicio, **etiquetas)
+
+    def conteo(self, **etiquetas: str) -> int:
+        serie = self._series.get(tuple(str(etiquetas.get(n, "")) for n in self.etiquetas))
+        return sum(serie[0]) if serie else 0
+
+    def lineas(self) -> Iterator[str]:
+        with self._lock:
+            series = sorted((clave, (list(conteos), suma)) for clave, (conteos, suma) in self._series.items())
+        for clave, (conteos, suma) in series:
+            acumulado = 0
+            for limite, conteo in zip(self.buckets + (float("inf"),), conteos):
+                acumulado += conteo
+                le = 'le="' + _numero(limite) + '"'
+                yield f"{self.nombre}_bucket{_etiquetas(self.etiquetas, clave, le)} {acumulado}"
+            yield f"{self.nombre}_sum{_etiquetas(self.etiquetas, clave)} {_numero(suma)}"
+            yield f"{self.nombre}_count{_etiquetas(self.etiquetas, clave)} {acumulado}"
+
+
+class Collector:
+    """Métrica calculada al momento de la consulta: `funcion()` regresa [(etiquetas, valor)]."""
+
+    def __init__(self, nombre: str, ayuda: str, tipo: str, funcion: Callable[[], Iterable[Muestra]]):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.tipo = tipo
+        self.funcion = funcion
+
+    def lineas(self) -> Iterator[str]:
+        try:
+            muestras = list(self.funcion())
+        except Exception as e:
+            print(f"ADVERTENCIA: No se pudo calcular la métrica {self.nombre}: {e}")
+            return
+        for etiquetas, valor in muestras:
+            nombres = sorted(etiquetas)
+            yield f"{self.nombre}{_etiquetas(nombres, [etiquetas[n] for n in nombres])} {_numero(valor)}"
+
+
+class Registry:
+    def __init__(self):
+        self._metricas: Dict[str, object] = {}
+
+    def _registrar(self, metrica):
+        if metrica.nombre in self._metricas:
+            raise ValueError(f"La métrica {metrica.nombre} ya está registrada")
+        self._metricas[metrica.nombre] = metrica
+        return metrica
+
+    def counter(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = ()) -> Counter:
+        return self._registrar(Counter(nombre, ayuda, etiquetas))
+
+    def histogram(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = (),
+                  buckets: Sequence[float] = BUCKETS_LATENCIA) -> Histogram:
+        return self._registrar(Histogram(nombre, ayuda, etiquetas, buckets))
+
+    def collector(self, nombre: str, ayuda: str, tipo: str,
+                  funcion: Callable[[], Iterable[Muestra]]) -> Collector:
+        return self._registrar(Collector(nombre, ayuda, tipo, funcion))
+
+    def render(self) -> str:
+        lineas: List[str] = []
+        for metrica in self._metricas.values():
+            lineas.append(f"# HELP {metrica.nombre} {metrica.ayuda}")
+            lineas.append(f"# TYPE {metrica.nombre} {metrica.tipo}")
+            lineas.extend(metrica.lineas())
+        return "\n".join(lineas) + "\n"
+
+
+REGISTRY = Registry()
+
+# ---------------------------
+# Métricas de la aplicación
+# ---------------------------
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "flood_stage_seconds",
+    "Duración de cada etapa de la predicción (geocodificacion, pronostico_api, atlas_bd, clima_bd, gemini, calculo_riesgo, prediccion).",
+    ["etapa"],
+)
+UPSTREAM_ERRORS = REGISTRY.counter(
+    "flood_upstream_errors_total", "Errores al llamar a APIs externas.", ["api"]
+)
+CLIMA_SOURCE = REGISTRY.counter(
+    "flood_clima_fuente_total", "Origen del pronóstico usado en cada predicción (api o bd_respaldo).", ["fuente"]
+)
+GEMINI_RESULT = REGISTRY.counter(
+    "flood_gemini_analisis_total", "Resultado del análisis contextual entregado (completo, pendiente, simulado).", ["resultado"]
+)
+HTTP_SECONDS = REGISTRY.histogram(
+    "flood_http_request_seconds", "Duración de las peticiones HTTP por ruta.", ["metodo", "ruta", "estado"]
+)
+
+
+def medir(etapa: str):
+    """`with medir("atlas_bd"): ...` registra la duración de la etapa."""
+    return STAGE_SECONDS.time(etapa=etapa)
+
+
+def _estado_caches() -> Iterator[Tuple[str, Dict]]:
+    # Imports locales: este módulo no debe arrastrar al resto de la app al importarse
+    from services.geocoding_cache import get_geocoding_cache
+    from services.forecast_cache import get_forecast_cache
+    from agent.analysis_cache import get_analysis_cache
+    from services.geojson_export import get_geojson_exporter
+    from services.http_cache import get_http_response_cache
+
+    yield "geocodificacion", get_geocoding_cache().stats()
+    yield "pronostico", get_forecast_cache().stats()
+    yield "analisis", get_analysis_cache().stats()
+    yield "geojson", get_geojson_exporter().cache.stats()
+    yield "respuestas_http", get_http_response_cache().stats()
+
+
+def _cache_peticiones() -> Iterator[Muestra]:
+    for nombre, stats in _estado_caches():
+        yield {"cache": nombre, "resultado": "hit"}, stats["hits"] + stats.get("coalesced", 0)
+        yield {"cache": nombre, "resultado": "miss"}, stats["misses"]
+
+
+def _cache_hit_rate() -> Iterator[Muestra]:
+    for nombre, stats in _estado_caches():
+        yield {"cache": nombre}, stats["hit_rate"]
+
+
+def _cache_entradas() -> Iterator[Muestra]:
+    for nombre, stats in _estado_caches():
+        yield {"cache": nombre}, stats["entradas"]
+
+
+def _pool_bd() -> Iterator[Muestra]:
+    from db.connection import async_engine, engine, pool_status
+
+    for nombre, motor in (("sync", engine), ("async", async_engine)):
+        for campo, valor in pool_status(motor).items():
+            if isinstance(valor, (int, float)):
+                yield {"engine": nombre, "estado": campo}, valor
+
+
+REGISTRY.collector("flood_cache_requests_total", "Consultas a cada caché por resultado.", "counter", _cache_peticiones)
+REGISTRY.collector("flood_cache_hit_ratio", "Proporción de aciertos de cada caché.", "gauge", _cache_hit_rate)
+REGISTRY.collector("flood_cache_entries", "Entradas guardadas en cada caché.", "gauge", _cache_entradas)
+REGISTRY.collector("flood_db_pool_connections", "Conexiones del pool de la BD por estado.", "gauge", _pool_bd)
+
+
+class MetricsMiddleware:
+    """Middleware ASGI que mide cada petición HTTP con la plantilla de su ruta."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        inicio = time.perf_counter()
+        estado = {"codigo": 500}
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start":
+                estado["codigo"] = mensaje["status"]
+            await send(mensaje)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            ruta = scope.get("route")
+            # La plantilla ("/api/v1/predict/{alcaldia}") evita una serie por cada valor
+            plantilla: Optional[str] = getattr(ruta, "path", None) or "sin_ruta"
+            HTTP_SECONDS.observe(
+                time.perf_counter() - inicio,
+                metodo=scope.get("method", ""), ruta=plantilla, estado=str(estado["codigo"]),
+            )
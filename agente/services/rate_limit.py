@@ -0,0 +1,50 @@
+# services/rate_limit.py
+import asyncio
+import time
+from typing import Dict, Optional
+
+# Límites por API externa: (peticiones por segundo, ráfaga máxima).
+# Nominatim pide como máximo 1 petición por segundo; el plan gratuito de
+# OpenWeatherMap permite 60 por minuto: con 0.5/s y ráfaga de 30 nunca se pasan
+# 60 en una ventana de 60 s, y las 16 alcaldías salen en una sola ráfaga.
+RATE_LIMITS = {
+    "nominatim": (1.0, 1),
+    "openweathermap": (0.5, 30),
+}
+
+
+class TokenBucket:
+    """Limitador token-bucket para corrutinas: `await bucket.acquire()` antes de cada llamada."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._actualizado = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _recargar(self):
+        ahora = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (ahora - self._actualizado) * self.rate)
+        self._actualizado = ahora
+
+    async def acquire(self, tokens: float = 1.0):
+        # El lock mantiene el orden de llegada: nadie se adelanta a quien ya espera
+        async with self._lock:
+            self._recargar()
+            while self._tokens < tokens:
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+                self._recargar()
+            self._tokens -= tokens
+
+
+_limiters: Dict[str, TokenBucket] = {}
+
+
+def get_rate_limiter(nombre: str) -> Optional[TokenBucket]:
+    """Limitador compartido por proceso para la API indicada (None si no tiene límite)."""
+    if nombre not in RATE_LIMITS:
+        return None
+    if nombre not in _limiters:
+        _limiters[nombre] = TokenBucket(*RATE_LIMITS[nombre])
+    return _limiters[nombre]
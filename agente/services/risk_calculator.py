@@ -1,5 +1,75 @@
 # logic/risk_calculator.py
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Mapping, Sequence, Union
+
+import numpy as np
+
+# Categorías de salida, en orden de severidad (el índice es el código numérico)
+RISK_LEVELS = ("Bajo", "Moderado", "Alto", "Muy Alto")
+# Puntaje de riesgo base del atlas (cualquier otro valor, p. ej. "Muy Bajo", vale 0)
+BASE_RISK_SCORES = {"Bajo": 1, "Medio": 2, "Alto": 3, "Muy Alto": 4}
+# Umbrales de lluvia (mm) para 24 horas; para 48 horas se duplican
+RAIN_THRESHOLDS_24H = (5.0, 15.0)
+# Límites superiores del puntaje final para Bajo / Moderado / Alto
+_FINAL_SCORE_BINS = np.array([2, 4, 5])
+
+_RISK_LABELS = np.array(RISK_LEVELS)
+
+
+def encode_base_risk(riesgos: Sequence[str]) -> np.ndarray:
+    """Convierte los niveles de riesgo del atlas a su puntaje base (int8)."""
+    return np.fromiter((BASE_RISK_SCORES.get(r, 0) for r in riesgos), dtype=np.int8, count=len(riesgos))
+
+
+def score_flood_risk(
+    base_scores: np.ndarray,
+    total_rain_mm: Union[np.ndarray, float],
+    periodo: int = 24
+) -> np.ndarray:
+    """
+    Versión vectorizada del cálculo de riesgo: recibe el puntaje base de cada
+    polígono y su lluvia total (arreglo o escalar) y regresa el índice de
+    categoría en RISK_LEVELS para cada polígono.
+    """
+    moderate_threshold, high_threshold = RAIN_THRESHOLDS_24H
+    # Si el periodo es de 48 horas, duplicamos los umbrales
+    if periodo == 48:
+        moderate_threshold *= 2 # 10 mm
+        high_threshold *= 2   # 30 mm
+
+    rain = np.asarray(total_rain_mm, dtype=np.float64)
+    # 0 = sin lluvia relevante, 1 = lluvia moderada, 2 = lluvia fuerte
+    rain_score = (rain >= moderate_threshold).astype(np.int8) + (rain >= high_threshold).astype(np.int8)
+    final_score = np.asarray(base_scores, dtype=np.int8) + rain_score
+    return np.digitize(final_score, _FINAL_SCORE_BINS, right=True).astype(np.int8)
+
+
+def risk_labels(codes: np.ndarray) -> np.ndarray:
+    """Convierte índices de categoría a sus etiquetas ("Bajo", "Moderado", ...)."""
+    return _RISK_LABELS[codes]
+
+
+def rain_per_polygon(alcaldias: Sequence[str], rain_by_alcaldia: Mapping[str, float]) -> np.ndarray:
+    """Reparte la lluvia total de cada alcaldía a sus polígonos (0 si no hay dato)."""
+    nombres, inverse = np.unique(np.asarray(alcaldias, dtype=object).astype(str), return_inverse=True)
+    valores = np.array([float(rain_by_alcaldia.get(n, 0.0) or 0.0) for n in nombres], dtype=np.float64)
+    return valores[inverse]
+
+
+def score_polygons(
+    riesgos: Sequence[str],
+    rain_24h_mm: Union[np.ndarray, float],
+    rain_48h_mm: Union[np.ndarray, float]
+) -> Dict[int, np.ndarray]:
+    """
+    Califica todos los polígonos del atlas en una sola pasada para 24 y 48 horas.
+    Regresa {24: códigos, 48: códigos}.
+    """
+    base_scores = encode_base_risk(riesgos)
+    return {
+        24: score_flood_risk(base_scores, rain_24h_mm, periodo=24),
+        48: score_flood_risk(base_scores, rain_48h_mm, periodo=48),
+    }
+
 
 def calculate_flood_risk(
     atlas_data: Dict[str, Any],
@@ -13,35 +83,6 @@ def calculate_flood_risk(
     # 1. Calcular lluvia total pronosticada
     total_rain_mm = sum(f.get('lluvia_mm', 0.0) for f in weather_forecast)
 
-    # 2. Asignar puntaje de riesgo base del atlas
-    risk_map = {"Bajo": 1, "Medio": 2, "Alto": 3, "Muy Alto": 4}
-    base_risk_score = risk_map.get(atlas_data.get('riesgo'), 0)
-
-    # 3. Asignar puntaje por la lluvia, ajustando umbrales según el periodo
-    rain_score = 0
-    # Umbrales para 24 horas
-    moderate_threshold = 5
-    high_threshold = 15
-    
-    # Si el periodo es de 48 horas, duplicamos los umbrales
-    if periodo == 48:
-        moderate_threshold *= 2 # 10 mm
-        high_threshold *= 2   # 30 mm
-
-    if moderate_threshold <= total_rain_mm < high_threshold:
-        rain_score = 1  # Lluvia Moderada
-    elif total_rain_mm >= high_threshold:
-        rain_score = 2  # Lluvia Fuerte
-
-    # 4. Fórmula de cálculo final (sin cambios)
-    final_score = base_risk_score + rain_score
-
-    # 5. Convertir el puntaje final a una categoría
-    if final_score <= 2:
-        return "Bajo"
-    elif final_score <= 4:
-        return "Moderado"
-    elif final_score <= 5:
-        return "Alto"
-    else:
-        return "Muy Alto"
\ No newline at end of file
+    # 2. Puntaje base + puntaje por lluvia -> categoría (motor vectorizado con un solo polígono)
+    base_scores = encode_base_risk([atlas_data.get('riesgo')])
+    return RISK_LEVELS[int(score_flood_risk(base_scores, total_rain_mm, periodo=periodo)[0])]
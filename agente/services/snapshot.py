@@ -0,0 +1,198 @@
+# services/snapshot.py
+import asyncio
+import hashlib
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from db.async_operations import get_all_alcaldias, get_atlas_risk_columns
+from db.connection import AsyncSessionLocal
+from services.alcaldias import clave_alcaldia
+from services.json_payload import json_bytes
+from services.risk_calculator import RISK_LEVELS, rain_per_polygon, risk_labels, score_polygons
+from settings import get_settings
+
+# Cada cuánto se recalcula el snapshot y hasta qué edad se sigue sirviendo
+SNAPSHOT_INTERVAL = get_settings().snapshot_interval
+SNAPSHOT_MAX_AGE = get_settings().snapshot_max_age
+SNAPSHOT_ENABLED = get_settings().snapshot_enabled
+
+
+@dataclass(frozen=True)
+class RiskSnapshot:
+    """
+    Foto inmutable del riesgo de toda la ciudad. Las respuestas JSON se
+    serializan una sola vez al construirla.
+    """
+    version: int
+    generado_en: datetime
+    creado_monotonic: float
+    predicciones: Mapping[str, Dict[str, Any]]
+    # Riesgo actual por polígono (índice en RISK_LEVELS), alineado con poligonos_id
+    poligonos_id: Tuple[int, ...] = ()
+    poligonos_cvegeo: Tuple[str, ...] = ()
+    posicion_por_id: Mapping[int, int] = field(default_factory=lambda: MappingProxyType({}))
+    poligonos_24h: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.int8))
+    poligonos_48h: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.int8))
+    # Huella del riesgo por polígono: solo cambia si cambia el nivel de alguno
+    huella_poligonos: str = ""
+    payload: bytes = b""
+    # Cuerpo de /predict/{alcaldia} ya serializado, por llave normalizada
+    respuestas: Mapping[str, bytes] = field(default_factory=lambda: MappingProxyType({}))
+
+    @property
+    def edad(self) -> float:
+        return time.monotonic() - self.creado_monotonic
+
+    def vigente(self, max_edad: float = SNAPSHOT_MAX_AGE) -> bool:
+        return self.edad <= max_edad
+
+    def prediccion(self, alcaldia: str) -> Optional[Dict[str, Any]]:
+        """Predicción precalculada de la alcaldía, o None si no está o tuvo error."""
+        prediccion = self.predicciones.get(clave_alcaldia(alcaldia))
+        if prediccion is None or prediccion.get("error"):
+            return None
+        return _prediccion_publicada(prediccion, self.version, self.generado_en)
+
+    def prediccion_json(self, alcaldia: str) -> Optional[bytes]:
+        """Lo mismo que `prediccion`, serializado al construir el snapshot."""
+        return self.respuestas.get(clave_alcaldia(alcaldia))
+
+    def riesgo_poligono(self, atlas_id: int) -> Optional[Dict[str, str]]:
+        """Riesgo actual (24h/48h) de un polígono del atlas, o None si no está en el snapshot."""
+        posicion = self.posicion_por_id.get(atlas_id)
+        if posicion is None:
+            return None
+        return {
+            "24_horas": RISK_LEVELS[int(self.poligonos_24h[posicion])],
+            "48_horas": RISK_LEVELS[int(self.poligonos_48h[posicion])],
+        }
+
+
+def huella_poligonos(ids: Tuple[int, ...], riesgo_24h: np.ndarray, riesgo_48h: np.ndarray) -> str:
+    """Hash de (id, nivel 24h, nivel 48h) de todos los polígonos."""
+    h = hashlib.sha1(np.asarray(ids, dtype=np.int64).tobytes())
+    h.update(np.asarray(riesgo_24h, dtype=np.int8).tobytes())
+    h.update(np.asarray(riesgo_48h, dtype=np.int8).tobytes())
+    return h.hexdigest()[:16]
+
+
+_snapshot: Optional[RiskSnapshot] = None
+
+
+def get_snapshot() -> Optional[RiskSnapshot]:
+    """Snapshot actual (None hasta que termina el primer cálculo)."""
+    return _snapshot
+
+
+class SnapshotRefresher:
+    """
+    Recalcula el snapshot en segundo plano usando el mismo agente (pronóstico,
+    atlas y cálculo de riesgo) y lo publica reemplazando la referencia.
+    """
+
+    def __init__(self, agent, sesiones: async_sessionmaker = AsyncSessionLocal,
+                 intervalo: float = SNAPSHOT_INTERVAL):
+        self.agent = agent
+        self.sesiones = sesiones
+        self.intervalo = intervalo
+        self._version = 0
+
+    async def refrescar(self) -> RiskSnapshot:
+        global _snapshot
+        # Import local: agent importa services, evitamos el ciclo al cargar el módulo
+        from agent.batch import BatchPredictor
+
+        async with self.sesiones() as db:
+            alcaldias = await get_all_alcaldias(db)
+            filas_atlas = await get_atlas_risk_columns(db)
+
+        resultados = await BatchPredictor(self.agent, sesiones=self.sesiones).run(alcaldias)
+        predicciones = {}
+        lluvia_24h, lluvia_48h = {}, {}
+        for resultado in resultados:
+            nombre = resultado["alcaldia"]
+            predicciones[clave_alcaldia(nombre)] = resultado
+            if not resultado.get("error"):
+                lluvia_24h[nombre] = resultado["predicciones"]["24_horas"]["lluvia_total_mm"]
+                lluvia_48h[nombre] = resultado["predicciones"]["48_horas"]["lluvia_total_mm"]
+
+        ids = tuple(f[0] for f in filas_atlas)
+        cvegeos = tuple(f[1] for f in filas_atlas)
+        alcaldias_poligonos = [f[2] or "" for f in filas_atlas]
+        codigos = score_polygons(
+            [f[3] for f in filas_atlas],
+            rain_per_polygon(alcaldias_poligonos, lluvia_24h),
+            rain_per_polygon(alcaldias_poligonos, lluvia_48h),
+        )
+        for arreglo in codigos.values():
+            arreglo.flags.writeable = False
+
+        self._version += 1
+        generado_en = datetime.now(timezone.utc)
+        payload = json_bytes({
+            "version": self._version,
+            "generado_en": generado_en.isoformat(),
+            "alcaldias": predicciones,
+            "poligonos": {
+                "total": len(cvegeos),
+                "distribucion_24h": _distribucion(codigos[24]),
+                "distribucion_48h": _distribucion(codigos[48]),
+            },
+        })
+        respuestas = {
+            clave: json_bytes(_prediccion_publicada(prediccion, self._version, generado_en))
+            for clave, prediccion in predicciones.items()
+            if not prediccion.get("error")
+        }
+
+        snapshot = RiskSnapshot(
+            version=self._version,
+            generado_en=generado_en,
+            creado_monotonic=time.monotonic(),
+            predicciones=MappingProxyType(predicciones),
+            poligonos_id=ids,
+            poligonos_cvegeo=cvegeos,
+            posicion_por_id=MappingProxyType({atlas_id: i for i, atlas_id in enumerate(ids)}),
+            poligonos_24h=codigos[24],
+            poligonos_48h=codigos[48],
+            huella_poligonos=huella_poligonos(ids, codigos[24], codigos[48]),
+            payload=payload,
+            respuestas=MappingProxyType(respuestas),
+        )
+        _snapshot = snapshot
+        print(f"Snapshot de riesgo v{snapshot.version} generado ({len(predicciones)} alcaldías, {len(cvegeos)} polígonos).")
+        return snapshot
+
+    async def run_forever(self):
+        """Ciclo del refresco; un error no detiene el ciclo, se reintenta en el siguiente."""
+        while True:
+            try:
+                await self.refrescar()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"ADVERTENCIA: No se pudo generar el snapshot de riesgo: {e}")
+            await asyncio.sleep(self.intervalo)
+
+
+def _prediccion_publicada(prediccion: Dict[str, Any], version: int, generado_en: datetime) -> Dict[str, Any]:
+    """Predicción del snapshot con su versión y fecha en datos_utilizados."""
+    return {
+        **prediccion,
+        "datos_utilizados": {
+            **prediccion.get("datos_utilizados", {}),
+            "snapshot_version": version,
+            "snapshot_generado_en": generado_en.isoformat(),
+        },
+    }
+
+
+def _distribucion(codigos: np.ndarray) -> Dict[str, int]:
+    etiquetas, conteos = np.unique(risk_labels(codigos), return_counts=True)
+    return {str(e): int(c) for e, c in zip(etiquetas, conteos)}
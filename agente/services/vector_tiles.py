@@ -0,0 +1,282 @@
+# services/vector_tiles.py
+"""
+Mapbox Vector Tiles (MVT 2.1) de la capa de riesgo a partir del índice
+espacial del atlas. La codificación protobuf se hace aquí mismo: la capa solo
+tiene polígonos con propiedades de texto.
+"""
+import asyncio
+import math
+import os
+import shutil
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import shapely
+
+from agent.config import MAP_CONFIG
+from db.async_operations import get_atlas_spatial_index
+from db.connection import AsyncSessionLocal
+from db.spatial_index import AtlasSpatialIndex
+from services.snapshot import RiskSnapshot, get_snapshot
+
+MVT_MEDIA_TYPE = "application/vnd.mapbox-vector-tile"
+_POLYGON = 3
+_MOVE_TO, _LINE_TO, _CLOSE_PATH = 1, 2, 7
+
+
+# ---------------------------
+# Geometría del tile
+# ---------------------------
+
+def _lat_tile(y: float, n: int) -> float:
+    return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+
+
+def limites_tile(z: int, x: int, y: int, margen: float = 0.0) -> Tuple[float, float, float, float]:
+    """(min_lon, min_lat, max_lon, max_lat) del tile, ampliado `margen` tiles por lado."""
+    n = 2 ** z
+    min_lon = (x - margen) / n * 360.0 - 180.0
+    max_lon = (x + 1 + margen) / n * 360.0 - 180.0
+    return min_lon, _lat_tile(y + 1 + margen, n), max_lon, _lat_tile(y - margen, n)
+
+
+def tiles_en_bbox(z: int, min_lon: float, min_lat: float, max_lon: float, max_lat: float) -> Iterator[Tuple[int, int]]:
+    """(x, y) de los tiles del zoom z que cubren el rectángulo."""
+    n = 2 ** z
+
+    def tile_x(lon):
+        return min(n - 1, max(0, int((lon + 180.0) / 360.0 * n)))
+
+    def tile_y(lat):
+        lat = math.radians(max(-85.0511, min(85.0511, lat)))
+        return min(n - 1, max(0, int((1 - math.asinh(math.tan(lat)) / math.pi) / 2 * n)))
+
+    for x in range(tile_x(min_lon), tile_x(max_lon) + 1):
+        for y in range(tile_y(max_lat), tile_y(min_lat) + 1):
+            yield x, y
+
+
+def _proyectar(coords: np.ndarray, z: int, x: int, y: int, extent: int) -> np.ndarray:
+    """lon/lat -> coordenadas del tile (Web Mercator, eje y hacia abajo)."""
+    n = 2 ** z
+    lat = np.radians(np.clip(coords[:, 1], -85.0511, 85.0511))
+    mundo_x = (coords[:, 0] + 180.0) / 360.0 * n
+    mundo_y = (1 - np.arcsinh(np.tan(lat)) / np.pi) / 2 * n
+    return np.column_stack(((mundo_x - x) * extent, (mundo_y - y) * extent))
+
+
+def _poligonos(geom) -> List[shapely.Polygon]:
+    return [p for p in shapely.get_parts(geom) if p.geom_type == "Polygon" and not p.is_empty]
+
+
+# ---------------------------
+# Codificación protobuf
+# ---------------------------
+
+def _varint(n: int) -> bytes:
+    salida = bytearray()
+    while True:
+        byte = n & 0x7F
+        n >>= 7
+        if n:
+            salida.append(byte | 0x80)
+        else:
+            salida.append(byte)
+            return bytes(salida)
+
+
+def _campo_bytes(numero: int, datos: bytes) -> bytes:
+    return _varint((numero << 3) | 2) + _varint(len(datos)) + datos
+
+
+def _campo_varint(numero: int, valor: int) -> bytes:
+    return _varint(numero << 3) + _varint(valor)
+
+
+def _empaquetado(numero: int, valores) -> bytes:
+    return _campo_bytes(numero, b"".join(_varint(int(v)) for v in valores))
+
+
+def _comandos(poligonos: List[shapely.Polygon]) -> List[int]:
+    """Comandos de geometría MVT (MoveTo/LineTo/ClosePath con deltas zigzag)."""
+    comandos: List[int] = []
+    cursor = np.zeros(2, dtype=np.int64)
+    for poligono in poligonos:
+        for i, anillo in enumerate([poligono.exterior, *poligono.interiors]):
+            puntos = np.asarray(anillo.coords, dtype=np.int64)[:-1]
+            if len(puntos):
+                # Quita vértices repetidos que deja el redondeo a la malla del tile
+                puntos = puntos[np.any(np.diff(puntos, axis=0, prepend=puntos[-1:] - 1) != 0, axis=1)]
+            if len(puntos) < 3:
+                if i == 0:
+                    break  # Sin exterior no se envían sus huecos
+                continue
+            deltas = np.diff(puntos, axis=0, prepend=cursor[None, :])
+            cursor = puntos[-1]
+            zigzag = ((deltas << 1) ^ (deltas >> 63)).ravel().tolist()
+            comandos.append(_MOVE_TO | (1 << 3))
+            comandos.extend(zigzag[:2])
+            comandos.append(_LINE_TO | ((len(puntos) - 1) << 3))
+            comandos.extend(zigzag[2:])
+            comandos.append(_CLOSE_PATH | (1 << 3))
+    return comandos
+
+
+def construir_tile(index: AtlasSpatialIndex, snapshot: Optional[RiskSnapshot],
+                   z: int, x: int, y: int) -> bytes:
+    """Tile MVT con los polígonos del atlas que tocan (z, x, y) y su riesgo actual."""
+    extent = MAP_CONFIG["extent"]
+    buffer = MAP_CONFIG["buffer"]
+    candidatos = index.query_bbox_indices(*limites_tile(z, x, y, margen=buffer / extent))
+    if not candidatos:
+        return b""
+
+    geometrias = np.asarray(index.geometrias)[candidatos]
+    geometrias = shapely.transform(geometrias, lambda c: _proyectar(c, z, x, y, extent))
+    geometrias = shapely.clip_by_rect(geometrias, -buffer, -buffer, extent + buffer, extent + buffer)
+    geometrias = shapely.simplify(geometrias, 0.5)
+    geometrias = shapely.set_precision(geometrias, 1.0)
+    geometrias = shapely.orient_polygons(geometrias, exterior_cw=False)
+
+    claves: Dict[str, int] = {}
+    valores: Dict[str, int] = {}
+    features = []
+    for posicion, geom in zip(candidatos, geometrias):
+        comandos = _comandos(_poligonos(geom))
+        if not comandos:
+            continue
+        zona = index.propiedades[posicion]
+        propiedades = {"cvegeo": zona["cvegeo"], "alcaldia": zona["alcaldia"], "riesgo": zona["riesgo"]}
+        riesgo_actual = snapshot.riesgo_poligono(zona["id"]) if snapshot is not None else None
+        if riesgo_actual:
+            propiedades["riesgo_24h"] = riesgo_actual["24_horas"]
+            propiedades["riesgo_48h"] = riesgo_actual["48_horas"]
+        etiquetas = []
+        for clave, valor in propiedades.items():
+            if valor is None:
+                continue
+            etiquetas.append(claves.setdefault(clave, len(claves)))
+            etiquetas.append(valores.setdefault(str(valor), len(valores)))
+        features.append(
+            _campo_varint(1, zona["id"])
+            + _empaquetado(2, etiquetas)
+            + _campo_varint(3, _POLYGON)
+            + _empaquetado(4, comandos)
+        )
+    if not features:
+        return b""
+
+    capa = (
+        _campo_varint(15, 2)
+        + _campo_bytes(1, MAP_CONFIG["capa"].encode("utf-8"))
+        + b"".join(_campo_bytes(2, f) for f in features)
+        + b"".join(_campo_bytes(3, k.encode("utf-8")) for k in claves)
+        + b"".join(_campo_bytes(4, _campo_bytes(1, v.encode("utf-8"))) for v in valores)
+        + _campo_varint(5, extent)
+    )
+    return _campo_bytes(3, capa)
+
+
+# ---------------------------
+# Caché en disco
+# ---------------------------
+
+def version_tiles(index: AtlasSpatialIndex, snapshot: Optional[RiskSnapshot]) -> str:
+    """Cambia cuando cambia el atlas o el nivel de riesgo de algún polígono."""
+    return f"{index.version}-s{snapshot.huella_poligonos if snapshot is not None else 0}"
+
+
+class TileCache:
+    """
+    Tiles guardados en disco bajo <directorio>/<versión>/z/x/y.pbf. Las
+    versiones anteriores se borran solo al terminar de pregenerar una nueva;
+    las peticiones nunca borran directorios.
+    """
+
+    def __init__(self, directorio: str = MAP_CONFIG["directorio_tiles"]):
+        self.directorio = directorio
+        self._pregenerada: Optional[str] = None
+
+    def _ruta(self, version: str, z: int, x: int, y: int) -> str:
+        return os.path.join(self.directorio, version, str(z), str(x), f"{y}.pbf")
+
+    @staticmethod
+    def _leer(ruta: str) -> Optional[bytes]:
+        try:
+            with open(ruta, "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    @staticmethod
+    def _escribir(ruta: str, datos: bytes):
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        temporal = f"{ruta}.{os.getpid()}.tmp"
+        with open(temporal, "wb") as f:
+            f.write(datos)
+        os.replace(temporal, ruta)
+
+    def _purgar(self, vigente: str):
+        try:
+            for nombre in os.listdir(self.directorio):
+                if nombre != vigente:
+                    shutil.rmtree(os.path.join(self.directorio, nombre), ignore_errors=True)
+        except OSError:
+            pass
+
+    async def obtener(self, index: AtlasSpatialIndex, snapshot: Optional[RiskSnapshot],
+                      z: int, x: int, y: int) -> Tuple[bytes, str]:
+        """(tile, versión): desde disco si existe, si no se genera y se guarda."""
+        version = version_tiles(index, snapshot)
+        ruta = self._ruta(version, z, x, y)
+        datos = await asyncio.to_thread(self._leer, ruta)
+        if datos is None:
+            datos = await asyncio.to_thread(construir_tile, index, snapshot, z, x, y)
+            try:
+                await asyncio.to_thread(self._escribir, ruta, datos)
+            except OSError as e:
+                print(f"ADVERTENCIA: No se pudo guardar el tile {z}/{x}/{y}: {e}")
+        return datos, version
+
+    async def pregenerar(self, index: AtlasSpatialIndex, snapshot: Optional[RiskSnapshot],
+                         zoom_max: int = MAP_CONFIG["zoom_pregenerado"]) -> int:
+        """Genera los tiles de zoom 0..zoom_max que cubren el atlas."""
+        if not len(index):
+            return 0
+        min_lon, min_lat, max_lon, max_lat = shapely.total_bounds(index.geometrias)
+        total = 0
+        for z in range(MAP_CONFIG["zoom_min"], zoom_max + 1):
+            for x, y in tiles_en_bbox(z, min_lon, min_lat, max_lon, max_lat):
+                await self.obtener(index, snapshot, z, x, y)
+                total += 1
+        version = version_tiles(index, snapshot)
+        # La nueva versión ya está completa; lo que quede de otras se descarta
+        await asyncio.to_thread(self._purgar, version)
+        self._pregenerada = version
+        return total
+
+    async def run_forever(self, intervalo: float = 60.0):
+        """Vuelve a pregenerar los zooms bajos cada vez que cambia el atlas o el snapshot."""
+        while True:
+            try:
+                async with AsyncSessionLocal() as db:
+                    index = await get_atlas_spatial_index(db)
+                snapshot = get_snapshot()
+                if version_tiles(index, snapshot) != self._pregenerada:
+                    total = await self.pregenerar(index, snapshot)
+                    print(f"Tiles pregenerados: {total} (versión {self._pregenerada}).")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"ADVERTENCIA: No se pudieron pregenerar los tiles: {e}")
+            await asyncio.sleep(intervalo)
+
+
+_tile_cache: Optional[TileCache] = None
+
+
+def get_tile_cache() -> TileCache:
+    global _tile_cache
+    if _tile_cache is None:
+        _tile_cache = TileCache()
+    return _tile_cache
@@ -1,34 +1,46 @@
-import os
 import httpx
-import asyncio
-from datetime import datetime
 from typing import Dict, Optional, List, Any
 
-# Hacemos una importación relativa para acceder a los módulos de la base de datos
-# Asume que este archivo está en app/services/ y los otros en app/db/
-from db.connection import get_db
-from db.operations import bulk_insert_clima
-from dotenv import load_dotenv
+from services.http_client import get_http_client
+from services.geocoding_cache import GeocodingCache, get_geocoding_cache
+from services.forecast_cache import ForecastCache, get_forecast_cache
+from services.rate_limit import TokenBucket, get_rate_limiter
+from services.forecast_series import ForecastSeries
+from services.metrics import UPSTREAM_ERRORS, medir
+from settings import get_settings
 
-load_dotenv()
-OPENWEATHER_API_KEY = os.getenv("OPENWEATHER_API_KEY")
 class GeocodingService:
     """Servicio para geocodificación de ubicaciones en CDMX usando Nominatim."""
     
-    def __init__(self):
+    def __init__(self, client: Optional[httpx.AsyncClient] = None, cache: Optional[GeocodingCache] = None,
+                 rate_limiter: Optional[TokenBucket] = None):
         """Corrección: El método constructor es __init__."""
         self.nominatim_url = "https://nominatim.openstreetmap.org/search"
+        self._client = client
+        self.cache = cache or get_geocoding_cache()
+        self.rate_limiter = rate_limiter or get_rate_limiter("nominatim")
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Cliente HTTP con pool de conexiones (por defecto el compartido del proceso)."""
+        return self._client or get_http_client()
     
     async def geocode_cdmx_location(self, alcaldia: str) -> Optional[Dict]:
         """Geocodifica una alcaldía específica de CDMX para obtener latitud y longitud."""
+        # Si ya la conocemos (semilla o consulta previa) no salimos a la red
+        coords = self.cache.get(alcaldia)
+        if coords is not None:
+            return coords
+
         print(f"Geocodificando: {alcaldia}...")
+        await self.rate_limiter.acquire()
 
         headers = {
             'User-Agent': 'FloodPredictionAgent/1.0 (yannigalvan02@aragon.unam.mx)'
         }
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
+            with medir("geocodificacion"):
+                response = await self.client.get(
                     self.nominatim_url,
                     params={
                         "q": f"{alcaldia}, Ciudad de México, México",
@@ -38,33 +50,61 @@ class GeocodingService:
                     },
                     headers=headers  # <-- Se añade el encabezado aquí
                 )
-                response.raise_for_status()
-                
-                if response.json():
-                    data = response.json()[0]
-                    return {"lat": float(data["lat"]), "lon": float(data["lon"])}
-                
-                return None
+            response.raise_for_status()
+            
+            if response.json():
+                data = response.json()[0]
+                coords = {"lat": float(data["lat"]), "lon": float(data["lon"])}
+                self.cache.set(alcaldia, coords)
+                return coords
+            
+            return None
         except Exception as e:
+            UPSTREAM_ERRORS.inc(api="nominatim")
             print(f"Error en geocodificación para {alcaldia}: {e}")
             return None
 
 class WeatherService:
     """Servicio para obtener datos de pronóstico de OpenWeatherMap."""
     
-    def __init__(self):
+    def __init__(self, client: Optional[httpx.AsyncClient] = None, cache: Optional[ForecastCache] = None,
+                 rate_limiter: Optional[TokenBucket] = None, api_key: Optional[str] = None):
         """Corrección: El método constructor es __init__."""
-        self.openweather_api_key = os.getenv("OPENWEATHER_API_KEY")
+        self.openweather_api_key = api_key or get_settings().openweather_api_key
         if not self.openweather_api_key:
-            raise ValueError("La variable de entorno OPENWEATHER_API_KEY no está definida.")
+            # Sin llave el servicio no se cae: el agente usa el pronóstico guardado en la BD
+            print("ADVERTENCIA: OPENWEATHER_API_KEY no está definida. El pronóstico se tomará solo de la base de datos.")
         self.weather_api_base = "https://api.openweathermap.org/data/2.5"
+        self._client = client
+        self.cache = cache or get_forecast_cache()
+        self.rate_limiter = rate_limiter or get_rate_limiter("openweathermap")
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Cliente HTTP con pool de conexiones (por defecto el compartido del proceso)."""
+        return self._client or get_http_client()
+
+    @property
+    def disponible(self) -> bool:
+        """Hay llave de OpenWeatherMap para consultar la API."""
+        return bool(self.openweather_api_key)
     
     async def get_forecast(self, lat: float, lon: float) -> Optional[Dict]:
-        """Obtiene el pronóstico de 5 días / 3 horas."""
+        """
+        Obtiene el pronóstico de 5 días / 3 horas. Las peticiones para la misma
+        coordenada se sirven del caché o comparten una sola llamada a la API.
+        """
+        if not self.disponible:
+            return None
+        return await self.cache.get_or_fetch(lat, lon, lambda: self._fetch_forecast(lat, lon))
+
+    async def _fetch_forecast(self, lat: float, lon: float) -> Optional[Dict]:
+        """Llama a OpenWeatherMap (sin caché)."""
         print(f"Obteniendo pronóstico para Lat={lat}, Lon={lon}...")
+        await self.rate_limiter.acquire()
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
+            with medir("pronostico_api"):
+                response = await self.client.get(
                     f"{self.weather_api_base}/forecast",
                     params={
                         "lat": lat,
@@ -74,82 +114,24 @@ class WeatherService:
                         "lang": "es"
                     }
                 )
-                response.raise_for_status()
-                print("Pronóstico obtenido con éxito.")
-                return response.json()
+            response.raise_for_status()
+            print("Pronóstico obtenido con éxito.")
+            return response.json()
         except Exception as e:
+            UPSTREAM_ERRORS.inc(api="openweathermap")
             print(f"Error obteniendo pronóstico: {e}")
             return None
 
-# --- Lógica de Orquestación y Guardado en Base de Datos ---
+# --- Transformación a registros de la tabla Clima ---
 
 def transform_forecast_to_db_records(forecast_data: Dict, alcaldia: str) -> List[Dict[str, Any]]:
-    """Transforma la respuesta de la API en una lista de registros para la tabla Clima."""
-    records_to_insert = []
-    # Procesamos solo las próximas 8 lecturas (24 horas)
-    for forecast in forecast_data.get('list', [])[:8]:
-        records_to_insert.append({
-            "fecha": datetime.fromtimestamp(forecast['dt']),
-            "alcaldia": alcaldia,
-            # El valor '3h' es el volumen de los últimos 3h. No se necesita dividir.
-            "lluvia_mm": forecast.get('rain', {}).get('3h', 0.0),
-            # 'pop' es la probabilidad de precipitación (0 a 1), se multiplica por 100.
-            "prob_lluvia": forecast.get('pop', 0.0) * 100,
-            "temperatura": forecast['main']['temp'],
-            "humedad": forecast['main']['humidity'],
-            "presion": forecast['main']['pressure'],
-            "fuente": "OpenWeatherMap"
-        })
-    return records_to_insert
-
-async def fetch_and_store_forecast_for_alcaldia(geocoder: GeocodingService, weather: WeatherService, alcaldia: str):
-    """Orquesta el proceso completo para una alcaldía: geocodificar, obtener pronóstico y guardar."""
-    coords = await geocoder.geocode_cdmx_location(alcaldia)
-    if not coords:
-        return
-
-    forecast_data = await weather.get_forecast(coords['lat'], coords['lon'])
-    if not forecast_data:
-        return
-
-    records = transform_forecast_to_db_records(forecast_data, alcaldia)
-    
-    if not records:
-        print(f"No se generaron registros para {alcaldia}.")
-        return
-
-    # Usamos el generador get_db para obtener una sesión de la base de datos
-    db_session = next(get_db())
-    try:
-        count = bulk_insert_clima(db_session, records)
-        print(f"Se insertaron {count} registros de pronóstico para {alcaldia} en la base de datos.")
-    finally:
-        db_session.close()
-
-# --- Punto de Entrada para Ejecutar como Script ---
-
-async def main():
-    """Función principal para ejecutar el proceso para todas las alcaldías de interés."""
-    # Lista de alcaldías que quieres monitorear
-    alcaldias_cdmx = [
-        "Álvaro Obregón", "Azcapotzalco", "Benito Juárez", "Coyoacán", 
-        "Cuajimalpa de Morelos", "Cuauhtémoc", "Gustavo A. Madero", "Iztacalco",
-        "Iztapalapa", "La Magdalena Contreras", "Miguel Hidalgo", "Milpa Alta",
-        "Tláhuac", "Tlalpan", "Venustiano Carranza", "Xochimilco"
-    ]
-    
-    geocoder = GeocodingService()
-    weather = WeatherService()
-    
-    # Creamos una tarea para cada alcaldía para ejecutarlas en paralelo
-    tasks = [fetch_and_store_forecast_for_alcaldia(geocoder, weather, nombre) for nombre in alcaldias_cdmx]
-    await asyncio.gather(*tasks)
+    """
+    Transforma la respuesta de la API en una lista de registros para la tabla Clima.
+    Se conservan los 40 bloques (5 días) para poder responder cualquier horizonte.
+    """
+    return ForecastSeries.from_api(forecast_data, alcaldia).to_records()
 
+# La ingesta periódica a la tabla clima vive en services/ingestion.py
 if __name__ == "__main__":
-    print("Iniciando la actualización de datos de pronóstico del clima...")
-    # Carga las variables de entorno desde el archivo .env
-    from dotenv import load_dotenv
-    load_dotenv()
-    
-    asyncio.run(main())
-    print("Proceso de actualización finalizado.")
\ No newline at end of file
+    from services.ingestion import main
+    main()
@@ -0,0 +1,107 @@
+# settings.py
+"""
+Configuración del proceso leída una sola vez de las variables de entorno (y
+del archivo .env) en un objeto tipado e inmutable. Los módulos toman sus
+valores de `get_settings()` en lugar de llamar a os.getenv por su cuenta.
+"""
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+_VERDADEROS = ("1", "true", "yes")
+
+
+def _texto(nombre: str) -> Optional[str]:
+    valor = os.getenv(nombre)
+    return valor if valor else None
+
+
+def _flotante(nombre: str, defecto: float) -> float:
+    return float(os.getenv(nombre) or defecto)
+
+
+def _entero(nombre: str, defecto: int) -> int:
+    return int(os.getenv(nombre) or defecto)
+
+
+def _booleano(nombre: str, defecto: bool) -> bool:
+    valor = os.getenv(nombre)
+    return defecto if not valor else valor.lower() in _VERDADEROS
+
+
+@dataclass(frozen=True)
+class Settings:
+    # Base de datos
+    db_url: Optional[str] = None
+    async_db_url: Optional[str] = None  # por defecto se deriva de db_url
+
+    # APIs externas
+    openweather_api_key: Optional[str] = None
+    google_api_key: Optional[str] = None
+
+    # Servidor
+    port: int = 8000
+
+    # Cachés (None = ruta o TTL por defecto del módulo)
+    forecast_cache_ttl: Optional[float] = None
+    geocoding_cache_path: Optional[str] = None
+    gemini_cache_dir: Optional[str] = None
+    tile_cache_dir: Optional[str] = None
+    geojson_cache_max: int = 32
+
+    # Snapshot de riesgo de la ciudad
+    snapshot_enabled: bool = True
+    snapshot_interval: float = 15 * 60
+    snapshot_max_age: float = 2 * 15 * 60
+
+    # Ingesta del pronóstico (OpenWeatherMap publica un bloque nuevo cada 3 horas).
+    # Apagada en la API: cada worker de uvicorn tendría su propio ciclo y el
+    # token bucket solo limita dentro de un proceso. Se programa aparte con
+    # `python -m services.ingestion --loop` o se activa en un solo worker.
+    ingestion_enabled: bool = False
+    ingestion_interval: float = 3 * 60 * 60
+    ingestion_retries: int = 3
+    ingestion_backoff: float = 1.0  # segundos base del backoff
+
+    # Mantenimiento de la tabla clima
+    clima_retention_months: int = 24
+    clima_partitions_ahead: int = 3
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        snapshot_interval = _flotante("SNAPSHOT_INTERVAL", cls.snapshot_interval)
+        return cls(
+            db_url=_texto("DB_URL"),
+            async_db_url=_texto("ASYNC_DB_URL"),
+            openweather_api_key=_texto("OPENWEATHER_API_KEY"),
+            google_api_key=_texto("GOOGLE_API_KEY"),
+            port=_entero("PORT", cls.port),
+            forecast_cache_ttl=_flotante("FORECAST_CACHE_TTL", 0) or None,
+            geocoding_cache_path=_texto("GEOCODING_CACHE_PATH"),
+            gemini_cache_dir=_texto("GEMINI_CACHE_DIR"),
+            tile_cache_dir=_texto("TILE_CACHE_DIR"),
+            geojson_cache_max=_entero("GEOJSON_CACHE_MAX", cls.geojson_cache_max),
+            snapshot_enabled=_booleano("SNAPSHOT_ENABLED", cls.snapshot_enabled),
+            snapshot_interval=snapshot_interval,
+            snapshot_max_age=_flotante("SNAPSHOT_MAX_AGE", 2 * snapshot_interval),
+            ingestion_enabled=_booleano("INGESTION_ENABLED", cls.ingestion_enabled),
+            ingestion_interval=_flotante("INGESTION_INTERVAL", cls.ingestion_interval),
+            ingestion_retries=_entero("INGESTION_RETRIES", cls.ingestion_retries),
+            ingestion_backoff=_flotante("INGESTION_BACKOFF", cls.ingestion_backoff),
+            clima_retention_months=_entero("CLIMA_RETENTION_MONTHS", cls.clima_retention_months),
+            clima_partitions_ahead=_entero("CLIMA_PARTITIONS_AHEAD", cls.clima_partitions_ahead),
+        )
+
+
+_settings: Optional[Settings] = None
+
+
+def get_settings() -> Settings:
+    """Configuración del proceso; el archivo .env se lee solo en la primera llamada."""
+    global _settings
+    if _settings is None:
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        _settings = Settings.from_env()
+    return _settings
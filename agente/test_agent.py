@@ -9,17 +9,17 @@ from dotenv import load_dotenv
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 # La importación ahora apunta al paquete 'agent' que contiene __init__.py
-from agent import FloodPredictionAgent
-from db.connection import get_db
+from agent import get_flood_agent
+from db.connection import AsyncSessionLocal
 
 async def probar_agente_para_alcaldia(alcaldia: str):
     """Prueba el agente para una sola alcaldía y muestra el resultado."""
-    db_session = next(get_db())
+    db_session = AsyncSessionLocal()
     try:
-        agente = FloodPredictionAgent(db_session)
+        agente = get_flood_agent()
         print(f"--- Solicitando predicción para: {alcaldia} ---")
         
-        resultado = await agente.predict_for_alcaldia(alcaldia)
+        resultado = await agente.predict_for_alcaldia(db_session, alcaldia)
         
         print(f"--- Resultado para: {alcaldia} ---")
         if resultado.get("error"):
@@ -48,7 +48,7 @@ async def probar_agente_para_alcaldia(alcaldia: str):
         traceback.print_exc()
         return False
     finally:
-        db_session.close()
+        await db_session.close()
 
 async def main():
     """Función principal para ejecutar las pruebas."""
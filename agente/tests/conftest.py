@@ -0,0 +1,69 @@
+# tests/conftest.py
+"""
+Las pruebas corren sin red ni MySQL: la BD es un SQLite temporal y las tareas
+de fondo de la app quedan apagadas. El entorno se fija antes de importar
+cualquier módulo que lea la configuración.
+"""
+import asyncio
+import os
+import tempfile
+
+_TEMPORAL = tempfile.mkdtemp(prefix="pruebas-")
+# Siempre SQLite: un DB_URL del entorno podría apuntar a la BD real
+os.environ["DB_URL"] = f"sqlite:///{os.path.join(_TEMPORAL, 'inundaciones.db')}"
+os.environ.pop("ASYNC_DB_URL", None)
+os.environ.pop("GOOGLE_API_KEY", None)
+os.environ.pop("GEMINI_CACHE_DIR", None)
+os.environ["OPENWEATHER_API_KEY"] = "stub"
+os.environ["TILE_CACHE_DIR"] = os.path.join(_TEMPORAL, "tiles")
+os.environ["GEOCODING_CACHE_PATH"] = os.path.join(_TEMPORAL, "geocoding.json")
+os.environ["SNAPSHOT_ENABLED"] = "false"
+os.environ["INGESTION_ENABLED"] = "false"
+
+import pytest
+
+# Polígonos del CSV real que bastan para las pruebas con atlas
+POLIGONOS_ATLAS = 300
+
+
+def _correr(coro):
+    from db.connection import async_engine
+
+    async def con_cierre():
+        try:
+            return await coro
+        finally:
+            await async_engine.dispose()
+
+    return asyncio.run(con_cierre())
+
+
+@pytest.fixture
+def correr():
+    """Ejecuta una corrutina y cierra el pool async (sus conexiones quedan atadas al loop)."""
+    return _correr
+
+
+@pytest.fixture(scope="session")
+def engine():
+    from db.connection import Base, engine
+
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+@pytest.fixture(scope="session")
+def atlas(engine):
+    """BD con los primeros POLIGONOS_ATLAS polígonos del atlas y su resumen."""
+    from benchmarks.fixtures import sembrar_bd
+
+    sembrar_bd(limite=POLIGONOS_ATLAS)
+    return engine
+
+
+@pytest.fixture
+def sesion(engine):
+    from db.connection import SessionLocal
+
+    with SessionLocal() as db:
+        yield db
@@ -0,0 +1,55 @@
+# tests/test_atlas_loader.py
+import csv
+from itertools import islice
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, func, select
+
+from db.atlas_loader import ATLAS_CSV, load_atlas_csv
+from db.connection import Base
+from db.models import AtlasInundaciones, AtlasResumenAlcaldia
+
+FILAS_CSV = 40
+
+
+@pytest.fixture
+def motor(tmp_path):
+    """BD propia: la carga no debe mezclarse con el atlas compartido de las demás pruebas."""
+    motor = create_engine(f"sqlite:///{tmp_path / 'atlas.db'}")
+    Base.metadata.create_all(bind=motor)
+    yield motor
+    motor.dispose()
+
+
+@pytest.fixture
+def csv_corto(tmp_path):
+    """Las primeras FILAS_CSV zonas de data_geo_limpia.csv."""
+    ruta = tmp_path / "atlas.csv"
+    with open(ATLAS_CSV, newline="", encoding="utf-8") as origen, open(ruta, "w", newline="", encoding="utf-8") as destino:
+        lector = csv.reader(origen)
+        csv.writer(destino).writerows(islice(lector, FILAS_CSV + 1))
+    return str(ruta)
+
+
+def _conteo(motor, modelo) -> int:
+    with motor.connect() as conn:
+        return conn.execute(select(func.count()).select_from(modelo)).scalar()
+
+
+def test_repetir_la_carga_no_duplica_poligonos(motor, csv_corto):
+    primera = load_atlas_csv(motor, csv_corto, chunk_size=15)
+    assert primera["insertadas"] == FILAS_CSV and primera["actualizadas"] == 0
+    resumenes = _conteo(motor, AtlasResumenAlcaldia)
+    assert resumenes == primera["resumenes_alcaldia"] > 0
+
+    segunda = load_atlas_csv(motor, csv_corto, chunk_size=15)
+    assert segunda["insertadas"] == 0 and segunda["actualizadas"] == FILAS_CSV
+    assert _conteo(motor, AtlasInundaciones) == FILAS_CSV
+    assert _conteo(motor, AtlasResumenAlcaldia) == resumenes
+
+
+def test_motor_no_soportado_falla_antes_de_leer(tmp_path):
+    motor = SimpleNamespace(dialect=SimpleNamespace(name="oracle"))
+    with pytest.raises(ValueError, match="oracle"):
+        load_atlas_csv(motor, str(tmp_path / "no-existe.csv"))
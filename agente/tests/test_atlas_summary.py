@@ -0,0 +1,51 @@
+# tests/test_atlas_summary.py
+import pytest
+
+from db.atlas_summary import calcular_resumenes
+
+
+def _por_clave(filas):
+    return {r["clave"]: r for r in calcular_resumenes(filas)}
+
+
+def test_agrupa_variantes_del_nombre_bajo_el_oficial():
+    resumenes = _por_clave([
+        ("Coyoacn", "Alto", 2, 300.0),
+        ("COYOACÁN", "Bajo", 1, 100.0),
+        ("lvaro Obregn", "Medio", 4, 50.0),
+    ])
+    assert set(resumenes) == {"coyoacan", "alvaro obregon"}
+    coyoacan = resumenes["coyoacan"]
+    assert coyoacan["alcaldia"] == "Coyoacán"
+    assert coyoacan["poligonos"] == 3
+    assert coyoacan["distribucion"] == {
+        "Alto": {"poligonos": 2, "area_m2": 300.0},
+        "Bajo": {"poligonos": 1, "area_m2": 100.0},
+    }
+    assert resumenes["alvaro obregon"]["alcaldia"] == "Álvaro Obregón"
+
+
+def test_riesgo_ponderado_por_area_y_proporcion_alta():
+    coyoacan = _por_clave([
+        ("Coyoacán", "Muy Alto", 1, 100.0),
+        ("Coyoacán", "Bajo", 3, 300.0),
+    ])["coyoacan"]
+    # (4 * 100 + 1 * 300) / 400
+    assert coyoacan["riesgo_ponderado"] == pytest.approx(1.75)
+    assert coyoacan["riesgo"] == "Medio"
+    assert coyoacan["area_total_m2"] == 400.0
+    assert coyoacan["area_riesgo_alto_m2"] == 100.0
+    assert coyoacan["proporcion_area_alto"] == 0.25
+
+
+def test_sin_areas_pondera_por_poligonos():
+    tlalpan = _por_clave([("Tlalpan", "Alto", 1, 0), ("Tlalpan", "Bajo", 1, None)])["tlalpan"]
+    assert tlalpan["riesgo_ponderado"] == pytest.approx(2.0)
+    assert tlalpan["proporcion_area_alto"] == 0.0
+
+
+def test_riesgo_nulo_y_alcaldia_vacia():
+    resumenes = _por_clave([("Tlalpan", None, 2, 10.0), ("", "Alto", 5, 10.0), (None, "Alto", 1, 1.0)])
+    assert list(resumenes) == ["tlalpan"]
+    assert resumenes["tlalpan"]["distribucion"] == {"Sin dato": {"poligonos": 2, "area_m2": 10.0}}
+    assert resumenes["tlalpan"]["riesgo"] == "Muy Bajo"
@@ -0,0 +1,78 @@
+# tests/test_clima_upsert.py
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import delete, func, select
+
+from db.models import Clima, ClimaDiario
+from db.operations import CLIMA_FUENTE_DEFAULT, _clima_upsert_stmt, upsert_clima_records
+
+INICIO = datetime(2026, 10, 17)
+
+
+@pytest.fixture
+def sesion(sesion):
+    sesion.execute(delete(Clima))
+    sesion.execute(delete(ClimaDiario))
+    sesion.commit()
+    return sesion
+
+
+def _registros(n: int, lluvia: float = 1.0, alcaldia: str = "Tlalpan"):
+    return [
+        {"fecha": INICIO + timedelta(hours=3 * i), "alcaldia": alcaldia, "lluvia_mm": lluvia,
+         "fuente": "OpenWeatherMap"}
+        for i in range(n)
+    ]
+
+
+def _filas(sesion) -> int:
+    return sesion.execute(select(func.count(Clima.id))).scalar()
+
+
+def test_repetir_la_carga_no_duplica(sesion):
+    assert upsert_clima_records(sesion, _registros(10), batch_size=4) == {"insertados": 10, "actualizados": 0}
+    assert upsert_clima_records(sesion, _registros(10, lluvia=2.0), batch_size=4) == {"insertados": 0, "actualizados": 10}
+    assert _filas(sesion) == 10
+    assert sesion.execute(select(func.sum(Clima.lluvia_mm))).scalar() == pytest.approx(20.0)
+
+
+def test_lote_mixto_cuenta_nuevos_y_existentes(sesion):
+    upsert_clima_records(sesion, _registros(4))
+    resultado = upsert_clima_records(sesion, _registros(6) + _registros(3, alcaldia="Xochimilco"), batch_size=5)
+    assert resultado == {"insertados": 5, "actualizados": 4}
+    assert _filas(sesion) == 9
+
+
+def test_fechas_iso_y_con_zona_coinciden_con_las_guardadas(sesion):
+    upsert_clima_records(sesion, _registros(2))
+    como_texto = [{**r, "fecha": r["fecha"].isoformat()} for r in _registros(2)]
+    assert upsert_clima_records(sesion, como_texto) == {"insertados": 0, "actualizados": 2}
+    con_zona = [{**r, "fecha": r["fecha"].replace(tzinfo=timezone.utc)} for r in _registros(2)]
+    assert upsert_clima_records(sesion, con_zona) == {"insertados": 0, "actualizados": 2}
+    assert _filas(sesion) == 2
+
+
+def test_repetidos_en_la_misma_carga_gana_el_ultimo(sesion):
+    registros = _registros(1, lluvia=1.0) + _registros(1, lluvia=7.0)
+    assert upsert_clima_records(sesion, registros) == {"insertados": 1, "actualizados": 0}
+    assert float(sesion.execute(select(Clima.lluvia_mm)).scalar()) == 7.0
+
+
+def test_fuente_nula_usa_la_fuente_por_defecto(sesion):
+    registros = [{**r, "fuente": None} for r in _registros(2)]
+    upsert_clima_records(sesion, registros)
+    assert upsert_clima_records(sesion, registros) == {"insertados": 0, "actualizados": 2}
+    assert set(sesion.execute(select(Clima.fuente)).scalars()) == {CLIMA_FUENTE_DEFAULT}
+
+
+def test_actualiza_los_agregados_diarios(sesion):
+    upsert_clima_records(sesion, _registros(8, lluvia=1.5))
+    diario = sesion.execute(select(ClimaDiario)).scalars().all()
+    assert len(diario) == 1
+    assert float(diario[0].lluvia_total_mm) == pytest.approx(12.0)
+
+
+def test_motor_no_soportado():
+    with pytest.raises(ValueError, match="oracle"):
+        _clima_upsert_stmt("oracle")
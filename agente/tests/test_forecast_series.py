@@ -0,0 +1,60 @@
+# tests/test_forecast_series.py
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from services.forecast_series import SLOTS_MAXIMOS, ForecastSeries, slots_para_horizonte
+
+
+def _respuesta_api(slots: int = SLOTS_MAXIMOS, lluvia: float = 1.0):
+    inicio = int(datetime(2026, 10, 17).timestamp())
+    return {"list": [
+        {
+            "dt": inicio + i * 3 * 3600,
+            "rain": {"3h": lluvia} if i % 2 == 0 else {},
+            "pop": 0.5,
+            "main": {"temp": 20.0, "humidity": 60, "pressure": 1013},
+        }
+        for i in range(slots)
+    ]}
+
+
+@pytest.mark.parametrize("horas, slots", [(0, 0), (3, 1), (4, 2), (24, 8), (48, 16), (120, 40), (500, SLOTS_MAXIMOS)])
+def test_slots_para_horizonte(horas, slots):
+    assert slots_para_horizonte(horas) == slots
+
+
+def test_horizonte_rebana_sin_copiar():
+    serie = ForecastSeries.from_api(_respuesta_api(), "Tlalpan")
+    assert len(serie) == SLOTS_MAXIMOS
+    h24 = serie.horizonte(24)
+    assert len(h24) == 8 and len(serie.horizonte(48)) == 16
+    assert np.shares_memory(h24.lluvia_mm, serie.lluvia_mm)
+    assert h24.dt[-1] - h24.dt[0] == 7 * 3 * 3600
+
+
+def test_lluvia_por_horizonte_y_lluvia_total():
+    serie = ForecastSeries.from_api(_respuesta_api(lluvia=2.5), "Tlalpan")
+    # Llueve en los bloques pares: 4 de los primeros 8, 8 de los primeros 16
+    assert serie.lluvia_por_horizonte((24, 48)) == {24: 10.0, 48: 20.0}
+    assert serie.lluvia_total(24) == 10.0
+    assert serie.horizonte(24).to_records()[1]["lluvia_mm"] == 0.0
+
+
+def test_horizonte_mas_largo_que_la_serie():
+    serie = ForecastSeries.from_api(_respuesta_api(slots=5), "Tlalpan")
+    assert len(serie.horizonte(48)) == 5
+    assert serie.lluvia_por_horizonte((24, 120)) == {24: 3.0, 120: 3.0}
+
+
+def test_from_records_ordena_y_acepta_fechas_iso():
+    base = datetime(2026, 10, 17)
+    registros = [
+        {"fecha": (base + timedelta(hours=3 * i)).isoformat(), "lluvia_mm": float(i), "prob_lluvia": None}
+        for i in (2, 0, 1)
+    ]
+    serie = ForecastSeries.from_records(registros, "Tlalpan")
+    assert serie.lluvia_mm.tolist() == [0.0, 1.0, 2.0]
+    assert np.isnan(serie.prob_lluvia).all()
+    assert serie.to_records()[0]["prob_lluvia"] is None
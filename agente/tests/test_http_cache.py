@@ -0,0 +1,34 @@
+# tests/test_http_cache.py
+from services.forecast_cache import FORECAST_STEP_SECONDS
+from services.http_cache import bloque_pronostico, cache_control_pronostico, coincide, etag
+
+
+def test_etag_fuerte_y_determinista():
+    valor = etag("predict", "tlalpan", 24, "300-300-20261017", 5)
+    assert valor.startswith('"') and valor.endswith('"') and not valor.startswith("W/")
+    assert valor == etag("predict", "tlalpan", 24, "300-300-20261017", 5)
+    assert valor != etag("predict", "tlalpan", 48, "300-300-20261017", 5)
+
+
+def test_coincide_lista_debil_y_comodin():
+    valor = etag("context", "coyoacan")
+    assert coincide(valor, valor)
+    assert coincide(f'"otro", {valor}', valor)
+    assert coincide(f"W/{valor}", valor)
+    assert coincide("*", valor)
+
+
+def test_no_coincide_sin_encabezado_ni_subcadena():
+    valor = etag("context", "coyoacan")
+    assert not coincide(None, valor)
+    assert not coincide("", valor)
+    assert not coincide('"otro"', valor)
+    # Una ETag que contiene a la otra no es la misma
+    assert not coincide(valor[:-1] + 'ab"', valor)
+
+
+def test_bloque_y_max_age_del_pronostico():
+    inicio = 1000 * FORECAST_STEP_SECONDS
+    assert bloque_pronostico(inicio) == bloque_pronostico(inicio + FORECAST_STEP_SECONDS - 1) == 1000
+    assert bloque_pronostico(inicio + FORECAST_STEP_SECONDS) == 1001
+    assert cache_control_pronostico(inicio + FORECAST_STEP_SECONDS - 60) == "public, max-age=60"
@@ -0,0 +1,71 @@
+# tests/test_rate_limit.py
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from services import rate_limit
+from services.rate_limit import TokenBucket, get_rate_limiter
+
+
+class RelojFalso:
+    """Reloj manual: `sleep` avanza el tiempo en lugar de esperar."""
+
+    def __init__(self):
+        self.ahora = 0.0
+        self.esperas = []
+
+    def monotonic(self) -> float:
+        return self.ahora
+
+    async def sleep(self, segundos: float):
+        self.esperas.append(segundos)
+        self.ahora += segundos
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    reloj = RelojFalso()
+    monkeypatch.setattr(rate_limit, "time", SimpleNamespace(monotonic=reloj.monotonic))
+    monkeypatch.setattr(rate_limit, "asyncio", SimpleNamespace(Lock=asyncio.Lock, sleep=reloj.sleep))
+    return reloj
+
+
+def test_rafaga_hasta_la_capacidad_sin_esperar(reloj):
+    async def escenario():
+        bucket = TokenBucket(rate=0.5, capacity=30)
+        for _ in range(30):
+            await bucket.acquire()
+
+    asyncio.run(escenario())
+    assert reloj.esperas == []
+
+
+def test_espera_la_recarga_despues_de_la_rafaga(reloj):
+    async def escenario():
+        bucket = TokenBucket(rate=0.5, capacity=2)
+        for _ in range(4):
+            await bucket.acquire()
+
+    asyncio.run(escenario())
+    # Dos fichas de ráfaga y luego una cada 1/rate segundos
+    assert reloj.esperas == pytest.approx([2.0, 2.0])
+    assert reloj.ahora == pytest.approx(4.0)
+
+
+def test_no_pasa_de_la_capacidad_tras_una_pausa(reloj):
+    async def escenario():
+        bucket = TokenBucket(rate=1.0, capacity=2)
+        await bucket.acquire()
+        reloj.ahora += 100
+        for _ in range(3):
+            await bucket.acquire()
+
+    asyncio.run(escenario())
+    assert reloj.esperas == pytest.approx([1.0])
+
+
+def test_limitador_compartido_por_api():
+    assert get_rate_limiter("openweathermap") is get_rate_limiter("openweathermap")
+    assert get_rate_limiter("nominatim") is not get_rate_limiter("openweathermap")
+    assert get_rate_limiter("desconocida") is None
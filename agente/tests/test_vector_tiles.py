@@ -0,0 +1,136 @@
+# tests/test_vector_tiles.py
+"""
+El codificador MVT está escrito a mano: cada tile se decodifica con
+mapbox-vector-tile (dependencia de desarrollo) para revisar geometría,
+orientación de los anillos y atributos.
+"""
+import math
+import time
+from datetime import datetime, timezone
+from types import MappingProxyType
+
+import httpx
+import mapbox_vector_tile
+import numpy as np
+import pytest
+
+from agent.config import MAP_CONFIG
+from db.spatial_index import AtlasSpatialIndex
+from services.risk_calculator import RISK_LEVELS
+from services.snapshot import RiskSnapshot
+from services.vector_tiles import MVT_MEDIA_TYPE, construir_tile, tiles_en_bbox
+
+EXTENT = MAP_CONFIG["extent"]
+Z = 12
+# Tile de zoom 12 sobre el centro de la CDMX y su esquina noroeste en grados
+X, Y = next(tiles_en_bbox(Z, -99.1332, 19.4326, -99.1332, 19.4326))
+LON0 = X / 2 ** Z * 360.0 - 180.0
+LAT0 = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * Y / 2 ** Z))))
+
+
+def a_grados(px: float, py: float):
+    """Coordenadas del tile (y hacia abajo) -> lon/lat, con Web Mercator."""
+    n = 2 ** Z
+    lon = (X + px / EXTENT) / n * 360.0 - 180.0
+    lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (Y + py / EXTENT) / n))))
+    return [lon, lat]
+
+
+def anillo(*puntos):
+    """Anillo GeoJSON cerrado a partir de vértices en coordenadas del tile."""
+    return [a_grados(*p) for p in (*puntos, puntos[0])]
+
+
+def area_con_signo(coords) -> float:
+    """Fórmula del agrimensor en coordenadas del tile: positiva para anillos exteriores de MVT 2.1."""
+    puntos = np.asarray(coords, dtype=float)
+    x, y = puntos[:, 0], puntos[:, 1]
+    return float(np.sum(x * np.roll(y, -1) - np.roll(x, -1) * y) / 2)
+
+
+CUADRO = {"type": "Polygon", "coordinates": [anillo((1000, 1000), (1000, 2000), (2000, 2000), (2000, 1000))]}
+CON_HUECO = {"type": "Polygon", "coordinates": [
+    anillo((2500, 2500), (3500, 2500), (3500, 3500), (2500, 3500)),
+    anillo((2800, 2800), (3200, 2800), (3200, 3200), (2800, 3200)),
+]}
+
+
+@pytest.fixture
+def indice():
+    return AtlasSpatialIndex([
+        (1, "0901000010001", "Cuauhtémoc", "Alto", 1000.0, CUADRO),
+        (2, "0901000010002", "Cuauhtémoc", "Bajo", 2000.0, CON_HUECO),
+    ], version="prueba")
+
+
+def _capa(datos: bytes):
+    tile = mapbox_vector_tile.decode(datos, default_options={"y_coord_down": True})
+    assert list(tile) == [MAP_CONFIG["capa"]]
+    return tile[MAP_CONFIG["capa"]]
+
+
+def _por_id(capa):
+    return {f["id"]: f for f in capa["features"]}
+
+
+def test_geometria_en_coordenadas_del_tile(indice):
+    capa = _capa(construir_tile(indice, None, Z, X, Y))
+    assert capa["extent"] == EXTENT and capa["version"] == 2
+    cuadro = _por_id(capa)[1]["geometry"]
+    assert cuadro["type"] == "Polygon"
+    vertices = {tuple(p) for p in cuadro["coordinates"][0]}
+    assert vertices == {(1000, 1000), (1000, 2000), (2000, 2000), (2000, 1000)}
+
+
+def test_orientacion_de_anillos_y_huecos(indice):
+    features = _por_id(_capa(construir_tile(indice, None, Z, X, Y)))
+    assert area_con_signo(features[1]["geometry"]["coordinates"][0]) == pytest.approx(1000 * 1000)
+    exterior, hueco = features[2]["geometry"]["coordinates"]
+    assert area_con_signo(exterior) == pytest.approx(1000 * 1000)
+    assert area_con_signo(hueco) == pytest.approx(-400 * 400)
+
+
+def test_atributos_del_atlas_y_del_snapshot(indice):
+    sin_snapshot = _por_id(_capa(construir_tile(indice, None, Z, X, Y)))
+    assert sin_snapshot[1]["properties"] == {"cvegeo": "0901000010001", "alcaldia": "Cuauhtémoc", "riesgo": "Alto"}
+
+    snapshot = RiskSnapshot(
+        version=1,
+        generado_en=datetime.now(timezone.utc),
+        creado_monotonic=time.monotonic(),
+        predicciones=MappingProxyType({}),
+        poligonos_id=(2,),
+        posicion_por_id=MappingProxyType({2: 0}),
+        poligonos_24h=np.array([RISK_LEVELS.index("Moderado")], dtype=np.int8),
+        poligonos_48h=np.array([RISK_LEVELS.index("Muy Alto")], dtype=np.int8),
+    )
+    con_snapshot = _por_id(_capa(construir_tile(indice, snapshot, Z, X, Y)))
+    assert con_snapshot[2]["properties"] == {
+        "cvegeo": "0901000010002", "alcaldia": "Cuauhtémoc", "riesgo": "Bajo",
+        "riesgo_24h": "Moderado", "riesgo_48h": "Muy Alto",
+    }
+    # Un polígono fuera del snapshot conserva solo los atributos del atlas
+    assert "riesgo_24h" not in con_snapshot[1]["properties"]
+
+
+def test_tile_sin_poligonos_es_vacio(indice):
+    assert construir_tile(indice, None, Z, X + 3, Y + 3) == b""
+
+
+def test_ruta_de_tiles(atlas, correr):
+    from app import app
+
+    async def pedir(ruta: str, **headers):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://prueba") as cliente:
+            return await cliente.get(ruta, headers=headers)
+
+    vacio = correr(pedir("/api/v1/tiles/4/0/0.pbf"))
+    assert vacio.status_code == 204 and not vacio.content
+
+    cdmx = correr(pedir(f"/api/v1/tiles/{Z}/{X}/{Y}.pbf"))
+    assert cdmx.status_code == 200
+    assert cdmx.headers["content-type"] == MVT_MEDIA_TYPE
+    assert _capa(cdmx.content)["features"]
+
+    revalidado = correr(pedir(f"/api/v1/tiles/{Z}/{X}/{Y}.pbf", **{"If-None-Match": cdmx.headers["etag"]}))
+    assert revalidado.status_code == 304
@@ -12,11 +12,16 @@ poligono JSON,
 area_m2 DECIMAL (15,2),
 perimetro_m DECIMAL(15, 2),
 descripcion TEXT,
-fuente TEXT
+fuente TEXT,
+actualizado_en datetime
 );
 
+create unique index ix_atlas_inundaciones_cvegeo on atlas_inundaciones (cvegeo);
+
+-- Particionada por mes sobre fecha (python -m db.clima_maintenance agrega las
+-- particiones futuras y borra las que salen de la retención)
 create table clima(
-id int AUTO_INCREMENT primary key,
+id int AUTO_INCREMENT,
 fecha datetime not null,
 alcaldia varchar(100) not null,
 lluvia_mm DECIMAL (5,2),
@@ -24,7 +29,52 @@ prob_lluvia DECIMAL (5,2),
 temperatura DECIMAL(5,2),
 humedad decimal (5,2),
 presion DECIMAL (7,2),
-fuente varchar (100)
+-- NOT NULL: MySQL admite varios NULL en un índice único
+fuente varchar (100) not null default 'Desconocida',
+primary key (id, fecha)
+)
+partition by range columns (fecha) (
+    partition p_inicial values less than ('2025-01-01'),
+    partition pmax values less than (maxvalue)
+);
+
+create unique index ux_clima_alcaldia_fecha_fuente on clima (alcaldia, fecha, fuente);
+create index ix_clima_fecha on clima (fecha);
+
+-- Agregados de lluvia (se conservan aunque se borren los datos crudos)
+create table clima_diario(
+alcaldia varchar(100) not null,
+fecha date not null,
+lluvia_total_mm DECIMAL(8,2) not null default 0,
+lluvia_max_mm DECIMAL(5,2),
+prob_lluvia_max DECIMAL(5,2),
+registros int not null default 0,
+primary key (alcaldia, fecha)
+);
+
+create table clima_mensual(
+alcaldia varchar(100) not null,
+anio int not null,
+mes int not null,
+lluvia_total_mm DECIMAL(10,2) not null default 0,
+lluvia_max_diaria_mm DECIMAL(8,2),
+dias_con_lluvia int not null default 0,
+registros int not null default 0,
+primary key (alcaldia, anio, mes)
+);
+
+-- Resumen del atlas por alcaldía (lo recalcula el cargador del atlas)
+create table atlas_resumen_alcaldia(
+clave varchar(100) primary key,
+alcaldia varchar(100) not null,
+poligonos int not null default 0,
+area_total_m2 DECIMAL(18,2) not null default 0,
+area_riesgo_alto_m2 DECIMAL(18,2) not null default 0,
+proporcion_area_alto DECIMAL(6,4) not null default 0,
+riesgo_ponderado DECIMAL(5,3),
+riesgo varchar(50),
+distribucion JSON,
+actualizado_en datetime
 );
 
 
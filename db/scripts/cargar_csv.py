@@ -1,48 +1,30 @@
-import pandas as pd 
-from sqlalchemy import create_engine #Para la conexion en la base de datos
-
-from dotenv import load_dotenv
+# Carga (o refresca) el atlas de inundaciones en la BD.
+# Ahora usa el cargador del backend (agente/db/atlas_loader.py): lee el CSV por
+# bloques, valida las geometrías y hace upsert por cvegeo, así que se puede
+# correr las veces que sea sin duplicar registros.
+#
+# Uso:
+#   python db/scripts/cargar_csv.py                       (usa db/data/data_geo_limpia.csv)
+#   python db/scripts/cargar_csv.py ruta/al/archivo.csv
+
+import json
 import os
+import sys
 
-# Carga las variables del archivo .env
-load_dotenv('/home/diego/Documentos/clima/mi-repo/.env')
-
-csv_path = "/home/diego/Documentos/clima/mi-repo/db/data/data_geo_limpia.csv" #aqui es importante que modifiquen la ruta a donde este el csv
-
-#Creacion del motor de conexion con SQLAlchemy
-#usamos Mysql con el driver PyMySql
-engine = create_engine(os.getenv('DB_URL'))
-
-#Extraemos los datos
-
-df = pd.read_csv(csv_path) #Se cargan los datos desde el archivo CSV 
-
-df["coordenadas"] = df["g_pnt_2"]      # g_pnt_2  coordenadas (puntos geoespaciales)
-df["poligono"] = df["geo_shp"]         # geo_shp poligono (formas poligonales)
-df["riesgo"] = df["intnsdd"]           # intnsdd  riesgo (intensidad/nivel de riesgo)
-df["descripcion"] = df["descrpc"]      # descrpc  descripcion (descripción del área)
-df["perimetro_m"] = df["perim_m"]      # perim_m perimetro_m (perímetro en metros)
-
+from dotenv import load_dotenv
 
-#Crear el dataframe solo con las columnas que ocupamos por que trae otras mamadas
+# Carga las variables del archivo .env (DB_URL)
+load_dotenv()
 
-df_final = df[[
-    "cvegeo",           # Clave geográfica única del área
-    "alcaldi",          # Alcaldía a la que pertenece el área
-    "riesgo",           # Nivel de riesgo de inundación
-    "coordenadas",      # Coordenadas geográficas del punto
-    "poligono",         # Polígono que define el área de riesgo
-    "area_m2",          # Área en metros cuadrados
-    "perimetro_m",      # Perímetro en metros
-    "descripcion",      # Descripción detallada del área
-    "fuente"            # Fuente de los datos
-]]
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "agente"))
+from db.atlas_loader import ATLAS_CSV, load_atlas_csv
+from db.connection import Base, engine
 
-# Renombrar 'alcaldi' a 'alcaldia' para que coincida exactamente con tu tabla
-df_final = df_final.rename(columns={'alcaldi': 'alcaldia'})
+csv_path = sys.argv[1] if len(sys.argv) > 1 else ATLAS_CSV
 
- #Se cargan los datos da la BD
-df_final.to_sql("atlas_inundaciones", con=engine, if_exists="append", index=False)
+Base.metadata.create_all(bind=engine)
+reporte = load_atlas_csv(engine, csv_path)
 
 #esto confirma si se realizo la ejecucion del programa
-print("Datos cargados en MySQL con éxito")
\ No newline at end of file
+print(json.dumps(reporte, indent=2, ensure_ascii=False))
+print("Datos cargados con éxito")
@@ -0,0 +1,36 @@
+-- 001: índice compuesto (alcaldia, fecha) para la tabla clima.
+-- Las consultas del agente filtran por alcaldía + rango de fecha y ordenan por
+-- fecha; con este índice se resuelven sin recorrer ni ordenar toda la tabla.
+-- El índice de alcaldía sola queda cubierto por el compuesto y se elimina.
+
+use inundaciones_db;
+
+-- Índice compuesto (solo si no existe)
+set @existe = (
+    select count(*) from information_schema.statistics
+    where table_schema = database() and table_name = 'clima' and index_name = 'ix_clima_alcaldia_fecha'
+);
+set @sql = if(@existe = 0,
+    'create index ix_clima_alcaldia_fecha on clima (alcaldia, fecha)',
+    'select ''ix_clima_alcaldia_fecha ya existe''');
+prepare stmt from @sql; execute stmt; deallocate prepare stmt;
+
+-- Índice de fecha sola (rangos globales y retención), si la tabla se creó sin él
+set @existe = (
+    select count(*) from information_schema.statistics
+    where table_schema = database() and table_name = 'clima' and index_name = 'ix_clima_fecha'
+);
+set @sql = if(@existe = 0,
+    'create index ix_clima_fecha on clima (fecha)',
+    'select ''ix_clima_fecha ya existe''');
+prepare stmt from @sql; execute stmt; deallocate prepare stmt;
+
+-- Índice redundante de alcaldía sola (creado por versiones anteriores del modelo)
+set @existe = (
+    select count(*) from information_schema.statistics
+    where table_schema = database() and table_name = 'clima' and index_name = 'ix_clima_alcaldia'
+);
+set @sql = if(@existe > 0,
+    'drop index ix_clima_alcaldia on clima',
+    'select ''ix_clima_alcaldia no existe''');
+prepare stmt from @sql; execute stmt; deallocate prepare stmt;
@@ -0,0 +1,38 @@
+-- 002: clave única (alcaldia, fecha, fuente) en clima para la ingesta con upsert.
+-- Limpia los duplicados que dejaron las cargas anteriores (se conserva el
+-- registro más reciente, el de mayor id) y sustituye el índice (alcaldia, fecha)
+-- de la migración 001: la clave única tiene ese mismo prefijo. La columna
+-- fuente pasa a NOT NULL para que la clave no admita duplicados.
+
+use inundaciones_db;
+
+update clima set fuente = 'Desconocida' where fuente is null;
+
+-- Con fuente nula la clave única no evitaría duplicados (MySQL admite varios
+-- NULL en un índice único); se puede volver a ejecutar sin efecto.
+alter table clima modify fuente varchar(100) not null default 'Desconocida';
+
+delete c from clima c
+join clima d
+  on d.alcaldia = c.alcaldia
+ and d.fecha = c.fecha
+ and d.fuente = c.fuente
+ and d.id > c.id;
+
+set @existe = (
+    select count(*) from information_schema.statistics
+    where table_schema = database() and table_name = 'clima' and index_name = 'ux_clima_alcaldia_fecha_fuente'
+);
+set @sql = if(@existe = 0,
+    'create unique index ux_clima_alcaldia_fecha_fuente on clima (alcaldia, fecha, fuente)',
+    'select ''ux_clima_alcaldia_fecha_fuente ya existe''');
+prepare stmt from @sql; execute stmt; deallocate prepare stmt;
+
+set @existe = (
+    select count(*) from information_schema.statistics
+    where table_schema = database() and table_name = 'clima' and index_name = 'ix_clima_alcaldia_fecha'
+);
+set @sql = if(@existe > 0,
+    'drop index ix_clima_alcaldia_fecha on clima',
+    'select ''ix_clima_alcaldia_fecha no existe''');
+prepare stmt from @sql; execute stmt; deallocate prepare stmt;
@@ -0,0 +1,50 @@
+-- 003: particionado mensual de clima por fecha y tablas de agregados de lluvia.
+-- MySQL exige que toda clave única incluya la columna de partición, por eso la
+-- llave primaria pasa a ser (id, fecha); la clave única de la migración 002 ya
+-- incluye fecha.
+-- Después de correr este script:
+--     python -m db.clima_maintenance      (desde agente/)
+-- crea las particiones mensuales a partir de 2025-01 y aplica la retención.
+-- Conviene programarlo una vez al día (cron).
+
+use inundaciones_db;
+
+alter table clima drop primary key, add primary key (id, fecha);
+
+alter table clima partition by range columns (fecha) (
+    partition p_inicial values less than ('2025-01-01'),
+    partition pmax values less than (maxvalue)
+);
+
+create table if not exists clima_diario(
+alcaldia varchar(100) not null,
+fecha date not null,
+lluvia_total_mm DECIMAL(8,2) not null default 0,
+lluvia_max_mm DECIMAL(5,2),
+prob_lluvia_max DECIMAL(5,2),
+registros int not null default 0,
+primary key (alcaldia, fecha)
+);
+
+create table if not exists clima_mensual(
+alcaldia varchar(100) not null,
+anio int not null,
+mes int not null,
+lluvia_total_mm DECIMAL(10,2) not null default 0,
+lluvia_max_diaria_mm DECIMAL(8,2),
+dias_con_lluvia int not null default 0,
+registros int not null default 0,
+primary key (alcaldia, anio, mes)
+);
+
+-- Agregados de los datos existentes
+replace into clima_diario (alcaldia, fecha, lluvia_total_mm, lluvia_max_mm, prob_lluvia_max, registros)
+select alcaldia, date(fecha), coalesce(sum(lluvia_mm), 0), max(lluvia_mm), max(prob_lluvia), count(*)
+from clima
+group by alcaldia, date(fecha);
+
+replace into clima_mensual (alcaldia, anio, mes, lluvia_total_mm, lluvia_max_diaria_mm, dias_con_lluvia, registros)
+select alcaldia, year(fecha), month(fecha), sum(lluvia_total_mm), max(lluvia_total_mm),
+       sum(case when lluvia_total_mm > 0 then 1 else 0 end), sum(registros)
+from clima_diario
+group by alcaldia, year(fecha), month(fecha);
@@ -0,0 +1,41 @@
+-- 004: cvegeo único en atlas_inundaciones (el cargador hace upsert sobre él) y
+-- columna actualizado_en, que forma parte de la versión del atlas.
+-- Se eliminan los duplicados que dejaron cargas repetidas (se conserva el de menor id).
+
+use inundaciones_db;
+
+delete a from atlas_inundaciones a
+join atlas_inundaciones b
+  on b.cvegeo = a.cvegeo
+ and b.id < a.id;
+
+set @existe = (
+    select count(*) from information_schema.columns
+    where table_schema = database() and table_name = 'atlas_inundaciones' and column_name = 'actualizado_en'
+);
+set @sql = if(@existe = 0,
+    'alter table atlas_inundaciones add column actualizado_en datetime null',
+    'select ''actualizado_en ya existe''');
+prepare stmt from @sql; execute stmt; deallocate prepare stmt;
+
+update atlas_inundaciones set actualizado_en = utc_timestamp() where actualizado_en is null;
+
+-- Índice no único creado por versiones anteriores del modelo
+set @existe = (
+    select count(*) from information_schema.statistics
+    where table_schema = database() and table_name = 'atlas_inundaciones'
+      and index_name = 'ix_atlas_inundaciones_cvegeo' and non_unique = 1
+);
+set @sql = if(@existe > 0,
+    'drop index ix_atlas_inundaciones_cvegeo on atlas_inundaciones',
+    'select ''sin índice previo de cvegeo''');
+prepare stmt from @sql; execute stmt; deallocate prepare stmt;
+
+set @existe = (
+    select count(*) from information_schema.statistics
+    where table_schema = database() and table_name = 'atlas_inundaciones' and index_name = 'ix_atlas_inundaciones_cvegeo'
+);
+set @sql = if(@existe = 0,
+    'create unique index ix_atlas_inundaciones_cvegeo on atlas_inundaciones (cvegeo)',
+    'select ''ix_atlas_inundaciones_cvegeo ya es único''');
+prepare stmt from @sql; execute stmt; deallocate prepare stmt;
@@ -0,0 +1,19 @@
+-- 005: resumen del atlas por alcaldía (distribución de riesgo, riesgo ponderado
+-- por área, proporción del área en riesgo alto). Después de crear la tabla,
+-- llenarla desde agente/ con:  python -m db.atlas_summary
+-- (la API también la llena sola la primera vez que la encuentra vacía).
+
+use inundaciones_db;
+
+create table if not exists atlas_resumen_alcaldia(
+clave varchar(100) primary key,
+alcaldia varchar(100) not null,
+poligonos int not null default 0,
+area_total_m2 DECIMAL(18,2) not null default 0,
+area_riesgo_alto_m2 DECIMAL(18,2) not null default 0,
+proporcion_area_alto DECIMAL(6,4) not null default 0,
+riesgo_ponderado DECIMAL(5,3),
+riesgo varchar(50),
+distribucion JSON,
+actualizado_en datetime
+);
@@ -3,3 +3,5 @@ source prai/bin/activate
 echo "==============> ENTORNO VIRTUAL CREADO <=============="
 pip install -r requirements.txt
 echo "==============> DEPENDENCIAS DE PYTHON INSTALADAS <=============="
+(cd agente && python -m db.init_db)
+echo "==============> TABLAS DE LA BASE DE DATOS CREADAS <=============="